@@ -1,2 +1,18 @@
-__all__ = ['fill_gaps_using_reference', 'file_readers', 'annotate_utrs_using_cufflinks']
-from assembly_tools import *
+import importlib
+
+__all__ = ['fill_gaps_using_reference', 'file_readers', 'annotate_utrs_using_cufflinks', 'tasks']
+
+
+def _lazy_loader(package, submodules):
+    '''Returns a module __getattr__ that only imports a submodule the first time
+       it is accessed, so that importing a package does not pull in every
+       dependency of every submodule'''
+    def __getattr__(name):
+        if name in submodules:
+            return importlib.import_module(package + '.' + name)
+        raise AttributeError('module ' + package + ' has no attribute ' + name)
+
+    return __getattr__
+
+
+__getattr__ = _lazy_loader(__name__, __all__)
@@ -1,2 +1,3 @@
 __all__ = ['transcript', 'helper', 'gene']
-from assembly_tools.annotate_utrs_using_cufflinks import *
+from assembly_tools import _lazy_loader
+__getattr__ = _lazy_loader(__name__, __all__)
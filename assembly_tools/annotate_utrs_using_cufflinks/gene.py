@@ -1,5 +1,5 @@
-import sys
 import copy
+from assembly_tools import diagnostics
 from assembly_tools.annotate_utrs_using_cufflinks import transcript
 from pyfastaq import intervals
 
@@ -45,7 +45,7 @@ class Gene:
         if gff_record.strand != '.':
             if self.strand != None and self.strand != gff_record.strand:
                 if lenient:
-                    print('Warning: Strand inconsistency from this line of gff file:\n' + str(gff_record), file=sys.stderr)
+                    diagnostics.warn('Gene strand inconsistency', lambda: 'Strand inconsistency from this line of gff file:\n' + str(gff_record))
                     self.strand = 'Inconsistent'
                 else:
                     raise Error('Strand inconsistency from this line of gff file:\n' + str(gff_record))
@@ -1,8 +1,7 @@
 class Error (Exception): pass
 
-import sys
 from pyfastaq import *
-from assembly_tools import file_readers
+from assembly_tools import diagnostics, file_readers, profiling
 from assembly_tools.annotate_utrs_using_cufflinks import gene
 
 
@@ -10,7 +9,9 @@ def read_gff(filename):
     level_records = [[], [], []]
     other_records = {}
     gff_reader = file_readers.gff.file_reader(filename)
+    records = 0
     for g in gff_reader:
+        records += 1
         for i in range(len(gene.feature_levels)):
             if g.feature in gene.feature_levels[i]:
                 level_records[i].append(g)
@@ -18,6 +19,7 @@ def read_gff(filename):
         else:
             update_other_records(other_records, g)
 
+    profiling.count('gff_records', records)
     return level_records, other_records
 
 
@@ -53,7 +55,7 @@ def get_genes_from_ref(level_records, other_records):
 
         if parent_id not in genes[g.seqname]:
             update_other_records(other_records, g)
-            print('Warning: Parent with id "' + parent_id + '" not found for this feature:', str(g), sep='\n\t', file=sys.stderr)
+            diagnostics.warn('Transcript parent not found', lambda: 'Parent with id "' + parent_id + '" not found for this feature:\n' + str(g))
             continue
 
         genes[g.seqname][parent_id].add_gff_record(g)
@@ -71,7 +73,7 @@ def get_genes_from_ref(level_records, other_records):
             gene_id = level2_to_level1[parent_id]
         except:
             update_other_records(other_records, g)
-            print('Warning: Parent of "' + parent_id + '" not found, originating from this line:', str(g), sep='\n\t', file=sys.stderr)
+            diagnostics.warn('Feature parent not found', lambda: 'Parent of "' + str(parent_id) + '" not found, originating from this line:\n' + str(g))
             continue
 
         genes[g.seqname][gene_id].add_gff_record(g)
@@ -81,18 +83,171 @@ def get_genes_from_ref(level_records, other_records):
 
 
 def load_ref_gff(filename):
-    level_records, other_records = read_gff(filename)
-    genes, other_records = get_genes_from_ref(level_records, other_records)
+    with profiling.phase('read_gff'):
+        level_records, other_records = read_gff(filename)
+
+    with profiling.phase('build_genes'):
+        genes, other_records = get_genes_from_ref(level_records, other_records)
 
     for refname in genes:
+        profiling.count('ref_genes', len(genes[refname]))
         for test_gene in genes[refname].values():
             if len(test_gene.transcripts) == 0:
-                print('WARNING:', test_gene.gene_id, 'has no transcripts', file=sys.stderr)
+                diagnostics.warn('Gene has no transcripts', str(test_gene.gene_id) + ' has no transcripts')
 
-    sort_gene_dict_values(genes)
+    with profiling.phase('sort_genes'):
+        sort_gene_dict_values(genes)
     return genes, other_records
 
 
+def _feature_level(gff_record):
+    for i in range(len(gene.feature_levels)):
+        if gff_record.feature in gene.feature_levels[i]:
+            return i
+    return None
+
+
+def _transcript_parent_id(gff_record):
+    if gff_record.feature == 'polypeptide':
+        return gff_record.get_attribute('Derives_from')
+    else:
+        return gff_record.get_attribute('Parent')
+
+
+_mRNA_features = set(['mRNA', 'transcript', 'pseudogenic_transcript'])
+_transcript_coords_features = set(['five_prime_UTR', 'three_prime_UTR', 'CDS', 'exon', 'pseudogenic_exon', 'ncRNA', 'rRNA', 'tRNA', 'snRNA'])
+
+
+def _update_span(spans, key, coords):
+    span = spans.get(key)
+    if span is None:
+        spans[key] = [coords.start, coords.end]
+    else:
+        span[0] = min(span[0], coords.start)
+        span[1] = max(span[1], coords.end)
+
+
+def choose_longest_transcripts(filename):
+    '''First pass of write_longest_transcripts(). Reads a GFF file, keeping only the IDs,
+       exon lengths and coords of transcripts. Returns tuple (transcript_to_gene, winners, coords):
+         transcript_to_gene: transcript ID -> gene ID
+         winners: (seqname, gene ID) -> ID of its longest transcript, or None if it has no transcripts
+         coords: transcript ID -> [start, end] that its mRNA and gene will have.
+       The transcripts and coords chosen are the same as load_ref_gff() followed by
+       gene.Gene.remove_all_but_longest_transcript()'''
+    genes = {}
+    transcripts = []
+    exon_lengths = {}
+    spans = {}
+    mRNA_spans = {}
+
+    for g in file_readers.gff.file_reader(filename):
+        level = _feature_level(g)
+        if level == 0:
+            if g.seqname not in genes:
+                genes[g.seqname] = set()
+            genes[g.seqname].add(g.get_attribute('ID'))
+        elif level == 1:
+            transcript_id = g.get_attribute('ID')
+            if transcript_id is None:
+                raise Error('Error getting ID/gene_id from GFF line\n' + str(g))
+            transcripts.append((g.seqname, transcript_id, g.get_attribute('Parent')))
+            if g.feature in _mRNA_features:
+                mRNA_spans[transcript_id] = [g.coords.start, g.coords.end]
+            elif g.feature in _transcript_coords_features:
+                _update_span(spans, transcript_id, g.coords)
+        elif level == 2:
+            parent_id = _transcript_parent_id(g)
+            if g.feature in ['CDS', 'exon', 'pseudogenic_exon']:
+                exon_lengths[parent_id] = exon_lengths.get(parent_id, 0) + len(g)
+            if g.feature in _transcript_coords_features:
+                _update_span(spans, parent_id, g.coords)
+
+    # when a transcript ID is used more than once, its exons belong to the first
+    # of its genes in the file, as in get_genes_from_ref()
+    transcript_to_gene = {}
+    gene_transcripts = {}
+    for seqname, transcript_id, parent_id in transcripts:
+        if seqname not in genes:
+            raise Error('No parent in sequence "' + seqname + '" for transcript ' + transcript_id)
+        if parent_id not in genes[seqname]:
+            continue
+        transcript_to_gene.setdefault(transcript_id, parent_id)
+        if (seqname, parent_id) not in gene_transcripts:
+            gene_transcripts[seqname, parent_id] = []
+        gene_transcripts[seqname, parent_id].append(transcript_id)
+
+    # Ties are won by the transcript that is last in the file, because
+    # get_genes_from_ref() adds the transcripts to each gene in reverse order
+    winners = {}
+    for seqname in genes:
+        for gene_id in genes[seqname]:
+            longest_name = None
+            longest_length = -1
+            for transcript_id in reversed(gene_transcripts.get((seqname, gene_id), [])):
+                if transcript_to_gene[transcript_id] == gene_id:
+                    length = exon_lengths.get(transcript_id, 0)
+                else:
+                    length = 0
+                if length > longest_length:
+                    longest_length = length
+                    longest_name = transcript_id
+
+            winners[seqname, gene_id] = longest_name
+            if longest_name is None:
+                diagnostics.warn('Gene has no transcripts', str(gene_id) + ' has no transcripts')
+
+    coords = {}
+    for transcript_id in set(winners.values()):
+        if transcript_id in spans:
+            coords[transcript_id] = spans[transcript_id]
+        elif transcript_id in mRNA_spans:
+            coords[transcript_id] = mRNA_spans[transcript_id]
+
+    return transcript_to_gene, winners, coords
+
+
+def write_longest_transcripts(filename_in, filename_out):
+    '''Writes the records of a GFF file, keeping only the longest transcript of each gene,
+       reading the file twice instead of loading all of it into memory. Records are written
+       in the same order as the input file. Genes and their mRNAs get the coords of the
+       transcript that is kept. Records that are not part of a gene are all written'''
+    transcript_to_gene, winners, coords = choose_longest_transcripts(filename_in)
+    written_genes = set()
+    f = utils.open_file_write(filename_out)
+
+    for g in file_readers.gff.file_reader(filename_in):
+        level = _feature_level(g)
+
+        if level == 0:
+            gene_key = (g.seqname, g.get_attribute('ID'))
+            # only the first of genes with the same ID is kept, as in get_genes_from_ref()
+            if gene_key in written_genes:
+                continue
+            written_genes.add(gene_key)
+            if winners[gene_key] in coords:
+                g.coords = intervals.Interval(*coords[winners[gene_key]])
+        elif level == 1:
+            parent_id = g.get_attribute('Parent')
+            if (g.seqname, parent_id) not in winners:
+                diagnostics.warn('Transcript parent not found', lambda: 'Parent with id "' + parent_id + '" not found for this feature:\n' + str(g))
+            elif winners[g.seqname, parent_id] != g.get_attribute('ID'):
+                continue
+            elif g.feature in _mRNA_features and g.get_attribute('ID') in coords:
+                g.coords = intervals.Interval(*coords[g.get_attribute('ID')])
+        elif level == 2:
+            parent_id = _transcript_parent_id(g)
+            gene_id = transcript_to_gene.get(parent_id)
+            if gene_id is None:
+                diagnostics.warn('Feature parent not found', lambda: 'Parent of "' + str(parent_id) + '" not found, originating from this line:\n' + str(g))
+            elif winners.get((g.seqname, gene_id)) != parent_id:
+                continue
+
+        print(g, file=f)
+
+    utils.close(f)
+
+
 def initialize_genes_dict_cufflinks(records):
     genes = {}
     for gff_record in records:
@@ -135,11 +290,55 @@ def get_genes_from_cufflinks(level_records):
 
 
 def load_cufflinks_gtf(filename):
-    level_records, x = read_gff(filename)
-    genes = get_genes_from_cufflinks(level_records)
-    sort_gene_dict_values(genes)
+    with profiling.phase('read_gff'):
+        level_records, x = read_gff(filename)
+
+    with profiling.phase('build_genes'):
+        genes = get_genes_from_cufflinks(level_records)
+
+    for refname in genes:
+        profiling.count('cufflinks_genes', len(genes[refname]))
+
+    with profiling.phase('sort_genes'):
+        sort_gene_dict_values(genes)
     return genes
 
+def extend_ref_genes(ref_gene_list, cufflinks_list):
+    '''Extends the UTRs of the genes in ref_gene_list using cufflinks_list. Both lists
+       must be sorted and from the same sequence. Empties ref_gene_list and returns a list
+       of the GFF records of the updated genes'''
+    to_print = []
+    cufflinks_index = 0
+    previous_gene_coords = None
+    next_gene_coords = None
+
+    while len(ref_gene_list):
+        g = ref_gene_list.pop(0)
+        if len(ref_gene_list):
+            next_gene_coords = ref_gene_list[0].coords
+        exclude_coords = [x for x in [previous_gene_coords, next_gene_coords] if x is not None]
+        indexes_can_use_to_extend = []
+
+        while cufflinks_index < len(cufflinks_list) and cufflinks_list[cufflinks_index].coords.end < g.coords.start:
+            cufflinks_index += 1
+
+        original_index = cufflinks_index
+
+        while cufflinks_index < len(cufflinks_list) and cufflinks_list[cufflinks_index].intersects(g):
+            if g.can_extend(cufflinks_list[cufflinks_index]):
+                indexes_can_use_to_extend.append(cufflinks_index)
+            cufflinks_index += 1
+        cufflinks_index = original_index
+
+        for x in indexes_can_use_to_extend:
+            g.extend(cufflinks_list[x], exclude_coords=exclude_coords)
+
+        to_print += g.to_gff_list()
+        previous_gene_coords = g.coords
+
+    return to_print
+
+
 def gene_dict_to_sorted_list(d):
     l = []
     while(len(d)):
@@ -86,3 +86,22 @@ class Test_helper(unittest.TestCase):
         with self.assertRaises(helper.Error):
             helper.load_cufflinks_gtf(os.path.join(data_dir, 'test_load_cufflinks_gtf.no_parent.gtf'))
 
+
+    def test_write_longest_transcripts(self):
+        '''Test write_longest_transcripts keeps the same records as remove_all_but_longest_transcript()'''
+        infile = os.path.join(data_dir, 'test_write_longest_transcripts.gff')
+        tmp_file = 'tmp.test_write_longest_transcripts.gff'
+        helper.write_longest_transcripts(infile, tmp_file)
+        self.assertTrue(filecmp.cmp(os.path.join(data_dir, 'test_write_longest_transcripts.out.gff'), tmp_file, shallow=False))
+
+        genes, other_records = helper.load_ref_gff(infile)
+        expected = [str(x) for l in other_records.values() for x in l]
+        for gene_list in genes.values():
+            for g in gene_list:
+                g.remove_all_but_longest_transcript()
+                expected += [str(x) for x in g.to_gff_list()]
+
+        with open(tmp_file) as f:
+            got = [x.rstrip('\n') for x in f]
+        self.assertEqual(sorted(expected), sorted(got))
+        os.unlink(tmp_file)
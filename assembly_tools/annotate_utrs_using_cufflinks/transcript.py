@@ -1,7 +1,6 @@
 import copy
-import sys
 from pyfastaq import intervals
-from assembly_tools import file_readers
+from assembly_tools import diagnostics, file_readers
 
 lenient = False
 class Error (Exception): pass
@@ -129,7 +128,7 @@ class Transcript:
         if len(strands) != 1:
             if lenient:
                 self.strand = 'Inconsistent'
-                print(self._strand_error_message(), file=sys.stderr)
+                diagnostics.warn('Transcript strand inconsistency', self._strand_error_message)
             else:
                 raise Error(self._strand_error_message())
              
@@ -139,7 +138,7 @@ class Transcript:
         elif self.strand != strand:
             if lenient:
                 self.strand = 'Inconsistent'
-                print(self._strand_error_message(), file=sys.stderr)
+                diagnostics.warn('Transcript strand inconsistency', self._strand_error_message)
             else:
                 raise Error(self._strand_error_message())
 
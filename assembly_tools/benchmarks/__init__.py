@@ -0,0 +1,3 @@
+__all__ = ['gap_fill', 'gap_fill_data', 'gff_data', 'gff_utr', 'results']
+from assembly_tools import _lazy_loader
+__getattr__ = _lazy_loader(__name__, __all__)
@@ -0,0 +1,81 @@
+'''Benchmarks of each stage of gap filling, using synthetic data and a stand-in
+for the aligner, so that no external programs are needed.
+Run with: python3 -m assembly_tools.benchmarks.gap_fill --help'''
+
+import argparse
+import os
+import tempfile
+import time
+from assembly_tools.benchmarks import gap_fill_data, results
+from assembly_tools.fill_gaps_using_reference import gap_registry, helper, reference
+
+
+def run_one_size(generator, outdir, abs_diff=500):
+    '''Runs each stage of gap filling once. Returns a tuple of two dicts:
+       stage name -> time in seconds, and counts of closed and total gaps'''
+    prefix = os.path.join(outdir, 'gaps_' + str(generator.gaps))
+    ref_fasta = prefix + '.ref.fa'
+    assembly = prefix + '.assembly.fa'
+    if os.path.exists(ref_fasta + '.fai'):
+        os.unlink(ref_fasta + '.fai')
+    generator.write(ref_fasta, assembly)
+    flanks = prefix + '.flanks.fa.gz'
+    samfile = prefix + '.sam'
+    timings = {}
+
+    def timed(name, function, *args):
+        start = time.perf_counter()
+        returned = function(*args)
+        timings[name] = time.perf_counter() - start
+        return returned
+
+    gaps = gap_registry.GapRegistry()
+    timed('find_gaps_and_write_flanks', helper.find_gaps_and_write_flanks, assembly, generator.flanking_bases, flanks, gaps)
+    timed('stand_in_map', gap_fill_data.StandInAligner(generator).map, flanks, samfile)
+    timed('parse_sam_file', helper.parse_sam_file, samfile, gaps)
+    ref_seqs = timed('load_reference', reference.Reference, ref_fasta)
+    counts = timed('fill_gaps', helper.fill_gaps, assembly, prefix + '.filled.fa', gaps, ref_seqs, abs_diff)
+    ref_seqs.close()
+    return timings, counts
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = 'Benchmarks each stage of gap filling on synthetic data with different numbers of gaps',
+        usage = 'python3 -m assembly_tools.benchmarks.gap_fill [options]')
+    parser.add_argument('--gaps', help='Comma-separated list of numbers of gaps to test [%(default)s]', default='100,1000,10000,100000,1000000', metavar='INT,INT,...')
+    parser.add_argument('--contigs', type=int, help='Number of contigs in the assembly [%(default)s]', default=100, metavar='INT')
+    parser.add_argument('--flanking_bases', type=int, help='Bases either side of each gap to use [%(default)s]', default=100, metavar='INT')
+    parser.add_argument('--gap_abs_diff', type=int, help='Max allowed difference in gap length [%(default)s]', default=500, metavar='INT')
+    parser.add_argument('--seed', type=int, help='Random number seed [%(default)s]', default=42, metavar='INT')
+    parser.add_argument('--outdir', help='Directory in which to write the synthetic data. Default is a temporary directory, deleted at the end', metavar='DIRNAME')
+    parser.add_argument('--results', help='File of results, which each run is appended to [%(default)s]', default='benchmark_results.jsonl', metavar='FILENAME')
+    parser.add_argument('--compare', help='After running, compare the timings with those stored for this commit', metavar='COMMIT')
+    options = parser.parse_args()
+
+    tmpdir = None
+    if options.outdir is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix='tmp.benchmark.gap_fill.')
+        outdir = tmpdir.name
+    else:
+        outdir = options.outdir
+        os.makedirs(outdir, exist_ok=True)
+
+    for gaps in [int(x) for x in options.gaps.split(',')]:
+        generator = gap_fill_data.Generator(gaps=gaps, contigs=options.contigs, flanking_bases=options.flanking_bases, seed=options.seed)
+        params = {'gaps': gaps, 'contigs': options.contigs, 'flanking_bases': options.flanking_bases, 'gap_abs_diff': options.gap_abs_diff, 'seed': options.seed}
+        timings, counts = run_one_size(generator, outdir, abs_diff=options.gap_abs_diff)
+        results.append(options.results, 'gap_fill', params, timings)
+        for name, seconds in timings.items():
+            print('gaps=' + str(gaps), name, '{:.4f}'.format(seconds), sep='\t')
+        print('gaps=' + str(gaps), 'closed ' + str(counts['closed']) + ' of ' + str(counts['total']), sep='\t')
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+    if options.compare:
+        print(*results.compare(options.results, options.compare), sep='\n')
+
+
+if __name__ == '__main__':
+    run()
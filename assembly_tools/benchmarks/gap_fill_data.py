@@ -0,0 +1,199 @@
+'''Deterministic generator of a synthetic reference and a gapped assembly made
+from it, for benchmarking gap filling without an external aligner.
+
+The assembly is made of blocks copied from the reference, separated by runs
+of Ns. Some gaps are a different length from the reference sequence they
+replace, some have flanks that overlap in the reference, and some blocks are
+novel sequence that is not in the reference, so their flanks are unmapped.
+Some contigs are reverse complemented, and some have Ns at their ends.
+
+StandInAligner uses what the generator knows about the blocks to write a
+SAM file of flank hits, in the same order as the flanks. It only looks at
+the flank sequences, not their names.'''
+
+import random
+from pyfastaq import sequences, utils
+
+class Error (Exception): pass
+
+_random_bases = bytes.maketrans(bytes(range(256)), b'ACGT' * 64)
+_complement = str.maketrans('ACGTNacgtn', 'TGCANtgcan')
+
+
+def _revcomp(seq):
+    return seq.translate(_complement)[::-1]
+
+
+class Generator:
+    def __init__(self, gaps=100, contigs=10, flanking_bases=100, gap_length=(10, 500), gap_length_diff=50, block_length=None, reverse_fraction=0.3, overlap_fraction=0.05, novel_fraction=0.05, end_Ns_fraction=0.3, seed=42):
+        '''gaps = total number of gaps, split evenly between contigs.
+           flanking_bases = the number of flanking bases that will be used for
+           gap filling. Blocks are at least this long, so that every flank
+           is entirely one block.
+           gap_length = (min, max) length of reference sequence missing at each gap.
+           gap_length_diff = max difference between the number of Ns and the
+           length of missing reference sequence.
+           block_length = (min, max) length of each block. Default is
+           (2 * flanking_bases, 4 * flanking_bases)'''
+        if gaps < 0 or contigs < 1 or flanking_bases < 1:
+            raise Error('gaps must be at least 0, and contigs and flanking_bases at least 1')
+
+        self.gaps = gaps
+        self.contigs = contigs
+        self.flanking_bases = flanking_bases
+        self.gap_length = gap_length
+        self.gap_length_diff = gap_length_diff
+        self.block_length = block_length if block_length is not None else (2 * flanking_bases, 4 * flanking_bases)
+        self.reverse_fraction = reverse_fraction
+        self.overlap_fraction = overlap_fraction
+        self.novel_fraction = novel_fraction
+        self.end_Ns_fraction = end_Ns_fraction
+        self.seed = seed
+        self.kmer = min(32, flanking_bases)
+
+        if self.block_length[0] < flanking_bases + 50:
+            raise Error('Minimum block length must be at least flanking_bases + 50')
+
+        # (end, kmer) -> (ref name, ref start, ref end, is_reverse), where end is
+        # 'start' or 'end', and kmer is the first or last bases of a block
+        self.block_ends = {}
+        self.ref_lengths = {}
+
+
+    def _contig(self, rand, gaps):
+        '''Returns tuple (reference sequence, list of pieces of the assembly contig).
+           Each piece is a tuple (sequence, (ref start, ref end)), where the
+           ref coords are None if the piece is Ns or not in the reference'''
+        ref_seq = []
+        ref_length = 0
+        pieces = []
+        previous_block = None
+
+        def random_seq(length):
+            return rand.randbytes(length).translate(_random_bases).decode()
+
+        for i in range(gaps + 1):
+            block_length = rand.randint(*self.block_length)
+
+            if i > 0:
+                if previous_block is not None and rand.random() < self.overlap_fraction:
+                    overlap = rand.randint(10, self.flanking_bases // 2)
+                    pieces.append(('N' * rand.randint(1, 50), None))
+                else:
+                    overlap = 0
+                    missing_length = rand.randint(*self.gap_length)
+                    ref_seq.append(random_seq(missing_length))
+                    ref_length += missing_length
+                    n_length = max(1, missing_length + rand.randint(-self.gap_length_diff, self.gap_length_diff))
+                    pieces.append(('N' * n_length, None))
+            else:
+                overlap = 0
+
+            if i > 0 and rand.random() < self.novel_fraction:
+                pieces.append((random_seq(block_length), None))
+                previous_block = None
+            else:
+                new_seq = random_seq(block_length - overlap)
+                if overlap:
+                    block_seq = ref_seq[-1][-overlap:] + new_seq
+                else:
+                    block_seq = new_seq
+                previous_block = (ref_length - overlap, ref_length + len(new_seq) - 1)
+                pieces.append((block_seq, previous_block))
+                ref_seq.append(new_seq)
+                ref_length += len(new_seq)
+
+        return ''.join(ref_seq), pieces
+
+
+    def write(self, reference_fasta, assembly_fasta, gaps_tsv=None):
+        '''Writes the reference and gapped assembly FASTA files. If gaps_tsv is
+           given, writes a file of the known gap positions in the assembly'''
+        rand = random.Random(self.seed)
+        f_ref = utils.open_file_write(reference_fasta)
+        f_asm = utils.open_file_write(assembly_fasta)
+        f_gaps = None if gaps_tsv is None else utils.open_file_write(gaps_tsv)
+        if f_gaps is not None:
+            print('#contig', 'gap_start', 'gap_end', sep='\t', file=f_gaps)
+        self.block_ends = {}
+        self.ref_lengths = {}
+
+        for contig_number in range(self.contigs):
+            gaps = self.gaps // self.contigs + (1 if contig_number < self.gaps % self.contigs else 0)
+            ref_name = 'ref' + str(contig_number + 1)
+            ref_seq, pieces = self._contig(rand, gaps)
+            self.ref_lengths[ref_name] = len(ref_seq)
+            print(sequences.Fasta(ref_name, ref_seq), file=f_ref)
+            is_reverse = rand.random() < self.reverse_fraction
+
+            if is_reverse:
+                pieces = [(_revcomp(seq), coords) for seq, coords in reversed(pieces)]
+
+            if rand.random() < self.end_Ns_fraction:
+                pieces.insert(0, ('N' * rand.randint(1, 100), None))
+            if rand.random() < self.end_Ns_fraction:
+                pieces.append(('N' * rand.randint(1, 100), None))
+
+            position = 0
+            contig_length = sum(len(x[0]) for x in pieces)
+            for seq, coords in pieces:
+                if coords is not None:
+                    self.block_ends[('start', seq[:self.kmer])] = (ref_name, coords[0], coords[1], is_reverse)
+                    self.block_ends[('end', seq[-self.kmer:])] = (ref_name, coords[0], coords[1], is_reverse)
+                elif f_gaps is not None and seq[0] == 'N' and 0 < position and position + len(seq) < contig_length:
+                    print('asm' + str(contig_number + 1), position + 1, position + len(seq), sep='\t', file=f_gaps)
+                position += len(seq)
+
+            print(sequences.Fasta('asm' + str(contig_number + 1), ''.join(x[0] for x in pieces)), file=f_asm)
+
+        utils.close(f_ref)
+        utils.close(f_asm)
+        if f_gaps is not None:
+            utils.close(f_gaps)
+
+
+class StandInAligner:
+    '''Writes SAM files of hits of gap flanks to the reference made by a Generator,
+       which must have already written its files'''
+    def __init__(self, generator):
+        self.generator = generator
+
+    def _sam_header(self):
+        lines = ['@HD\tVN:1.0\tSO:unsorted']
+        for ref_name, length in self.generator.ref_lengths.items():
+            lines.append('@SQ\tSN:' + ref_name + '\tLN:' + str(length))
+        return '\n'.join(lines)
+
+    def sam_line(self, name, seq):
+        '''Returns the SAM line for one flank'''
+        k = self.generator.kmer
+        if name.endswith('.left'):
+            block = self.generator.block_ends.get(('end', seq[-k:]))
+        else:
+            block = self.generator.block_ends.get(('start', seq[:k]))
+
+        if block is None or len(seq) < k:
+            return '\t'.join([name, '4', '*', '0', '0', '*', '*', '0', '0', seq, '*'])
+
+        ref_name, block_start, block_end, is_reverse = block
+        # left flanks end at the end of a block, right flanks start at the start
+        # of a block, in the orientation of the assembly
+        if name.endswith('.left') != is_reverse:
+            ref_start = block_end - len(seq) + 1
+        else:
+            ref_start = block_start
+
+        if is_reverse:
+            flag = '16'
+            seq = _revcomp(seq)
+        else:
+            flag = '0'
+
+        return '\t'.join([name, flag, ref_name, str(ref_start + 1), '60', str(len(seq)) + 'M', '*', '0', '0', seq, '*'])
+
+    def map(self, flanks_fasta, sam_out):
+        f = utils.open_file_write(sam_out)
+        print(self._sam_header(), file=f)
+        for seq in sequences.file_reader(flanks_fasta):
+            print(self.sam_line(seq.id, seq.seq), file=f)
+        utils.close(f)
@@ -0,0 +1,119 @@
+'''Deterministic generator of synthetic reference GFF3 files and matching
+Cufflinks GTF files, for benchmarking the GFF and UTR code.'''
+
+import random
+from pyfastaq import utils
+
+class Error (Exception): pass
+
+
+class Generator:
+    def __init__(self, genes=1000, isoforms=2, exons=4, overlap=0.05, seqs=10, cufflinks_fraction=0.8, seed=42):
+        '''genes = total number of genes, split evenly between seqs sequences.
+           isoforms = max number of transcripts per gene.
+           exons = number of exons in the longest transcript of each gene.
+           overlap = fraction of genes that overlap the previous gene.
+           cufflinks_fraction = fraction of genes that have a cufflinks transcript,
+           which extends past the gene at one or both ends'''
+        if genes < 1 or isoforms < 1 or exons < 1 or seqs < 1:
+            raise Error('genes, isoforms, exons and seqs must all be at least 1')
+        if not (0 <= overlap <= 1 and 0 <= cufflinks_fraction <= 1):
+            raise Error('overlap and cufflinks_fraction must be between 0 and 1')
+
+        self.genes = genes
+        self.isoforms = isoforms
+        self.exons = exons
+        self.overlap = overlap
+        self.seqs = seqs
+        self.cufflinks_fraction = cufflinks_fraction
+        self.seed = seed
+
+    def _gene_models(self):
+        '''Yields tuples (seqname, gene number, strand, list of transcripts),
+           where each transcript is a list of (start, end) exon coords'''
+        rand = random.Random(self.seed)
+        gene_number = 0
+
+        for seq_number in range(self.seqs):
+            seqname = 'seq' + str(seq_number + 1)
+            genes_on_seq = self.genes // self.seqs + (1 if seq_number < self.genes % self.seqs else 0)
+            position = 1000
+            previous_end = None
+
+            for i in range(genes_on_seq):
+                gene_number += 1
+                if previous_end is not None and rand.random() < self.overlap:
+                    start = max(1, previous_end - rand.randint(50, 500))
+                else:
+                    start = position + rand.randint(500, 2000)
+
+                exon_coords = []
+                pos = start
+                for j in range(self.exons):
+                    length = rand.randint(100, 300)
+                    exon_coords.append((pos, pos + length - 1))
+                    pos += length + rand.randint(50, 200)
+
+                transcripts = [exon_coords]
+                for j in range(1, rand.randint(1, self.isoforms)):
+                    skip = rand.randrange(len(exon_coords))
+                    isoform = [x for k, x in enumerate(exon_coords) if k != skip or len(exon_coords) == 1]
+                    transcripts.append(isoform)
+
+                strand = rand.choice(['+', '-'])
+                yield seqname, gene_number, strand, transcripts
+                previous_end = exon_coords[-1][1]
+                position = max(position, previous_end)
+
+    def write_ref_gff(self, filename):
+        '''Writes reference GFF3 file, using gene/mRNA/CDS features'''
+        f = utils.open_file_write(filename)
+        print('##gff-version 3', file=f)
+
+        for seqname, gene_number, strand, transcripts in self._gene_models():
+            gene_id = 'gene' + str(gene_number)
+            start = min(t[0][0] for t in transcripts)
+            end = max(t[-1][1] for t in transcripts)
+            print(seqname, 'bench', 'gene', start, end, '.', strand, '.', 'ID=' + gene_id, sep='\t', file=f)
+            for i, exon_coords in enumerate(transcripts):
+                transcript_id = gene_id + '.' + str(i + 1)
+                print(seqname, 'bench', 'mRNA', exon_coords[0][0], exon_coords[-1][1], '.', strand, '.', 'ID=' + transcript_id + ';Parent=' + gene_id, sep='\t', file=f)
+                for j, (exon_start, exon_end) in enumerate(exon_coords):
+                    print(seqname, 'bench', 'CDS', exon_start, exon_end, '.', strand, '0', 'ID=' + transcript_id + ':CDS:' + str(j + 1) + ';Parent=' + transcript_id, sep='\t', file=f)
+
+        utils.close(f)
+
+    def write_cufflinks_gtf(self, filename):
+        '''Writes a Cufflinks-style transcripts.gtf file, with transcripts that
+           match the first isoform of each gene, but have extra exons or
+           longer first/last exons to make UTRs'''
+        f = utils.open_file_write(filename)
+        rand = random.Random(self.seed + 1)
+
+        for seqname, gene_number, strand, transcripts in self._gene_models():
+            if rand.random() >= self.cufflinks_fraction:
+                continue
+
+            exon_coords = list(transcripts[0])
+            extend = rand.choice(['start', 'end', 'both'])
+            if extend in ['start', 'both']:
+                if rand.random() < 0.5:
+                    exon_coords[0] = (max(1, exon_coords[0][0] - rand.randint(20, 200)), exon_coords[0][1])
+                else:
+                    new_end = exon_coords[0][0] - rand.randint(50, 200)
+                    exon_coords.insert(0, (max(1, new_end - rand.randint(50, 200)), max(1, new_end)))
+            if extend in ['end', 'both']:
+                if rand.random() < 0.5:
+                    exon_coords[-1] = (exon_coords[-1][0], exon_coords[-1][1] + rand.randint(20, 200))
+                else:
+                    new_start = exon_coords[-1][1] + rand.randint(50, 200)
+                    exon_coords.append((new_start, new_start + rand.randint(50, 200)))
+
+            gene_id = 'CUFF.' + str(gene_number)
+            transcript_id = gene_id + '.1'
+            atts = 'gene_id "' + gene_id + '"; transcript_id "' + transcript_id + '"'
+            print(seqname, 'Cufflinks', 'transcript', exon_coords[0][0], exon_coords[-1][1], '1000', strand, '.', atts + '; FPKM "1.0";', sep='\t', file=f)
+            for i, (start, end) in enumerate(exon_coords):
+                print(seqname, 'Cufflinks', 'exon', start, end, '1000', strand, '.', atts + '; exon_number "' + str(i + 1) + '";', sep='\t', file=f)
+
+        utils.close(f)
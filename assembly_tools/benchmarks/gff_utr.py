@@ -0,0 +1,101 @@
+'''Benchmarks of the GFF reader and the UTR annotation code, using synthetic data.
+Run with: python3 -m assembly_tools.benchmarks.gff_utr --help'''
+
+import argparse
+import os
+import tempfile
+from assembly_tools import file_readers
+from assembly_tools.annotate_utrs_using_cufflinks import helper
+from assembly_tools.benchmarks import gff_data, results
+
+
+def _read_all_records(filename):
+    for g in file_readers.gff.file_reader(filename):
+        pass
+
+
+def _extend_all(genes):
+    ref_genes, cufflinks_genes = genes
+    for seqname, ref_gene_list in ref_genes.items():
+        if seqname in cufflinks_genes:
+            helper.extend_ref_genes(ref_gene_list, cufflinks_genes[seqname])
+
+
+def _remove_transcripts(ref_genes):
+    for gene_list in ref_genes.values():
+        for g in gene_list:
+            g.remove_all_but_longest_transcript()
+
+
+def _serialize(gff_records):
+    return '\n'.join([str(x) for x in gff_records])
+
+
+def _all_gff_records(filename):
+    ref_genes, other = helper.load_ref_gff(filename)
+    records = []
+    for gene_list in ref_genes.values():
+        for g in gene_list:
+            records += g.to_gff_list()
+    return records
+
+
+def run_one_size(generator, outdir, repeats=3):
+    '''Returns dict of benchmark name -> fastest time in seconds'''
+    prefix = os.path.join(outdir, 'genes_' + str(generator.genes))
+    ref_gff = prefix + '.ref.gff'
+    cufflinks_gtf = prefix + '.cufflinks.gtf'
+    generator.write_ref_gff(ref_gff)
+    generator.write_cufflinks_gtf(cufflinks_gtf)
+
+    return {
+        'file_reader': results.time_function(lambda: _read_all_records(ref_gff), repeats=repeats),
+        'load_ref_gff': results.time_function(lambda: helper.load_ref_gff(ref_gff), repeats=repeats),
+        'load_cufflinks_gtf': results.time_function(lambda: helper.load_cufflinks_gtf(cufflinks_gtf), repeats=repeats),
+        'extend': results.time_function(_extend_all, repeats=repeats, setup=lambda: (helper.load_ref_gff(ref_gff)[0], helper.load_cufflinks_gtf(cufflinks_gtf))),
+        'remove_all_but_longest_transcript': results.time_function(_remove_transcripts, repeats=repeats, setup=lambda: helper.load_ref_gff(ref_gff)[0]),
+        'serialize': results.time_function(_serialize, repeats=repeats, setup=lambda: _all_gff_records(ref_gff)),
+    }
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = 'Benchmarks GFF reading and UTR annotation on synthetic data of several sizes',
+        usage = 'python3 -m assembly_tools.benchmarks.gff_utr [options]')
+    parser.add_argument('--genes', help='Comma-separated list of numbers of genes to test [%(default)s]', default='1000,10000,100000', metavar='INT,INT,...')
+    parser.add_argument('--isoforms', type=int, help='Max transcripts per gene [%(default)s]', default=2, metavar='INT')
+    parser.add_argument('--exons', type=int, help='Exons per transcript [%(default)s]', default=4, metavar='INT')
+    parser.add_argument('--overlap', type=float, help='Fraction of genes that overlap the previous gene [%(default)s]', default=0.05, metavar='FLOAT')
+    parser.add_argument('--seqs', type=int, help='Number of reference sequences [%(default)s]', default=10, metavar='INT')
+    parser.add_argument('--seed', type=int, help='Random number seed [%(default)s]', default=42, metavar='INT')
+    parser.add_argument('--repeats', type=int, help='Run each benchmark this many times and report the fastest [%(default)s]', default=3, metavar='INT')
+    parser.add_argument('--outdir', help='Directory in which to write the synthetic data. Default is a temporary directory, deleted at the end', metavar='DIRNAME')
+    parser.add_argument('--results', help='File of results, which each run is appended to [%(default)s]', default='benchmark_results.jsonl', metavar='FILENAME')
+    parser.add_argument('--compare', help='After running, compare the timings with those stored for this commit', metavar='COMMIT')
+    options = parser.parse_args()
+
+    tmpdir = None
+    if options.outdir is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix='tmp.benchmark.gff_utr.')
+        outdir = tmpdir.name
+    else:
+        outdir = options.outdir
+        os.makedirs(outdir, exist_ok=True)
+
+    for genes in [int(x) for x in options.genes.split(',')]:
+        generator = gff_data.Generator(genes=genes, isoforms=options.isoforms, exons=options.exons, overlap=options.overlap, seqs=options.seqs, seed=options.seed)
+        params = {'genes': genes, 'isoforms': options.isoforms, 'exons': options.exons, 'overlap': options.overlap, 'seqs': options.seqs, 'seed': options.seed}
+        timings = run_one_size(generator, outdir, repeats=options.repeats)
+        results.append(options.results, 'gff_utr', params, timings)
+        for name, seconds in timings.items():
+            print('genes=' + str(genes), name, '{:.4f}'.format(seconds), sep='\t')
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+    if options.compare:
+        print(*results.compare(options.results, options.compare), sep='\n')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,93 @@
+'''Storage of benchmark results, so that timings can be compared between commits.
+Results are appended to a JSON Lines file, one line per benchmark and size.'''
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+
+class Error (Exception): pass
+
+
+def git_commit():
+    '''Returns the commit of the assembly_tools source tree, or None if it is not a git repository'''
+    repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.decode().strip()
+
+
+def time_function(function, repeats=3, setup=None):
+    '''Runs function repeats times and returns the fastest wall time in seconds.
+       If given, setup is called before each repeat and its return value
+       is passed to function. setup is not included in the timing'''
+    best = None
+    for i in range(repeats):
+        args = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is None:
+            function()
+        else:
+            function(args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def append(filename, suite, params, timings):
+    '''Appends one result line to filename. params is a dict of the benchmark
+       size parameters and timings is a dict of name -> seconds'''
+    result = {
+        'suite': suite,
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'params': params,
+        'timings': timings,
+    }
+    with open(filename, 'a') as f:
+        print(json.dumps(result, sort_keys=True), file=f)
+
+
+def load(filename):
+    results = []
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                results.append(json.loads(line))
+    return results
+
+
+def compare(filename, old_commit, new_commit=None):
+    '''Returns a list of lines comparing the timings of old_commit and new_commit
+       (default is the current commit). Where a commit has more than one result
+       for the same benchmark, the latest one is used'''
+    if new_commit is None:
+        new_commit = git_commit()
+
+    latest = {}
+    for result in load(filename):
+        key = (result['suite'], json.dumps(result['params'], sort_keys=True))
+        latest.setdefault(result['commit'], {})[key] = result['timings']
+
+    for commit in old_commit, new_commit:
+        if commit not in latest:
+            raise Error('No results found for commit ' + str(commit) + ' in file ' + filename)
+
+    lines = ['\t'.join(['suite', 'params', 'benchmark', old_commit, new_commit, 'ratio'])]
+    for key in sorted(latest[new_commit]):
+        if key not in latest[old_commit]:
+            continue
+        old_timings = latest[old_commit][key]
+        new_timings = latest[new_commit][key]
+        for name in sorted(new_timings):
+            if name in old_timings:
+                ratio = new_timings[name] / old_timings[name] if old_timings[name] > 0 else float('inf')
+                lines.append('\t'.join([key[0], key[1], name, '{:.4f}'.format(old_timings[name]), '{:.4f}'.format(new_timings[name]), '{:.2f}'.format(ratio)]))
+
+    return lines
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from assembly_tools.benchmarks import gap_fill_data
+from assembly_tools.fill_gaps_using_reference import gap, gap_registry, helper
+
+class TestGapFillData(unittest.TestCase):
+    def test_generator_and_stand_in_aligner(self):
+        '''Test synthetic data and stand-in aligner work with gap filling'''
+        tmp_prefix = 'tmp.gap_fill_data_test'
+        generator = gap_fill_data.Generator(gaps=60, contigs=3, flanking_bases=50, overlap_fraction=0.2, novel_fraction=0.1, reverse_fraction=0.5, seed=2)
+        generator.write(tmp_prefix + '.ref.fa', tmp_prefix + '.asm.fa', tmp_prefix + '.gaps.tsv')
+
+        with open(tmp_prefix + '.gaps.tsv') as f:
+            self.assertEqual(61, len(f.readlines()))
+
+        gaps = gap_registry.GapRegistry()
+        helper.find_gaps_and_write_flanks(tmp_prefix + '.asm.fa', 50, tmp_prefix + '.flanks.fa', gaps)
+        self.assertEqual(60, len(gaps))
+        gap_fill_data.StandInAligner(generator).map(tmp_prefix + '.flanks.fa', tmp_prefix + '.sam')
+        helper.parse_sam_file(tmp_prefix + '.sam', gaps)
+        gap_types = set([gaps.gap(i).gap_type for i in range(len(gaps))])
+        self.assertEqual(gap_types, {gap.SAME_SEQ_STRAND, gap.SAME_SEQ_STRAND_OVERLAP, gap.UNMAPPED})
+        reverse_hits = set([gaps.gap(i).reverse_hit for i in range(len(gaps)) if gaps.gap(i).gap_type == gap.SAME_SEQ_STRAND])
+        self.assertEqual(reverse_hits, {True, False})
+
+        for suffix in ['.ref.fa', '.asm.fa', '.gaps.tsv', '.flanks.fa', '.sam']:
+            os.unlink(tmp_prefix + suffix)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import filecmp
+import os
+import unittest
+from assembly_tools.annotate_utrs_using_cufflinks import helper
+from assembly_tools.benchmarks import gff_data
+
+class TestGenerator(unittest.TestCase):
+    def test_init_bad_options(self):
+        '''Test constructor fails with bad options'''
+        with self.assertRaises(gff_data.Error):
+            gff_data.Generator(genes=0)
+        with self.assertRaises(gff_data.Error):
+            gff_data.Generator(overlap=1.1)
+
+    def test_write_files(self):
+        '''Test files written are deterministic and can be loaded'''
+        tmp_prefix = 'tmp.gff_data_test'
+        generator = gff_data.Generator(genes=50, isoforms=3, exons=3, seqs=3)
+        generator.write_ref_gff(tmp_prefix + '.1.gff')
+        generator.write_ref_gff(tmp_prefix + '.2.gff')
+        self.assertTrue(filecmp.cmp(tmp_prefix + '.1.gff', tmp_prefix + '.2.gff', shallow=False))
+        generator.write_cufflinks_gtf(tmp_prefix + '.gtf')
+
+        ref_genes, other = helper.load_ref_gff(tmp_prefix + '.1.gff')
+        self.assertEqual(['seq1', 'seq2', 'seq3'], sorted(ref_genes))
+        self.assertEqual(50, sum([len(x) for x in ref_genes.values()]))
+        self.assertEqual({}, other)
+        for gene_list in ref_genes.values():
+            for g in gene_list:
+                self.assertTrue(1 <= len(g.transcripts) <= 3)
+
+        cufflinks_genes = helper.load_cufflinks_gtf(tmp_prefix + '.gtf')
+        self.assertTrue(0 < sum([len(x) for x in cufflinks_genes.values()]) <= 50)
+
+        extended = 0
+        for seqname, gene_list in ref_genes.items():
+            for record in helper.extend_ref_genes(gene_list, cufflinks_genes.get(seqname, [])):
+                if record.feature.endswith('UTR'):
+                    extended += 1
+        self.assertGreater(extended, 0)
+
+        for suffix in ['.1.gff', '.2.gff', '.gtf']:
+            os.unlink(tmp_prefix + suffix)
+
+
+if __name__ == '__main__':
+    unittest.main()
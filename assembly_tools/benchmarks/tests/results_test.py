@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import unittest
+from assembly_tools.benchmarks import results
+
+class TestResults(unittest.TestCase):
+    def test_time_function(self):
+        '''Test time_function() calls setup before each repeat'''
+        calls = []
+        seconds = results.time_function(lambda x: calls.append(x), repeats=3, setup=lambda: 'setup')
+        self.assertEqual(calls, ['setup'] * 3)
+        self.assertGreaterEqual(seconds, 0)
+
+    def test_append_load_and_compare(self):
+        '''Test append(), load() and compare()'''
+        tmp_file = 'tmp.results_test.jsonl'
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        results.append(tmp_file, 'suite', {'size': 1}, {'x': 2.0, 'y': 1.0})
+        results.append(tmp_file, 'suite', {'size': 1}, {'x': 1.0, 'y': 1.0})
+        got = results.load(tmp_file)
+        self.assertEqual(2, len(got))
+        self.assertEqual(got[1]['timings'], {'x': 1.0, 'y': 1.0})
+
+        # append() always uses the current commit, so rewrite the file with the
+        # commits we want to compare
+        got[0]['commit'] = 'old'
+        got[1]['commit'] = 'new'
+        with open(tmp_file, 'w') as f:
+            for result in got:
+                print(json.dumps(result), file=f)
+
+        lines = results.compare(tmp_file, 'old', 'new')
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].endswith('\tx\t2.0000\t1.0000\t0.50'))
+        self.assertTrue(lines[2].endswith('\ty\t1.0000\t1.0000\t1.00'))
+
+        with self.assertRaises(results.Error):
+            results.compare(tmp_file, 'old', 'not_there')
+        os.unlink(tmp_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+'''Lets a run that was stopped part way through be restarted without redoing
+the stages that had already finished. Each finished stage is recorded in a
+JSON manifest in the work directory, with a key and the files it made. The
+key of a stage is a hash of the inputs and options that it depends on,
+usually including the key of the stage before it. A stage is skipped when
+the manifest has the same key for it and all of its files still exist, so
+changing an input or option reruns the stages that depend on it.
+
+A Manifest made with no work directory never skips anything, so code can
+use one whether or not checkpointing was asked for.'''
+
+import hashlib
+import json
+import os
+
+class Error (Exception): pass
+
+
+def key(*parts):
+    '''Returns a key made from parts, which must be JSON serializable'''
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class Manifest:
+    def __init__(self, work_dir=None):
+        self.work_dir = work_dir
+        self.stages = {}
+
+        if self.work_dir is None:
+            self.filename = None
+            return
+
+        self.filename = os.path.join(self.work_dir, 'manifest.json')
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename) as f:
+                    self.stages = json.load(f)['stages']
+            except (ValueError, KeyError):
+                raise Error('Error reading checkpoint manifest file ' + self.filename + '. Delete it to start again')
+
+
+    def done(self, stage, stage_key):
+        '''Returns True if the stage finished with the same key, and its files still exist'''
+        if stage not in self.stages or self.stages[stage]['key'] != stage_key:
+            return False
+        return all(os.path.exists(x) for x in self.stages[stage]['files'])
+
+
+    def info(self, stage):
+        '''Returns the info that was stored when the stage finished'''
+        return self.stages[stage]['info']
+
+
+    def finish(self, stage, stage_key, files=None, info=None):
+        '''Records that the stage has finished, making the files in the list files.
+           info is anything JSON serializable that a later run needs when the stage is skipped'''
+        if self.filename is None:
+            return
+
+        self.stages[stage] = {
+            'key': stage_key,
+            'files': [] if files is None else files,
+            'info': info,
+        }
+
+        # written to a temporary file first, so that the manifest is never
+        # left half written if the run is killed
+        tmp_file = self.filename + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'stages': self.stages}, f, indent=2)
+        os.replace(tmp_file, self.filename)
+
+
+    def delete(self, keep=None):
+        '''Deletes the files of all the stages, except those in the list keep, and the
+           manifest. The work directory is also deleted, if it is then empty'''
+        if self.filename is None:
+            return
+
+        keep = set() if keep is None else set(keep)
+        for stage in self.stages.values():
+            for filename in stage['files']:
+                if filename not in keep and os.path.exists(filename):
+                    os.unlink(filename)
+
+        self.stages = {}
+        if os.path.exists(self.filename):
+            os.unlink(self.filename)
+
+        try:
+            os.rmdir(self.work_dir)
+        except OSError:
+            pass
@@ -0,0 +1,61 @@
+'''Collects warnings raised when reading messy input in lenient mode.
+Warnings are counted by category and only the first few examples of each
+category are kept, so that files with very many bad records do not spend
+their time writing to stderr. Call report() at the end of a run to output
+a single summary.'''
+
+import sys
+from pyfastaq import utils
+
+
+class Collector:
+    def __init__(self, max_examples=5):
+        self.max_examples = max_examples
+        self.clear()
+
+    def clear(self):
+        self.counts = {}
+        self.examples = {}
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def add(self, category, message):
+        '''Records one warning. message can be a string, or a function that
+           returns a string, which is only called if the example is kept'''
+        count = self.counts.get(category, 0)
+        self.counts[category] = count + 1
+
+        if count < self.max_examples:
+            if callable(message):
+                message = message()
+            self.examples.setdefault(category, []).append(message)
+
+    def summary(self):
+        lines = ['Warnings summary. Total warnings: ' + str(len(self))]
+        for category in sorted(self.counts):
+            lines.append(category + '\t' + str(self.counts[category]))
+            for example in self.examples.get(category, []):
+                lines.append('\t' + example.rstrip().replace('\n', '\n\t'))
+            if self.counts[category] > len(self.examples.get(category, [])):
+                lines.append('\t... (' + str(self.counts[category] - len(self.examples[category])) + ' more)')
+
+        return '\n'.join(lines)
+
+    def report(self, filename=None):
+        '''Writes the summary to filename. If filename is None, writes it
+           to stderr, but only if there were any warnings'''
+        if filename is None:
+            if len(self):
+                print(self.summary(), file=sys.stderr)
+        else:
+            f = utils.open_file_write(filename)
+            print(self.summary(), file=f)
+            utils.close(f)
+
+
+collector = Collector()
+
+
+def warn(category, message):
+    collector.add(category, message)
@@ -1,2 +1,3 @@
-__all__ = ['gff']
-from assembly_tools.file_readers import *
+__all__ = ['fasta', 'gff']
+from assembly_tools import _lazy_loader
+__getattr__ = _lazy_loader(__name__, __all__)
@@ -0,0 +1,181 @@
+'''Reads an uncompressed FASTA file through a memory map. The file is indexed
+in memory when it is opened, like samtools faidx, by finding where each
+sequence starts and the length of its lines. Runs of Ns are found by
+searching the mapping directly, with gap_scanner.n_run_bounds(), so a
+contig is never copied just to look for its gaps, and only the bases asked
+for by fetch() are copied out of the mapping, with the line breaks removed.
+
+Indexing needs all the lines of a sequence, except its last, to be the
+same length. open_indexed() returns None for files that cannot be read this
+way (eg gzipped, FASTQ, or lines of different lengths), so that the caller
+can fall back to reading the file in the usual way.'''
+
+import mmap
+import re
+from assembly_tools.fill_gaps_using_reference import gap_scanner
+
+class Error (Exception): pass
+
+_not_n_or_newline_regex = re.compile(rb'[^Nn\r\n]')
+
+
+class _Record:
+    __slots__ = ('name', 'length', 'offset', 'end', 'line_bases', 'line_bytes')
+
+    def __init__(self, name, length, offset, end, line_bases, line_bytes):
+        self.name = name
+        self.length = length
+        self.offset = offset
+        self.end = end
+        self.line_bases = line_bases
+        self.line_bytes = line_bytes
+
+
+    def file_position(self, position):
+        '''Returns position in the file of zero-based position in the sequence'''
+        if self.line_bases == 0:
+            return self.offset
+        return self.offset + (position // self.line_bases) * self.line_bytes + position % self.line_bases
+
+
+    def seq_position(self, file_position):
+        '''Returns position in the sequence of position in the file, or of the
+           next base in the sequence if file_position is at a line break'''
+        i = file_position - self.offset
+        return (i // self.line_bytes) * self.line_bases + min(i % self.line_bytes, self.line_bases)
+
+
+class IndexedFasta:
+    def __init__(self, filename):
+        '''Raises Error if the file cannot be memory mapped and indexed'''
+        self.filename = filename
+        self.records = []
+        self.name_to_record = {}
+
+        with open(filename, 'rb') as f:
+            if f.read(1) != b'>':
+                raise Error('File does not look like an uncompressed FASTA file: ' + filename)
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._index()
+        except:
+            self.close()
+            raise
+
+
+    def _index(self):
+        position = 0
+        while position < len(self.mapping):
+            header_end = self.mapping.find(b'\n', position)
+            if header_end == -1:
+                header_end = len(self.mapping)
+            name = self.mapping[position + 1:header_end].rstrip().decode()
+            if name in self.name_to_record:
+                raise Error('Duplicate sequence name "' + name + '" in FASTA file ' + self.filename)
+
+            offset = min(header_end + 1, len(self.mapping))
+            end = self.mapping.find(b'\n>', header_end)
+            end = len(self.mapping) if end == -1 else end + 1
+            record = self._index_record(name, offset, end)
+            self.records.append(record)
+            self.name_to_record[name] = record
+            position = end
+
+
+    def _index_record(self, name, offset, end, chunk_lines=262144):
+        '''Returns _Record of the sequence in the file from offset to end, checking
+           that all its lines, except the last, are the same length'''
+        if offset == end:
+            return _Record(name, 0, offset, end, 0, 0)
+
+        first_line_end = self.mapping.find(b'\n', offset, end)
+        if first_line_end == -1:
+            first_line_end = end
+        line_bytes = first_line_end + 1 - offset
+        line_bases = len(self.mapping[offset:first_line_end].rstrip(b'\r'))
+        full_lines, last_line_bytes = divmod(end - offset, line_bytes)
+
+        # Every full line must end with a line break, and there must be no
+        # other line breaks, except at the end of the last line. Both are
+        # checked a large chunk of whole lines at a time
+        line_breaks = 0
+        for chunk_start in range(offset, end, chunk_lines * line_bytes):
+            chunk = self.mapping[chunk_start:min(chunk_start + chunk_lines * line_bytes, end)]
+            line_ends = chunk[line_bytes - 1::line_bytes]
+            if line_ends.count(b'\n') != len(line_ends):
+                raise Error('Lines of sequence "' + name + '" are not all the same length in FASTA file ' + self.filename)
+            line_breaks += chunk.count(b'\n')
+
+        length = full_lines * line_bases
+        if last_line_bytes:
+            last_line = self.mapping[end - last_line_bytes:end]
+            length += len(last_line.rstrip(b'\r\n'))
+            if last_line.endswith(b'\n'):
+                line_breaks -= 1
+
+        if line_breaks != full_lines:
+            raise Error('Lines of sequence "' + name + '" are not all the same length in FASTA file ' + self.filename)
+
+        return _Record(name, length, offset, end, line_bases, line_bytes)
+
+
+    def close(self):
+        self.mapping.close()
+
+
+    def names(self):
+        '''Returns list of the sequence names, in file order. Names are the whole header line, as in pyfastaq'''
+        return [x.name for x in self.records]
+
+
+    def length(self, name):
+        return self.name_to_record[name].length
+
+
+    def fetch(self, name, start=0, end=None):
+        '''Returns bytes of the sequence from zero-based start to end, not including end, like a slice'''
+        record = self.name_to_record[name]
+        end = record.length if end is None else min(end, record.length)
+        if start >= end:
+            return b''
+        return self.mapping[record.file_position(start):record.file_position(end)].translate(None, b'\r\n')
+
+
+    def n_runs(self, name):
+        '''Returns tuple of two lists (starts, ends) of the zero-based coords of the runs of
+           N or n in a sequence, found without copying it. Ends are inclusive, as in
+           pyfastaq's Fasta.gaps(). A run can carry on over line breaks'''
+        record = self.name_to_record[name]
+        starts, ends = gap_scanner.n_run_bounds(self.mapping, record.offset, record.end, regex=_not_n_or_newline_regex)
+        return [record.seq_position(x) for x in starts], [min(record.seq_position(x), record.length) - 1 for x in ends]
+
+
+    def trimmed_contigs(self):
+        '''Yields tuples (name, start, end, gap starts, gap ends) of each sequence after
+           Ns are trimmed from both ends, in file order. start and end are the coords
+           of the trimmed sequence in the untrimmed one, not including end. The gap coords
+           are of the runs of Ns in the trimmed sequence, as returned by n_runs().
+           Sequences that are all Ns are skipped, like helper.trimmed_seqs()'''
+        for record in self.records:
+            starts, ends = self.n_runs(record.name)
+            start = 0
+            end = record.length
+
+            if len(starts) and starts[0] == 0:
+                start = ends[0] + 1
+                starts, ends = starts[1:], ends[1:]
+            if len(starts) and ends[-1] == record.length - 1:
+                end = starts[-1]
+                starts, ends = starts[:-1], ends[:-1]
+
+            if start < end:
+                yield record.name, start, end, [x - start for x in starts], [x - start for x in ends]
+
+
+def open_indexed(filename):
+    '''Returns an IndexedFasta of the file, or None if it cannot be read that way'''
+    try:
+        return IndexedFasta(filename)
+    except (Error, OSError, ValueError):
+        return None
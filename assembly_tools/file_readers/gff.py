@@ -1,6 +1,6 @@
 from pyfastaq import utils, intervals
 import re
-import sys
+from assembly_tools import diagnostics
 
 class Error (Exception): pass
 
@@ -71,7 +71,7 @@ class GFF_record:
                             key = att
                             val = None
                             if warnings:
-                                print(error_message, file=sys.stderr)
+                                diagnostics.warn('GFF attribute not a key/value pair', error_message)
                         else:
                             raise Error(error_message)
 
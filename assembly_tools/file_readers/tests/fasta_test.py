@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+import assembly_tools.file_readers.fasta as fasta
+
+modules_dir = os.path.dirname(os.path.abspath(fasta.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+class TestIndexedFasta(unittest.TestCase):
+    def test_names_and_length(self):
+        '''Test names and length'''
+        f = fasta.IndexedFasta(os.path.join(data_dir, 'fasta_test.fa'))
+        self.assertEqual(['seq1 description', 'seq2', 'seq3', 'seq4'], f.names())
+        self.assertEqual([16, 8, 7, 12], [f.length(x) for x in f.names()])
+        f.close()
+
+
+    def test_fetch(self):
+        '''Test fetch'''
+        f = fasta.IndexedFasta(os.path.join(data_dir, 'fasta_test.fa'))
+        self.assertEqual(b'NNACGTNNNNNACGTA', f.fetch('seq1 description'))
+        self.assertEqual(b'ACGTNNNNNAC', f.fetch('seq1 description', 2, 13))
+        self.assertEqual(b'T', f.fetch('seq1 description', 5, 6))
+        self.assertEqual(b'', f.fetch('seq1 description', 6, 6))
+        self.assertEqual(b'CGT', f.fetch('seq2', 5, 42))
+        f.close()
+
+
+    def test_n_runs(self):
+        '''Test n_runs'''
+        f = fasta.IndexedFasta(os.path.join(data_dir, 'fasta_test.fa'))
+        self.assertEqual(([0, 6], [1, 10]), f.n_runs('seq1 description'))
+        self.assertEqual(([], []), f.n_runs('seq2'))
+        self.assertEqual(([0], [6]), f.n_runs('seq3'))
+        self.assertEqual(([2, 10], [4, 11]), f.n_runs('seq4'))
+        f.close()
+
+
+    def test_trimmed_contigs(self):
+        '''Test trimmed_contigs'''
+        f = fasta.IndexedFasta(os.path.join(data_dir, 'fasta_test.fa'))
+        expected = [
+            ('seq1 description', 2, 16, [4], [8]),
+            ('seq2', 0, 8, [], []),
+            ('seq4', 0, 10, [2], [4]),
+        ]
+        self.assertEqual(expected, list(f.trimmed_contigs()))
+        f.close()
+
+
+    def test_windows_line_endings(self):
+        '''Test file with \\r\\n line endings'''
+        tmp_file = 'tmp.fasta_test.fa'
+        with open(tmp_file, 'wb') as f:
+            f.write(b'>seq1\r\nACGN\r\nNACG\r\nT\r\n')
+        f = fasta.IndexedFasta(tmp_file)
+        self.assertEqual(b'ACGNNACGT', f.fetch('seq1'))
+        self.assertEqual(([3], [4]), f.n_runs('seq1'))
+        f.close()
+        os.unlink(tmp_file)
+
+
+    def test_open_indexed(self):
+        '''Test open_indexed returns None for files that cannot be indexed'''
+        tmp_file = 'tmp.fasta_test.fa'
+        bad_files = [
+            b'>seq1\nACGT\nAC\nACGT\n',
+            b'>seq1\nACGT\nACGTA\n',
+            b'>seq1\nACGT\n>seq1\nACGT\n',
+            b'@seq1\nACGT\n+\nIIII\n',
+        ]
+
+        for contents in bad_files:
+            with open(tmp_file, 'wb') as f:
+                f.write(contents)
+            self.assertIsNone(fasta.open_indexed(tmp_file))
+
+        os.unlink(tmp_file)
+        f = fasta.open_indexed(os.path.join(data_dir, 'fasta_test.fa'))
+        self.assertIsInstance(f, fasta.IndexedFasta)
+        f.close()
@@ -1,2 +1,3 @@
-__all__ = ['gap', 'helper']
-from assembly_tools.fill_gaps_using_reference import *
+__all__ = ['aligners', 'gap', 'gap_registry', 'gap_scanner', 'helper', 'hit_groups', 'hit_table', 'index_cache', 'kmer_index', 'mapping', 'reference']
+from assembly_tools import _lazy_loader
+__getattr__ = _lazy_loader(__name__, __all__)
@@ -0,0 +1,306 @@
+'''Aligners that can be used to map the sequences flanking gaps to the reference.
+Each one is a class with the same methods, so that fill_gaps_using_ref can use
+any of them. New aligners need to be added to the dict aligner_classes.'''
+
+import abc
+import contextlib
+import glob
+import shutil
+import subprocess
+import tempfile
+import pyfastaq
+
+class Error (Exception): pass
+
+
+@contextlib.contextmanager
+def command_output(cmd, wait_timeout=1):
+    '''Context manager that runs a command and yields a file object of its stdout,
+       to be read while the command is still running. Raises Error, with the exit code and
+       stderr of the command, if the command fails. If reading the output fails,
+       waits up to wait_timeout seconds for the command to exit, to find out if
+       it failed'''
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        except OSError as e:
+            raise Error('Error running command:\n' + ' '.join(cmd) + '\n' + str(e))
+
+        def error_message():
+            stderr.seek(0)
+            return 'Error running command (exit code ' + str(proc.returncode) + '):\n' \
+                + ' '.join(cmd) + '\nstderr was:\n' + stderr.read().decode(errors='replace')
+
+        try:
+            yield proc.stdout
+        except BaseException as e:
+            # if the command failed, then that is probably why reading its output
+            # failed, so report the command error instead. The command may not
+            # have quite finished exiting yet, so give it a moment first
+            try:
+                proc.wait(timeout=wait_timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            else:
+                if proc.returncode != 0:
+                    raise Error(error_message()) from e
+            raise
+        finally:
+            proc.stdout.close()
+
+        # all output must have been read, but the command could still be running
+        if proc.wait() != 0:
+            raise Error(error_message())
+
+
+class Aligner(abc.ABC):
+    '''Base class of the aligners. Subclasses set name and executable, and
+       implement index_options(), index_files(), index() and map_command().
+       Aligners that do not run a command override map() instead, and their
+       map_command() raises Error'''
+    name = None
+    executable = None
+
+    def available(self):
+        '''Returns True if the aligner is installed'''
+        return shutil.which(self.executable) is not None
+
+    def index_options(self):
+        '''Returns a string describing the aligner and the options that affect its index,
+           so that indexes can be cached'''
+        return self.name
+
+    @abc.abstractmethod
+    def index_files(self, index_prefix):
+        '''Returns list of the index files made by index()'''
+        pass
+
+    @abc.abstractmethod
+    def index(self, reference, index_prefix):
+        '''Makes an index of the reference fasta file'''
+        pass
+
+    @abc.abstractmethod
+    def map_command(self, index_prefix, reads, threads=1):
+        '''Returns the command, as a list, that maps the reads and writes SAM to stdout.
+           The hits of each read must be together, and in the same order as the reads'''
+        pass
+
+    def map(self, index_prefix, reads, threads=1):
+        '''Context manager that maps the reads, yielding a binary file object of the SAM output'''
+        return command_output(self.map_command(index_prefix, reads, threads=threads))
+
+
+class Smalt(Aligner):
+    name = 'smalt'
+    executable = 'smalt'
+
+    def __init__(self, k=13, s=2, y=0.9, r=-1):
+        self.k = k
+        self.s = s
+        self.y = y
+        self.r = r
+
+    def index_options(self):
+        return 'smalt.k' + str(self.k) + '.s' + str(self.s)
+
+    def index_files(self, index_prefix):
+        return [index_prefix + '.smi', index_prefix + '.sma']
+
+    def index(self, reference, index_prefix):
+        pyfastaq.utils.syscall(' '.join([
+            'smalt index',
+            '-k', str(self.k),
+            '-s', str(self.s),
+            index_prefix,
+            reference,
+        ]))
+
+    def map_command(self, index_prefix, reads, threads=1):
+        cmd = ['smalt', 'map', '-f', 'sam', '-y', str(self.y), '-r', str(self.r)]
+
+        # -O keeps the output in the same order as the input
+        if threads > 1:
+            cmd += ['-n', str(threads), '-O']
+
+        return cmd + [index_prefix, reads]
+
+
+class Bowtie2(Aligner):
+    '''Bowtie2 only reports one hit for each read, so gaps are never
+       classified as having multiple hits'''
+    name = 'bowtie2'
+    executable = 'bowtie2'
+
+    def available(self):
+        return shutil.which('bowtie2') is not None and shutil.which('bowtie2-build') is not None
+
+    def index_files(self, index_prefix):
+        return sorted(glob.glob(index_prefix + '.*.bt2') + glob.glob(index_prefix + '.*.bt2l'))
+
+    def index(self, reference, index_prefix):
+        pyfastaq.utils.syscall(' '.join(['bowtie2-build', '-q', reference, index_prefix]))
+
+    def map_command(self, index_prefix, reads, threads=1):
+        return ['bowtie2', '--reorder', '-p', str(threads), '-f', '-x', index_prefix, '-U', reads]
+
+
+class Minimap2(Aligner):
+    '''Secondary hits are only reported if they score as well as the best hit'''
+    name = 'minimap2'
+    executable = 'minimap2'
+
+    def __init__(self, preset='sr'):
+        self.preset = preset
+
+    def index_options(self):
+        return 'minimap2.' + self.preset
+
+    def index_files(self, index_prefix):
+        return [index_prefix + '.mmi']
+
+    def index(self, reference, index_prefix):
+        pyfastaq.utils.syscall(' '.join(['minimap2', '-x', self.preset, '-d', index_prefix + '.mmi', reference]))
+
+    def map_command(self, index_prefix, reads, threads=1):
+        return ['minimap2', '-a', '-x', self.preset, '-p', '1.0', '-t', str(threads), index_prefix + '.mmi', reads]
+
+
+class ExactMatch(Aligner):
+    '''Finds exact matches of the whole read on either strand, without using any
+       external program. Slow, so only meant for tests and small data'''
+    name = 'exact'
+    executable = None
+
+    def available(self):
+        return True
+
+    def index_files(self, index_prefix):
+        return [index_prefix + '.fa']
+
+    def index(self, reference, index_prefix):
+        pyfastaq.tasks.to_fasta(reference, index_prefix + '.fa', line_length=0)
+
+    def map_command(self, index_prefix, reads, threads=1):
+        raise Error('The ' + self.name + ' aligner does not run a command. Use map() instead')
+
+    def sam_lines(self, ref_seqs, name, seq):
+        '''Returns list of SAM lines for one read. ref_seqs is a list of reference Fasta objects'''
+        reverse = pyfastaq.sequences.Fasta('x', seq)
+        reverse.revcomp()
+        lines = []
+
+        for ref in ref_seqs:
+            for flag, query in [(0, seq), (16, reverse.seq)]:
+                position = ref.seq.find(query)
+                while position != -1:
+                    if len(lines):
+                        flag |= 256
+                    lines.append('\t'.join([name, str(flag), ref.id, str(position + 1), '60', str(len(query)) + 'M', '*', '0', '0', query, '*']))
+                    position = ref.seq.find(query, position + 1)
+
+        if len(lines) == 0:
+            lines.append('\t'.join([name, '4', '*', '0', '0', '*', '*', '0', '0', seq, '*']))
+
+        return lines
+
+    @contextlib.contextmanager
+    def map(self, index_prefix, reads, threads=1):
+        # sequences are named by the first word of the header, as other aligners and samtools faidx do
+        ref_seqs = [pyfastaq.sequences.Fasta(x.id.split()[0], x.seq.upper()) for x in pyfastaq.sequences.file_reader(index_prefix + '.fa')]
+
+        with tempfile.TemporaryFile() as sam:
+            lines = ['@HD\tVN:1.0\tSO:unsorted']
+            lines += ['@SQ\tSN:' + ref.id + '\tLN:' + str(len(ref)) for ref in ref_seqs]
+            sam.write(('\n'.join(lines) + '\n').encode())
+            for read in pyfastaq.sequences.file_reader(reads):
+                sam.write(('\n'.join(self.sam_lines(ref_seqs, read.id, read.seq.upper())) + '\n').encode())
+            sam.seek(0)
+            yield sam
+
+
+class Minimizer(Aligner):
+    '''Places reads using kmer_index.KmerIndex, which needs numpy but
+       no external program. Hits are ungapped'''
+    name = 'minimizer'
+    executable = None
+
+    def __init__(self, k=19, w=10):
+        self.k = k
+        self.w = w
+
+    def available(self):
+        from assembly_tools.fill_gaps_using_reference import kmer_index
+        return kmer_index.numpy is not None
+
+    def index_options(self):
+        return 'minimizer.k' + str(self.k) + '.w' + str(self.w)
+
+    def index_files(self, index_prefix):
+        return [index_prefix + '.npz']
+
+    def map_command(self, index_prefix, reads, threads=1):
+        raise Error('The ' + self.name + ' aligner does not run a command. Use map() instead')
+
+    def index(self, reference, index_prefix):
+        from assembly_tools.fill_gaps_using_reference import kmer_index
+        index = kmer_index.KmerIndex(k=self.k, w=self.w)
+        index.build(reference)
+        index.save(index_prefix + '.npz')
+
+    @contextlib.contextmanager
+    def map(self, index_prefix, reads, threads=1, batch_bases=10000000):
+        from assembly_tools.fill_gaps_using_reference import kmer_index
+        index = kmer_index.KmerIndex(k=self.k, w=self.w)
+        index.load(index_prefix + '.npz')
+
+        # reads are placed in batches, to limit the size of the numpy arrays
+        def write_batch(batch):
+            lines = index.sam_lines(batch)
+            if len(lines):
+                sam.write(('\n'.join(lines) + '\n').encode())
+
+        with tempfile.TemporaryFile() as sam:
+            sam.write((index.sam_header() + '\n').encode())
+            batch = []
+            batch_length = 0
+            for read in pyfastaq.sequences.file_reader(reads):
+                batch.append((read.id, read.seq))
+                batch_length += len(read)
+                if batch_length >= batch_bases:
+                    write_batch(batch)
+                    batch = []
+                    batch_length = 0
+            write_batch(batch)
+            sam.seek(0)
+            yield sam
+
+
+aligner_classes = {
+    'bowtie2': Bowtie2,
+    'exact': ExactMatch,
+    'minimap2': Minimap2,
+    'minimizer': Minimizer,
+    'smalt': Smalt,
+}
+
+# order of preference when the aligner is "auto"
+preferred_aligners = ['minimap2', 'bowtie2', 'smalt', 'minimizer']
+
+
+def new(name, smalt_k=13, smalt_s=2, smalt_y=0.9, smalt_r=-1):
+    '''Returns a new aligner object. If name is "auto", returns the first of
+       preferred_aligners that is installed'''
+    if name == 'auto':
+        for aligner_name in preferred_aligners:
+            aligner = new(aligner_name, smalt_k=smalt_k, smalt_s=smalt_s, smalt_y=smalt_y, smalt_r=smalt_r)
+            if aligner.available():
+                return aligner
+        raise Error('None of these aligners were found in your path: ' + ', '.join(preferred_aligners))
+    elif name == 'smalt':
+        return Smalt(k=smalt_k, s=smalt_s, y=smalt_y, r=smalt_r)
+    elif name in aligner_classes:
+        return aligner_classes[name]()
+    else:
+        raise Error('Unknown aligner "' + name + '". Must be one of: auto, ' + ', '.join(sorted(aligner_classes)))
@@ -1,8 +1,6 @@
 #!/usr/bin/env python3
 
 import sys
-import pysam
-from pyfastaq import sequences
 
 class Error (Exception): pass
 
@@ -26,10 +24,33 @@ type_to_str = {
     7: 'SAME_SEQ_STRAND_OVERLAP'
 }
 
+class Hit:
+    '''The fields of a pysam AlignedSegment that are used by Gap.update_hits(). These
+       are copied, so that the AlignedSegment (and its sequence) can be freed'''
+    __slots__ = ('tid', 'pos', 'aend', 'qlen', 'qend', 'is_reverse', 'is_unmapped')
+
+    def __init__(self, samrecord):
+        self.tid = samrecord.tid
+        self.pos = samrecord.pos
+        self.aend = samrecord.aend
+        self.qlen = samrecord.qlen
+        self.qend = samrecord.qend
+        self.is_reverse = samrecord.is_reverse
+        self.is_unmapped = samrecord.is_unmapped
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, x) == getattr(other, x) for x in self.__slots__)
+
+
 class Gap:
-    def __init__(self, gap_flanks_line=None):
-        self.left_hits = []
-        self.right_hits = []
+    __slots__ = (
+        'left_hit', 'right_hit', 'ref_name', 'ref_start', 'ref_end', 'gap_type',
+        'query_name', 'query_start', 'query_end', 'query_replace_start', 'query_replace_end', 'reverse_hit',
+    )
+
+    def __init__(self):
+        self.left_hit = None
+        self.right_hit = None
         self.ref_name = None
         self.ref_start = -1  # start pos of sequence in ref matching gap in query
         self.ref_end = -1    # end pos of sequence in ref matching gap in query
@@ -37,31 +58,12 @@ class Gap:
         self.query_name = None
         self.query_start = None  # start coord of gap in query
         self.query_end = None    # end coord of gap in query
-        self.left_seq = None
-        self.right_seq = None
         self.query_replace_start = -1
         self.query_replace_end = -1
         self.reverse_hit = False
 
-
-        if gap_flanks_line is None:
-            return
-
-        try:
-            (self.query_name,
-             self.query_start,  # start coord of gap in query
-             self.query_end,    # end coord of gap in query
-             self.left_seq,
-             self.right_seq) = gap_flanks_line.rstrip().split('\t')
-
-            # store everything zero-based
-            self.query_start = int(self.query_start) - 1
-            self.query_end = int(self.query_end) - 1
-        except:
-            raise Error('Error parsing this line of flanking seqs file:\n' + gap_flanks_line)
-
     def __eq__(self, other):
-        return type(other) is type(self) and self.__dict__ == other.__dict__
+        return type(other) is type(self) and all(getattr(self, x) == getattr(other, x) for x in self.__slots__)
 
     def __str__(self):
         l = [
@@ -94,9 +96,6 @@ class Gap:
         assert(len(right_names) == 1)
         assert(left_names.pop().rsplit('.')[0] == right_names.pop().rsplit('.')[0])
 
-        self.left_hits = left_hits
-        self.right_hits = right_hits
-
         # For now, only do something where we have one hit either side of gap and the
         # hit positions are in same region of reference and in correct orientation
         if (len(left_hits) > 1 and len(right_hits) > 1):
@@ -104,10 +103,8 @@ class Gap:
             self.gap_type = MULTIPLE_HITS
             return
 
-        self.left_hit = left_hits[0]
-        self.right_hit = right_hits[0]
-        left_hit = left_hits[0]
-        right_hit = right_hits[0]
+        self.left_hit = Hit(left_hits[0])
+        self.right_hit = Hit(right_hits[0])
 
         if self.left_hit.is_unmapped or self.right_hit.is_unmapped:
             self.gap_type = UNMAPPED
@@ -163,18 +160,6 @@ class Gap:
             return self.gap_type == SAME_SEQ_STRAND_OVERLAP
         
 
-    def _left_or_right_fasta_name_prefix(self):
-        return self.query_name + ":"  \
-                 + str(self.query_start + 1) \
-                 + '-' \
-                 + str(self.query_end + 1)
-
-    def left_fasta(self):
-        return sequences.Fasta(self._left_or_right_fasta_name_prefix() + '.left', self.left_seq)
-
-    def right_fasta(self):
-        return sequences.Fasta(self._left_or_right_fasta_name_prefix() + '.right', self.right_seq)
-
     #def dict_key(self):
     #    return (self.query_name, self.query_start, self.query_end)
 
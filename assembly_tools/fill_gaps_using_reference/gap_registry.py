@@ -0,0 +1,139 @@
+'''Stores all the gaps of an assembly in parallel arrays, indexed by a gap ID.
+The IDs are 0, 1, 2, ... in the order that the gaps were added, and are used
+as the names of the gap flanks, eg the flanks of gap 42 are called 42.left
+and 42.right. This means the gap of a hit is found from its name with
+int(), without parsing the contig name and coords, or looking them up in a
+dict. Gap objects are only made when needed, by gap().'''
+
+import pickle
+from array import array
+from assembly_tools.fill_gaps_using_reference import gap
+
+class Error (Exception): pass
+
+
+def flank_name_to_id(name):
+    '''Returns gap ID from the name of a flank, eg 42.left -> 42'''
+    try:
+        return int(name[:name.rindex('.')])
+    except ValueError:
+        raise Error('Error getting gap ID from sequence with name ' + name)
+
+
+class GapRegistry:
+    def __init__(self):
+        self.contig_names = []
+        self.contig_ranges = {}   # contig name -> (first gap ID, last gap ID + 1)
+        self.ref_names = []
+        self.ref_name_to_index = {}
+        self.contig = array('l')
+        self.query_start = array('q')
+        self.query_end = array('q')
+        self.gap_type = array('b')
+        self.ref_name = array('l')  # index in self.ref_names, or -1 if no ref name
+        self.ref_start = array('q')
+        self.ref_end = array('q')
+        self.query_replace_start = array('q')
+        self.query_replace_end = array('q')
+        self.reverse_hit = array('b')
+        self.reference = array('h')  # index of the reference used to fill the gap, when there is more than one
+
+
+    def __len__(self):
+        return len(self.query_start)
+
+
+    def add(self, contig_name, start, end):
+        '''Adds a gap, with zero-based start and end coords, and returns its ID.
+           All the gaps of each contig must be added together, in order of position'''
+        gap_id = len(self)
+
+        if len(self.contig_names) == 0 or self.contig_names[-1] != contig_name:
+            if contig_name in self.contig_ranges:
+                raise Error('Gaps in contig ' + contig_name + ' were not all added together')
+            self.contig_names.append(contig_name)
+            self.contig_ranges[contig_name] = (gap_id, gap_id)
+
+        self.contig_ranges[contig_name] = (self.contig_ranges[contig_name][0], gap_id + 1)
+        self.contig.append(len(self.contig_names) - 1)
+        self.query_start.append(start)
+        self.query_end.append(end)
+        self.gap_type.append(gap.UNKNOWN)
+        self.ref_name.append(-1)
+        self.ref_start.append(-1)
+        self.ref_end.append(-1)
+        self.query_replace_start.append(-1)
+        self.query_replace_end.append(-1)
+        self.reverse_hit.append(0)
+        self.reference.append(0)
+        return gap_id
+
+
+    def contig_gap_ids(self, contig_name):
+        '''Returns range of the IDs of the gaps in a contig, in order of position'''
+        return range(*self.contig_ranges.get(contig_name, (0, 0)))
+
+
+    def gap(self, gap_id):
+        '''Returns a new gap.Gap object with the values of gap gap_id'''
+        g = gap.Gap()
+        g.query_name = self.contig_names[self.contig[gap_id]]
+        g.query_start = self.query_start[gap_id]
+        g.query_end = self.query_end[gap_id]
+        g.gap_type = self.gap_type[gap_id]
+        g.ref_name = None if self.ref_name[gap_id] == -1 else self.ref_names[self.ref_name[gap_id]]
+        g.ref_start = self.ref_start[gap_id]
+        g.ref_end = self.ref_end[gap_id]
+        g.query_replace_start = self.query_replace_start[gap_id]
+        g.query_replace_end = self.query_replace_end[gap_id]
+        g.reverse_hit = bool(self.reverse_hit[gap_id])
+        return g
+
+
+    def reset(self, gap_id):
+        '''Forgets the results of update_hits() for gap gap_id, so that it
+           can be updated using hits to a different reference'''
+        self.update(gap_id, gap.Gap())
+        self.reference[gap_id] = 0
+
+
+    def ref_name_index(self, ref_name):
+        '''Returns the index of ref_name in self.ref_names, adding it if it is not there'''
+        if ref_name not in self.ref_name_to_index:
+            self.ref_name_to_index[ref_name] = len(self.ref_names)
+            self.ref_names.append(ref_name)
+        return self.ref_name_to_index[ref_name]
+
+
+    def update(self, gap_id, g):
+        '''Stores the results in gap.Gap object g, which was made by
+           gap(gap_id) and then had update_hits() run on it'''
+        self.ref_name[gap_id] = -1 if g.ref_name is None else self.ref_name_index(g.ref_name)
+
+        self.gap_type[gap_id] = g.gap_type
+        self.ref_start[gap_id] = g.ref_start
+        self.ref_end[gap_id] = g.ref_end
+        self.query_replace_start[gap_id] = g.query_replace_start
+        self.query_replace_end[gap_id] = g.query_replace_end
+        self.reverse_hit[gap_id] = 1 if g.reverse_hit else 0
+
+
+    def update_hits(self, gap_id, left_hits, right_hits, samfile):
+        '''Runs gap.Gap.update_hits() on gap gap_id, and stores the results'''
+        g = self.gap(gap_id)
+        g.update_hits(left_hits, right_hits, samfile)
+        self.update(gap_id, g)
+
+
+    def save(self, filename):
+        '''Writes the registry to a file, which can be read back by load()'''
+        with open(filename, 'wb') as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(filename):
+    '''Returns a GapRegistry read from a file made by GapRegistry.save()'''
+    registry = GapRegistry()
+    with open(filename, 'rb') as f:
+        registry.__dict__.update(pickle.load(f))
+    return registry
@@ -0,0 +1,168 @@
+'''Finds gaps (runs of N or n) in the contigs of a FASTA file, working on
+the bytes of each contig instead of Python strings. FASTA files are read in
+large blocks, which are split into records with bytes.find(), and the line
+breaks are removed with bytes.translate(). The runs of Ns in each contig are
+found with bytes.find(), which skips over the sequence between the gaps much
+faster than a regex. Other file formats are read with pyfastaq, so are
+slower.'''
+
+import bisect
+import gzip
+import re
+
+from pyfastaq import sequences
+
+class Error (Exception): pass
+
+_not_n_regex = re.compile(rb'[^Nn]')
+_whitespace = b' \t\r\n\x0b\x0c'
+
+
+def n_run_bounds(buffer, start, end, regex=_not_n_regex):
+    '''Returns tuple of two lists (starts, ends) of the positions in buffer (bytes, or
+       anything with the same find() method, eg an mmap), from start to end, of the runs
+       of N or n. Ends are not inclusive. A run ends at the first match of regex, so
+       that runs can carry on over other bytes, eg line breaks'''
+    starts = []
+    ends = []
+    next_upper = buffer.find(b'N', start, end)
+    next_lower = buffer.find(b'n', start, end)
+
+    # find() skips quickly over the sequence between gaps, so only
+    # the bases in gaps are looked at one at a time, by the regex
+    while next_upper != -1 or next_lower != -1:
+        if next_lower == -1 or (next_upper != -1 and next_upper < next_lower):
+            run_start = next_upper
+        else:
+            run_start = next_lower
+
+        match = regex.search(buffer, run_start, end)
+        run_end = end if match is None else match.start()
+        starts.append(run_start)
+        ends.append(run_end)
+
+        if next_upper != -1 and next_upper < run_end:
+            next_upper = buffer.find(b'N', run_end, end)
+        if next_lower != -1 and next_lower < run_end:
+            next_lower = buffer.find(b'n', run_end, end)
+
+    return starts, ends
+
+
+def n_runs(seq):
+    '''Returns tuple of two lists (starts, ends) of the zero-based coords of the runs of
+       N or n in the bytes seq. Ends are inclusive, as in pyfastaq's Fasta.gaps()'''
+    starts, ends = n_run_bounds(seq, 0, len(seq))
+    return starts, [x - 1 for x in ends]
+
+
+def _open(filename):
+    f = open(filename, 'rb')
+    if f.read(2) == b'\x1f\x8b':
+        f.close()
+        return gzip.open(filename, 'rb')
+    f.seek(0)
+    return f
+
+
+def _fasta_records(f, block_size):
+    '''Yields the bytes of each record of a FASTA file, starting with ">"'''
+    pieces = []
+    last_block_ended_line = True
+
+    for block in iter(lambda: f.read(block_size), b''):
+        start = 0
+        if last_block_ended_line and block.startswith(b'>') and len(pieces):
+            yield b''.join(pieces)
+            pieces = []
+
+        while True:
+            i = block.find(b'\n>', start)
+            if i == -1:
+                pieces.append(block[start:])
+                break
+            pieces.append(block[start:i + 1])
+            yield b''.join(pieces)
+            pieces = []
+            start = i + 1
+
+        last_block_ended_line = block.endswith(b'\n')
+
+    if len(pieces):
+        yield b''.join(pieces)
+
+
+def file_reader(filename, block_size=16777216):
+    '''Yields tuples (name, sequence as bytes) of the sequences in a fasta/q file,
+       which can be gzipped. Names are the whole header line, as in pyfastaq'''
+    f = _open(filename)
+
+    try:
+        if f.peek(1)[:1] != b'>':
+            f.close()
+            for seq in sequences.file_reader(filename):
+                yield seq.id, seq.seq.encode()
+            return
+
+        for record in _fasta_records(f, block_size):
+            newline = record.find(b'\n')
+            if newline == -1:
+                newline = len(record)
+            yield record[1:newline].rstrip().decode(), record[newline + 1:].translate(None, _whitespace)
+    finally:
+        f.close()
+
+
+def trimmed_contigs(filename):
+    '''Same as file_reader(), except that Ns are trimmed from both ends of each
+       sequence, and sequences that are all Ns are skipped, like helper.trimmed_seqs()'''
+    for name, seq in file_reader(filename):
+        seq = seq.strip(b'Nn')
+        if len(seq):
+            yield name, seq
+
+
+class GapStats:
+    '''Counts gaps, and their lengths, in the contigs of an assembly'''
+    def __init__(self, bins=None, min_length=1):
+        '''bins is a list of the lower bounds of the bins of the gap length histogram'''
+        self.bins = [1, 10, 100, 1000, 10000, 100000] if bins is None else sorted(bins)
+        self.min_length = min_length
+        self.histogram = [0] * len(self.bins)
+        self.contigs = []   # tuples (name, length, number of gaps, bases in gaps)
+        self.gaps = 0
+        self.gap_bases = 0
+        self.longest_gap = 0
+        self.total_length = 0
+
+
+    def add_contig(self, name, seq):
+        '''Adds the gaps in the bytes seq'''
+        starts, ends = n_runs(seq)
+        lengths = [end - start + 1 for start, end in zip(starts, ends)]
+        lengths = [x for x in lengths if x >= self.min_length]
+        gap_bases = sum(lengths)
+
+        for length in lengths:
+            i = bisect.bisect_right(self.bins, length) - 1
+            if i >= 0:
+                self.histogram[i] += 1
+
+        self.contigs.append((name, len(seq), len(lengths), gap_bases))
+        self.gaps += len(lengths)
+        self.gap_bases += gap_bases
+        self.longest_gap = max([self.longest_gap] + lengths)
+        self.total_length += len(seq)
+
+
+    def summary(self):
+        '''Returns dict of the totals and histogram'''
+        return {
+            'contigs': len(self.contigs),
+            'total_length': self.total_length,
+            'gaps': self.gaps,
+            'gap_bases': self.gap_bases,
+            'longest_gap': self.longest_gap,
+            'gaps_per_mb': 0 if self.total_length == 0 else round(1000000 * self.gaps / self.total_length, 3),
+            'histogram': [{'min_length': x, 'gaps': n} for x, n in zip(self.bins, self.histogram)],
+        }
@@ -1,45 +1,104 @@
 #!/usr/bin/env python3
 
 import argparse
+import copy
+import gzip
+import json
+import multiprocessing
 import sys
 import os
-import pysam
-import re
 from pyfastaq import *
 import assembly_tools.fill_gaps_using_reference
+from assembly_tools.file_readers import fasta
+from assembly_tools.fill_gaps_using_reference import gap_registry, gap_scanner, hit_groups, hit_table, reference
 
 
 class Error (Exception): pass
 
-def make_fasta_of_gap_flanks(fasta_in, flanking_bases, fasta_out, gaps):
-    '''Makes a fasta file of the sequences flanking the gaps in a fasta/q file'''
-    tmp_tabfile = fasta_out + '.tmp.tab'
-    tasks.get_seqs_flanking_gaps(fasta_in, tmp_tabfile, flanking_bases, flanking_bases)
-    fin = utils.open_file_read(tmp_tabfile)
-    fout = utils.open_file_write(fasta_out)
-    original_line_length = sequences.Fasta.line_length
-    sequences.Fasta.line_length = 0
+def open_file_write_fast(filename):
+    '''Same as pyfastaq's utils.open_file_write(), except that gzipped files are written
+       using the fastest compression level instead of gzip -9. Use for temporary files'''
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'wt', compresslevel=1)
+    else:
+        return utils.open_file_write(filename)
 
-    for line in fin:
-        if line.startswith('#'):
-            continue
 
-        gap = assembly_tools.fill_gaps_using_reference.gap.Gap(line)
-        print(gap.left_fasta(), file=fout)
-        print(gap.right_fasta(), file=fout)
-        if gap.query_name not in gaps:
-            gaps[gap.query_name] = {}
-        gaps[gap.query_name][(gap.query_start, gap.query_end)] = gap
+def trimmed_seqs(fasta_in):
+    '''Yields the sequences in a fasta/q file, with Ns trimmed from both ends.
+       Sequences that are all Ns are skipped'''
+    for seq in sequences.file_reader(fasta_in):
+        seq.trim_Ns()
+        if len(seq):
+            yield seq
 
 
-    utils.close(fin)
+def _trimmed_contigs_and_gaps(fasta_in):
+    '''Yields tuples (name, length, get_seq, gap starts, gap ends) of each sequence in a
+       fasta/q file, after Ns are trimmed from both ends. get_seq(start, end) returns the
+       bytes of the trimmed sequence from start to end, not including end. Uncompressed
+       FASTA files are read through a memory map, other files using gap_scanner'''
+    assembly = fasta.open_indexed(fasta_in)
+    if assembly is None:
+        for name, seq in gap_scanner.trimmed_contigs(fasta_in):
+            yield (name, len(seq), lambda start, end, seq=seq: seq[start:end]) + gap_scanner.n_runs(seq)
+        return
+
+    try:
+        for name, start, end, gap_starts, gap_ends in assembly.trimmed_contigs():
+            get_seq = lambda x, y, name=name, offset=start: assembly.fetch(name, offset + x, offset + y)
+            yield name, end - start, get_seq, gap_starts, gap_ends
+    finally:
+        assembly.close()
+
+
+def _trimmed_seqs_for_filling(fasta_in):
+    '''Same as trimmed_seqs(), except that uncompressed FASTA files are read through a memory map'''
+    assembly = fasta.open_indexed(fasta_in)
+    if assembly is None:
+        yield from trimmed_seqs(fasta_in)
+        return
+
+    try:
+        for name, start, end, gap_starts, gap_ends in assembly.trimmed_contigs():
+            yield sequences.Fasta(name, assembly.fetch(name, start, end).decode())
+    finally:
+        assembly.close()
+
+
+def find_gaps_and_write_flanks(fasta_in, flanking_bases, fasta_out, gaps):
+    '''Makes a fasta file of the sequences flanking the gaps in a fasta/q file in one pass,
+       with no temporary files. Ns at the ends of each sequence are trimmed off first,
+       so are not counted as gaps. Each gap found is added to gaps, which is a
+       gap_registry.GapRegistry, and its flanks are named using its gap ID'''
+    fout = open_file_write_fast(fasta_out)
+
+    for name, length, get_seq, starts, ends in _trimmed_contigs_and_gaps(fasta_in):
+        for start, end in zip(starts, ends):
+            gap_id = str(gaps.add(name, start, end))
+            print('>' + gap_id + '.left', get_seq(max(start - flanking_bases, 0), start).decode(),
+                  '>' + gap_id + '.right', get_seq(end + 1, min(end + flanking_bases + 1, length)).decode(),
+                  sep='\n', file=fout)
+
+    utils.close(fout)
+
+
+def write_flanks_of_gaps(flanks_in, gap_ids, flanks_out):
+    '''Writes the flanks of the gaps whose IDs are in the set gap_ids, from a
+       file made by find_gaps_and_write_flanks(), to a new file'''
+    fout = open_file_write_fast(flanks_out)
+
+    for seq in sequences.file_reader(flanks_in):
+        if gap_registry.flank_name_to_id(seq.id) in gap_ids:
+            print('>' + seq.id, seq.seq, sep='\n', file=fout)
+
     utils.close(fout)
-    os.unlink(tmp_tabfile)
-    sequences.Fasta.line_length = original_line_length
 
 
 def paired_hit_samreader(filename):
-    '''Given a SAM file in read name order, yields a tuple of hits ([left_hits], [right_hits])'''
+    '''Given a SAM file in read name order, yields a tuple of hits ([left_hits], [right_hits]).
+       filename can also be a file object, for example the output of a running aligner'''
+    import pysam
     samfile = pysam.Samfile(filename, "r")
     left_hits = []
     right_hits = []
@@ -65,28 +124,214 @@ def paired_hit_samreader(filename):
     yield left_hits, right_hits, samfile
 
 
-def _gap_flank_seqname_to_dict_key(name):
-    regex = re.compile('^(.*):(\d+)-(\d+)\.(?:left|right)')
-    hits = regex.search(name)
+def _update_gap(gaps, table, left_hits, right_hits, samfile):
+    '''Adds the hits of a gap to the hit_table.HitTable table, to be classified
+       later with the other gaps, or updates the gap now if table is None'''
+    gap_id = gap_registry.flank_name_to_id(left_hits[0].qname)
+    if table is None:
+        gaps.update_hits(gap_id, left_hits, right_hits, samfile)
+    else:
+        table.add(gap_id, left_hits, right_hits)
+
+
+def parse_sam_file(samfilename, gaps, batch=None):
+    '''Updates the gaps in gap_registry.GapRegistry gaps, using the hits in a SAM/BAM file (or
+       file object) of the flanks written by find_gaps_and_write_flanks(). If batch is True, the
+       gaps are classified together by a hit_table.HitTable, or if False one at a time. The
+       default is to use a batch if numpy is installed'''
+    if batch is None:
+        batch = hit_table.numpy is not None
+    table = hit_table.HitTable() if batch else None
+    samreader = paired_hit_samreader(samfilename)
+
+    for left_hits, right_hits, samfile in samreader:
+        _update_gap(gaps, table, left_hits, right_hits, samfile)
+
+    if batch:
+        table.classify(gaps, samfile)
+
+
+def parse_unordered_sam_file(samfilename, gaps, tmp_prefix, max_hits_in_memory=1000000, batch=None):
+    '''Same as parse_sam_file(), except that the hits can be in any order. If there are more
+       than max_hits_in_memory hits, they are grouped using temporary files whose names
+       start with tmp_prefix'''
+    import pysam
+    if batch is None:
+        batch = hit_table.numpy is not None
+    table = hit_table.HitTable() if batch else None
+    samfile = pysam.AlignmentFile(samfilename, 'r')
+    grouper = hit_groups.HitGrouper(samfile.header, tmp_prefix, max_hits_in_memory=max_hits_in_memory)
 
     try:
-        name = hits.group(1)
-        gap_start = int(hits.group(2)) - 1
-        gap_end = int(hits.group(3)) - 1
-    except:
-        raise Error('Error getting gap start/end coords from sequence with name ' + name)
+        for samrecord in samfile.fetch(until_eof=True):
+            grouper.add(samrecord)
 
-    return name, (gap_start, gap_end)
+        for left_hits, right_hits in grouper:
+            _update_gap(gaps, table, left_hits, right_hits, samfile)
+    finally:
+        grouper.close()
 
+    if batch:
+        table.classify(gaps, samfile)
+    samfile.close()
 
-def parse_sam_file(samfilename, gaps):
-    samreader = paired_hit_samreader(samfilename)
 
-    for left_hits, right_hits, samfile in samreader:
-        # find gap corresponding to this pair of reads
-        qry, coords = _gap_flank_seqname_to_dict_key(left_hits[0].qname)
-        try:
-            gaps[qry][coords].update_hits(left_hits, right_hits, samfile)
-        except:
-            raise Error('Error parsing line of SAM ' + left_hits[0])
+def replace_intervals(seq, replacements, seq_name=''):
+    '''Returns the string seq, with each interval in replacements replaced. replacements is
+       a list of tuples (start, end, new sequence), where start and end are zero-based
+       coords in seq, in order of decreasing position. The result is the same as calling
+       pyfastaq's replace_interval() once for each tuple, but the new sequence is made in one
+       pass instead of copying the whole sequence for each replacement'''
+    replacements = replacements[::-1]
+    overlapping = any(replacements[i][1] >= replacements[i+1][0] for i in range(len(replacements) - 1))
+
+    if overlapping or any(start > end or start < 0 or end >= len(seq) for start, end, new in replacements):
+        # fall back to one at a time, which gives the same result as before
+        # in odd cases, or raises an error
+        fasta = sequences.Fasta(seq_name, seq)
+        for start, end, new in reversed(replacements):
+            fasta.replace_interval(start, end, new)
+        return fasta.seq
+
+    segments = []
+    position = 0
+    for start, end, new in replacements:
+        segments.append(seq[position:start])
+        segments.append(new)
+        position = end + 1
+    segments.append(seq[position:])
+    return ''.join(segments)
+
+
+def _fill_contig(seq, fills, ref_seqs):
+    '''Applies fills to the sequence seq, and returns it as a string ready to be written.
+       fills is a list of tuples (query replace start, query replace end, reference index,
+       ref name, ref start, ref end, is reverse), in order of decreasing position'''
+    if len(fills):
+        replacements = []
+        for replace_start, replace_end, ref_index, ref_name, ref_start, ref_end, reverse in fills:
+            new_seq = sequences.Fasta('x', ref_seqs[ref_index].fetch(ref_name, ref_start, ref_end))
+            if reverse:
+                new_seq.revcomp()
+            replacements.append((replace_start, replace_end, new_seq.seq))
+
+        seq.seq = replace_intervals(seq.seq, replacements, seq_name=seq.id)
+
+    return str(seq)
+
+
+_worker_ref_seqs = None
+
+def _init_fill_worker(ref_filenames):
+    # each worker process opens its own handles on the indexed reference files
+    global _worker_ref_seqs
+    _worker_ref_seqs = [reference.Reference(x) for x in ref_filenames]
+
+
+def _fill_contig_in_worker(seq_and_fills):
+    return _fill_contig(seq_and_fills[0], seq_and_fills[1], _worker_ref_seqs)
+
+
+def _gap_json(gap, closed, reference_filename):
+    '''Returns dict of the information about a gap that is written to the JSON log. Coords are 1-based'''
+    d = {
+        'contig': gap.query_name,
+        'gap_start': gap.query_start + 1,
+        'gap_end': gap.query_end + 1,
+        'gap_length': gap.query_end - gap.query_start + 1,
+        'type': assembly_tools.fill_gaps_using_reference.gap.type_to_str[gap.gap_type],
+        'closed': closed,
+        'reference': reference_filename if closed else None,
+        'ref_name': gap.ref_name,
+        'ref_start': None,
+        'ref_end': None,
+        'reverse': gap.reverse_hit,
+        'replace_start': None,
+        'replace_end': None,
+        'fill_length': None,
+    }
+
+    if gap.ref_name is not None:
+        d['ref_start'] = gap.ref_start + 1
+        d['ref_end'] = gap.ref_end + 1
+
+    if closed:
+        d['replace_start'] = gap.query_replace_start + 1
+        d['replace_end'] = gap.query_replace_end + 1
+        d['fill_length'] = gap.ref_end - gap.ref_start + 1
+
+    return d
+
+
+def fill_gaps(fasta_in, fasta_out, gaps, ref_seqs, abs_diff=500, log_fh=None, json_log_fh=None, threads=1, batch_bases=50000000):
+    '''Fills the gaps in fasta_in using the sequences in ref_seqs (a reference.Reference), writing the result to fasta_out.
+       Ns are trimmed from the ends of each sequence first, as in find_gaps_and_write_flanks().
+       gaps is a gap_registry.GapRegistry, which must have been updated by parse_sam_file(). If log_fh is given, a line is written
+       to it for each gap. ref_seqs can also be a list of reference.Reference, in which case each gap is filled from
+       the one given by its reference index in gaps. If threads > 1, the contigs are filled by a pool of processes,
+       in batches of about batch_bases bases, and written in the same order as fasta_in.
+       If json_log_fh is given, a line of JSON is written to it for each gap.
+       Returns a dict of counts of closed and total gaps, and of each gap type (in counts['types'])'''
+    if not isinstance(ref_seqs, list):
+        ref_seqs = [ref_seqs]
+
+    fout_seqs = utils.open_file_write(fasta_out)
+    counts = {x:0 for x in ['closed', 'total']}
+    counts['types'] = {x:0 for x in assembly_tools.fill_gaps_using_reference.gap.type_to_str.values()}
+
+    if log_fh is not None:
+        print('#closed', 'name', 'gap_Start', 'gap_end', 'replace_start', 'replace_end',
+               'ref_name', 'ref_start', 'ref_end', 'reverse', 'type', sep='\t', file=log_fh)
+
+    # The fills of each contig are found in this process, from the end of each
+    # sequence backwards, so that the log and counts are in order
+    def seqs_and_fills():
+        for seq in _trimmed_seqs_for_filling(fasta_in):
+            fills = []
+            for gap_id in reversed(gaps.contig_gap_ids(seq.id)):
+                gap = gaps.gap(gap_id)
+                counts['total'] += 1
+                counts['types'][assembly_tools.fill_gaps_using_reference.gap.type_to_str[gap.gap_type]] += 1
+                closed = gap.can_be_filled(abs_diff=abs_diff)
+
+                if closed:
+                    fills.append((gap.query_replace_start, gap.query_replace_end, gaps.reference[gap_id],
+                                  gap.ref_name, gap.ref_start, gap.ref_end, gap.reverse_hit))
+                    counts['closed'] += 1
+                    if log_fh is not None:
+                        print('1', gap, sep='\t', file=log_fh)
+                else:
+                    if log_fh is not None:
+                        print('0', gap, sep='\t', file=log_fh)
+
+                if json_log_fh is not None:
+                    print(json.dumps(_gap_json(gap, closed, ref_seqs[gaps.reference[gap_id]].filename)), file=json_log_fh)
+
+            yield seq, fills
+
+    if threads > 1:
+        with multiprocessing.Pool(threads, initializer=_init_fill_worker, initargs=([x.indexed_filename for x in ref_seqs],)) as pool:
+            def write_batch(batch):
+                # contigs are sent to the workers in chunks, so that each one is
+                # not sent separately, but small enough to share the work out
+                chunksize = max(1, len(batch) // (4 * threads))
+                for contig in pool.imap(_fill_contig_in_worker, batch, chunksize=chunksize):
+                    print(contig, file=fout_seqs)
+
+            batch = []
+            batch_length = 0
+            for seq, fills in seqs_and_fills():
+                # the reader reuses the same sequence object, so keep a copy
+                batch.append((copy.copy(seq), fills))
+                batch_length += len(seq)
+                if batch_length >= batch_bases:
+                    write_batch(batch)
+                    batch = []
+                    batch_length = 0
+            write_batch(batch)
+    else:
+        for seq, fills in seqs_and_fills():
+            print(_fill_contig(seq, fills, ref_seqs), file=fout_seqs)
 
+    utils.close(fout_seqs)
+    return counts
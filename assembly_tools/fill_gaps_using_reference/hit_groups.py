@@ -0,0 +1,115 @@
+'''Groups the hits of gap flanks by gap, when the hits are in any order.
+
+Hits are kept in a dict in memory. When there are more than a given number
+of hits in memory, they are all written to temporary files ("buckets"),
+and the dict is emptied. The bucket of a gap depends only on its name, so
+all of the hits of a gap end up in the same bucket. At the end, each bucket
+is read back and grouped on its own.'''
+
+import gzip
+import os
+import zlib
+
+class Error (Exception): pass
+
+
+def flank_name_to_gap_name(name):
+    '''Returns tuple (name of gap, True if name is a left flank, False if right flank)'''
+    if name.endswith('.left'):
+        return name[:-5], True
+    elif name.endswith('.right'):
+        return name[:-6], False
+    else:
+        raise Error('Expected name of read to end with .left or .right, but got this: ' + name)
+
+
+def _primary_first(hits):
+    return sorted(hits, key=lambda x: x.is_secondary or x.is_supplementary)
+
+
+class HitGrouper:
+    def __init__(self, header, tmp_prefix, max_hits_in_memory=1000000, buckets=64):
+        '''header is the pysam header of the SAM/BAM file. Bucket files are
+           called tmp_prefix.bucket.N.sam.gz'''
+        self.header = header
+        self.tmp_prefix = tmp_prefix
+        self.max_hits_in_memory = max_hits_in_memory
+        self.buckets = buckets
+        self.groups = {}
+        self.hits_in_memory = 0
+        self.bucket_files = []
+
+
+    def _add_to_memory(self, samrecord):
+        gap_name, is_left = flank_name_to_gap_name(samrecord.qname)
+        group = self.groups.get(gap_name)
+        if group is None:
+            group = self.groups[gap_name] = ([], [])
+        group[0 if is_left else 1].append(samrecord)
+        self.hits_in_memory += 1
+
+
+    def add(self, samrecord):
+        self._add_to_memory(samrecord)
+        if self.hits_in_memory > self.max_hits_in_memory:
+            self._spill()
+
+
+    def _bucket_filename(self, i):
+        return self.tmp_prefix + '.bucket.' + str(i) + '.sam.gz'
+
+
+    def _spill(self):
+        if len(self.bucket_files) == 0:
+            self.bucket_files = [self._bucket_filename(i) for i in range(self.buckets)]
+            for filename in self.bucket_files:
+                open(filename, 'w').close()
+
+        lines = [[] for i in range(self.buckets)]
+        for gap_name, (left_hits, right_hits) in self.groups.items():
+            bucket = lines[zlib.crc32(gap_name.encode()) % self.buckets]
+            bucket.extend([x.to_string() for x in left_hits])
+            bucket.extend([x.to_string() for x in right_hits])
+
+        for i, bucket in enumerate(lines):
+            if len(bucket):
+                with gzip.open(self.bucket_files[i], 'at', compresslevel=1) as f:
+                    print(*bucket, sep='\n', file=f)
+
+        self.groups = {}
+        self.hits_in_memory = 0
+
+
+    def _complete_groups(self):
+        for left_hits, right_hits in self.groups.values():
+            if len(left_hits) and len(right_hits):
+                yield _primary_first(left_hits), _primary_first(right_hits)
+
+
+    def __iter__(self):
+        '''Yields tuples (left hits, right hits) of each gap. Gaps with no hits for one of the
+           flanks are skipped. Within each flank, hits are in the same order that they were
+           added, except that primary hits are put first'''
+        if len(self.bucket_files) == 0:
+            yield from self._complete_groups()
+            self.groups = {}
+            return
+
+        import pysam
+        self._spill()
+        # each bucket is assumed to fit in memory, so is not spilled again
+        for filename in self.bucket_files:
+            with gzip.open(filename, 'rt') as f:
+                for line in f:
+                    self._add_to_memory(pysam.AlignedSegment.fromstring(line.rstrip('\n'), self.header))
+            yield from self._complete_groups()
+            self.groups = {}
+            self.hits_in_memory = 0
+
+
+    def close(self):
+        '''Deletes the bucket files'''
+        for filename in self.bucket_files:
+            if os.path.exists(filename):
+                os.unlink(filename)
+        self.bucket_files = []
@@ -0,0 +1,149 @@
+'''Classifies all the gaps at once, instead of one at a time with
+gap.Gap.update_hits().
+
+The first left and right hit of each gap are added to a HitTable, which
+keeps their fields in columns. classify() turns the columns into NumPy
+arrays and works out the type of every gap, its interval in the reference,
+and the interval of the assembly to replace, with array operations. The
+results are written straight into the arrays of a gap_registry.GapRegistry,
+and are the same as running gap.Gap.update_hits() on each gap.
+can_be_filled() does the same for gap.Gap.can_be_filled().'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from array import array
+from assembly_tools.fill_gaps_using_reference import gap, gap_registry
+
+class Error (Exception): pass
+
+_hit_fields = ['tid', 'pos', 'aend', 'qlen', 'qend', 'is_reverse', 'is_unmapped']
+_columns = ['left_' + x for x in _hit_fields] + ['right_' + x for x in _hit_fields]
+
+
+def _check_numpy():
+    if numpy is None:
+        raise Error('numpy is needed to classify gaps in a batch, but could not be imported')
+
+
+def _column(a):
+    '''Returns numpy array that shares its memory with the array.array a'''
+    return numpy.frombuffer(a, dtype=a.typecode)
+
+
+class HitTable:
+    def __init__(self):
+        self.gap_id = array('q')
+        self.multiple_hits = array('b')
+        self.hits = array('q')  # the values of _columns of each gap, one gap after another
+
+
+    def __len__(self):
+        return len(self.gap_id)
+
+
+    def add(self, gap_id, left_hits, right_hits):
+        '''Adds the hits of the left and right flanks of gap gap_id. Only the first
+           hit of each flank is kept, which is all that gap.Gap.update_hits() uses'''
+        left_names = set([x.qname for x in left_hits])
+        right_names = set([x.qname for x in right_hits])
+        if len(left_names) != 1 or len(right_names) != 1 \
+          or gap_registry.flank_name_to_id(left_names.pop()) != gap_id \
+          or gap_registry.flank_name_to_id(right_names.pop()) != gap_id:
+            raise Error('Hits of more than one gap given for gap ' + str(gap_id))
+
+        self.gap_id.append(gap_id)
+        self.multiple_hits.append(len(left_hits) > 1 and len(right_hits) > 1)
+        left = left_hits[0]
+        right = right_hits[0]
+        # aend is None for unmapped hits
+        left_aend = left.aend
+        right_aend = right.aend
+        self.hits.extend((
+            left.tid, left.pos, -1 if left_aend is None else left_aend, left.qlen, left.qend, left.is_reverse, left.is_unmapped,
+            right.tid, right.pos, -1 if right_aend is None else right_aend, right.qlen, right.qend, right.is_reverse, right.is_unmapped,
+        ))
+
+
+    def classify(self, gaps, samfile):
+        '''Updates the gaps in gap_registry.GapRegistry gaps that are in the table.
+           samfile is the pysam file of the hits, used to get reference names'''
+        _check_numpy()
+        if len(self) == 0:
+            return
+
+        ids = _column(self.gap_id)
+        hits = _column(self.hits).reshape(-1, len(_columns))
+        c = {name: hits[:, i] for i, name in enumerate(_columns)}
+        left_reverse = c['left_is_reverse'].astype(bool)
+
+        types = numpy.select(
+            [
+                _column(self.multiple_hits).astype(bool),
+                (c['left_is_unmapped'] | c['right_is_unmapped']).astype(bool),
+                c['left_tid'] != c['right_tid'],
+                left_reverse != c['right_is_reverse'].astype(bool),
+                numpy.where(left_reverse, c['left_pos'] < c['right_pos'], c['left_pos'] > c['right_pos']),
+            ],
+            [gap.MULTIPLE_HITS, gap.UNMAPPED, gap.DIFF_SEQS, gap.SAME_SEQ_DIFF_STRAND, gap.SAME_SEQ_STRAND_WRONG_ORDER],
+            default=gap.SAME_SEQ_STRAND,
+        ).astype(numpy.int8)
+
+        # same_seq is also used for the gaps whose type is changed to overlap below
+        same_seq = types == gap.SAME_SEQ_STRAND
+        ref_start = numpy.where(left_reverse, c['right_aend'], c['left_aend']) + 1
+        ref_end = numpy.where(left_reverse, c['left_pos'], c['right_pos']) - 1
+        overlap = same_seq & (ref_start > ref_end)
+        types[overlap] = gap.SAME_SEQ_STRAND_OVERLAP
+
+        # as in gap.Gap.update_hits(), when the hits overlap, the replaced
+        # interval is extended using the lengths of the right hit if the hits
+        # are reverse, or of both hits if not
+        query_start = _column(gaps.query_start)[ids]
+        query_end = _column(gaps.query_end)[ids]
+        ref_start = numpy.where(overlap, numpy.where(left_reverse, c['right_pos'], c['left_pos']), ref_start)
+        ref_end = numpy.where(overlap, numpy.where(left_reverse, c['left_aend'], c['right_aend']), ref_end)
+        replace_start = numpy.where(overlap, query_start - numpy.where(left_reverse, c['right_qlen'], c['left_qlen']), query_start)
+        replace_end = numpy.where(overlap, query_end + c['right_qend'], query_end)
+
+        # reference names are added to the registry in order of first use, as
+        # they would be by updating each gap in turn
+        tids, first_use, inverse = numpy.unique(c['left_tid'][same_seq], return_index=True, return_inverse=True)
+        ref_name_indexes = numpy.zeros(len(tids), dtype=numpy.int64)
+        for i in numpy.argsort(first_use):
+            ref_name_indexes[i] = gaps.ref_name_index(samfile.getrname(int(tids[i])))
+
+        # Fields are only written for the gaps that update_hits() would set them
+        # for. The numpy arrays share memory with the registry, so are deleted
+        # at the end, so that the registry arrays can change size again
+        registry_type = _column(gaps.gap_type)
+        registry_type[ids] = types
+        same_seq_ids = ids[same_seq]
+        for name, values in [('ref_start', ref_start), ('ref_end', ref_end),
+                             ('query_replace_start', replace_start), ('query_replace_end', replace_end)]:
+            registry_column = _column(getattr(gaps, name))
+            registry_column[same_seq_ids] = values[same_seq]
+            del registry_column
+
+        registry_ref_name = _column(gaps.ref_name)
+        registry_ref_name[same_seq_ids] = ref_name_indexes[inverse.reshape(-1)]
+        registry_reverse = _column(gaps.reverse_hit)
+        registry_reverse[ids[left_reverse & (same_seq | (types == gap.SAME_SEQ_STRAND_WRONG_ORDER))]] = 1
+        del registry_type, registry_ref_name, registry_reverse
+
+
+def can_be_filled(gaps, abs_diff=500, relative_err=3):
+    '''Returns numpy array of bools, with the result of gap.Gap.can_be_filled() for each gap in
+       gap_registry.GapRegistry gaps, indexed by gap ID'''
+    _check_numpy()
+    if len(gaps) == 0:
+        return numpy.zeros(0, dtype=bool)
+
+    types = _column(gaps.gap_type)
+    query_length = _column(gaps.query_end) - _column(gaps.query_start) + 1
+    ref_length = _column(gaps.ref_end) - _column(gaps.ref_start) + 1
+    diff = numpy.abs(query_length - ref_length)
+    good_length = (diff / query_length < relative_err) & (diff < abs_diff)
+    return numpy.where(types == gap.SAME_SEQ_STRAND, good_length, types == gap.SAME_SEQ_STRAND_OVERLAP)
@@ -0,0 +1,189 @@
+'''A directory of aligner indexes that can be shared between runs, and between
+jobs running at the same time. Each index is stored in a subdirectory named
+from a hash of the contents of the reference, plus the aligner and its
+indexing options, so changing or renaming the reference is handled
+correctly.
+
+Jobs take a shared lock on an index while they use it, so any number of
+jobs can use the same index at once. Only one job builds a given index,
+holding an exclusive lock, and others wait for it to finish. When the cache is
+bigger than its maximum size, the least recently used indexes that are not
+in use are deleted.'''
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+
+class Error (Exception): pass
+
+
+def file_hash(filename, blocksize=1048576):
+    '''Returns the sha256 hex digest of the contents of a file'''
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _dir_size(dirname):
+    total = 0
+    for root, dirs, files in os.walk(dirname):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+class IndexCache:
+    def __init__(self, directory, max_bytes=None):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _reference_hash(self, reference):
+        '''Returns hash of the reference contents. Hashes are remembered using the
+           file path, size and modification time, so that large references
+           are not read again every run'''
+        stat = os.stat(reference)
+        memo_key = hashlib.sha1(os.path.realpath(reference).encode()).hexdigest()
+        memo_file = os.path.join(self.directory, 'hashes', memo_key)
+        memo_value = str(stat.st_size) + ' ' + str(stat.st_mtime_ns)
+
+        try:
+            with open(memo_file) as f:
+                stored_value, stored_hash = f.read().rsplit(' ', 1)
+            if stored_value == memo_value:
+                return stored_hash.strip()
+        except (OSError, ValueError):
+            pass
+
+        ref_hash = file_hash(reference)
+        os.makedirs(os.path.dirname(memo_file), exist_ok=True)
+        tmp_file = memo_file + '.tmp.' + str(os.getpid())
+        with open(tmp_file, 'w') as f:
+            print(memo_value, ref_hash, file=f)
+        os.rename(tmp_file, memo_file)
+        return ref_hash
+
+    def key(self, reference, index_options):
+        '''index_options is a string describing the aligner and options
+           used to make the index, eg "smalt.k13.s2"'''
+        return self._reference_hash(reference) + '.' + index_options
+
+    def _lock_filename(self, key):
+        return os.path.join(self.directory, key + '.lock')
+
+    def _lock_is_current(self, lock, key):
+        '''Returns True if the open file lock is still the lock file of the entry key.
+           It is not if evict() deleted the lock file while we waited for the lock'''
+        try:
+            return os.fstat(lock.fileno()).st_ino == os.stat(self._lock_filename(key)).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _open_lock(self, key, operation):
+        '''Returns the lock file of the entry key, opened and locked with operation'''
+        while True:
+            lock = open(self._lock_filename(key), 'a')
+            fcntl.flock(lock, operation)
+            if self._lock_is_current(lock, key):
+                return lock
+            lock.close()
+
+    def _build(self, reference, key, build_function):
+        entry_dir = os.path.join(self.directory, key)
+        tmp_dir = entry_dir + '.tmp.' + str(os.getpid())
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.mkdir(tmp_dir)
+        try:
+            build_function(reference, os.path.join(tmp_dir, 'index'))
+        except:
+            shutil.rmtree(tmp_dir)
+            raise
+        open(os.path.join(tmp_dir, 'complete'), 'w').close()
+        os.rename(tmp_dir, entry_dir)
+
+    @contextlib.contextmanager
+    def index(self, reference, index_options, build_function):
+        '''Context manager that yields the prefix of the index files for the
+           reference. If the index is not in the cache, it is made by calling
+           build_function(reference, prefix). The index cannot be deleted by
+           other jobs until the context exits'''
+        key = self.key(reference, index_options)
+        entry_dir = os.path.join(self.directory, key)
+        complete_file = os.path.join(entry_dir, 'complete')
+
+        # A shared lock is enough to use an index that is already built, so jobs
+        # using the same index run at the same time. The lock is only made
+        # exclusive to build the index. Changing a flock is not atomic, so the
+        # checks are made again after each change
+        while True:
+            lock = self._open_lock(key, fcntl.LOCK_SH)
+            if not os.path.exists(complete_file):
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not self._lock_is_current(lock, key):
+                    lock.close()
+                    continue
+                if not os.path.exists(complete_file):
+                    try:
+                        self._build(reference, key, build_function)
+                    except:
+                        lock.close()
+                        raise
+                fcntl.flock(lock, fcntl.LOCK_SH)
+                if not (self._lock_is_current(lock, key) and os.path.exists(complete_file)):
+                    lock.close()
+                    continue
+            break
+
+        with lock:
+            # modification time of the 'complete' file is used to find the
+            # least recently used indexes
+            os.utime(complete_file)
+            self.evict(keep=key)
+            yield os.path.join(entry_dir, 'index')
+
+    def evict(self, keep=None):
+        '''Deletes least recently used indexes until the cache is no bigger than
+           max_bytes. Indexes that are in use, and the one called keep, are not deleted'''
+        if self.max_bytes is None:
+            return
+
+        entries = []
+        for name in os.listdir(self.directory):
+            complete_file = os.path.join(self.directory, name, 'complete')
+            if name != keep and os.path.exists(complete_file):
+                entries.append((os.path.getmtime(complete_file), name))
+
+        total = sum([_dir_size(os.path.join(self.directory, x[1])) for x in entries])
+        if keep is not None:
+            total += _dir_size(os.path.join(self.directory, keep))
+
+        for mtime, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            with open(self._lock_filename(name), 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                if not self._lock_is_current(lock, name):
+                    continue
+
+                entry_dir = os.path.join(self.directory, name)
+                if os.path.exists(entry_dir):
+                    size = _dir_size(entry_dir)
+                    shutil.rmtree(entry_dir)
+                    total -= size
+                # deleted while it is locked, so jobs waiting for it see that it
+                # is not current, and open a new one
+                os.unlink(self._lock_filename(name))
@@ -0,0 +1,266 @@
+'''Places gap flanks on the reference without an external aligner, using an
+index of the minimizers of the reference held in NumPy arrays.
+
+A minimizer is the k-mer with the smallest hash in each window of w
+consecutive k-mers. Reverse complement k-mers are treated as the same k-mer.
+The index is the sorted hashes of the minimizers of the reference, with
+their positions. The minimizers of each flank are looked up in the index,
+and each matching pair is a seed. Each seed implies a start position of the
+flank on the reference. Seeds whose start positions are close together are
+chained, and the number of seeds in a chain is its score. All flanks are
+processed at once with array operations. Hits are ungapped, which is enough
+to place a flank, and are written as SAM so that they can be used like the
+output of any other aligner.'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import pyfastaq
+
+class Error (Exception): pass
+
+_hash_multiplier = 0x9E3779B97F4A7C15
+
+
+def _check_numpy():
+    if numpy is None:
+        raise Error('numpy is needed to use the minimizer index, but could not be imported. Please install numpy, or use a different aligner')
+
+
+def _encode(seq):
+    '''Returns numpy array of the sequence with A,C,G,T coded as 0,1,2,3, and anything else as 4'''
+    table = numpy.full(256, 4, dtype=numpy.uint8)
+    for i, base in enumerate(b'ACGT'):
+        table[base] = i
+        table[base + 32] = i
+    return table[numpy.frombuffer(seq.encode(), dtype=numpy.uint8)]
+
+
+def minimizers(codes, k, w):
+    '''Given an array made by _encode(), returns a tuple of arrays (hashes, positions, forward)
+       of its minimizers. positions are the start of each k-mer, and forward is True where
+       the k-mer is the lower of itself and its reverse complement'''
+    kmers = len(codes) - k + 1
+    if kmers < 1:
+        return numpy.zeros(0, dtype=numpy.uint64), numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=bool)
+
+    bases = codes.astype(numpy.uint64) & numpy.uint64(3)
+    complement = numpy.uint64(3) - bases
+    fwd = numpy.zeros(kmers, dtype=numpy.uint64)
+    rev = numpy.zeros(kmers, dtype=numpy.uint64)
+    shifted = numpy.empty(kmers, dtype=numpy.uint64)
+    for j in range(k):
+        fwd <<= numpy.uint64(2)
+        fwd |= bases[j:j + kmers]
+        numpy.left_shift(complement[j:j + kmers], numpy.uint64(2 * j), out=shifted)
+        rev |= shifted
+
+    not_acgt = numpy.concatenate(([0], numpy.cumsum(codes > 3)))
+    valid = not_acgt[k:] == not_acgt[:-k]
+    forward = fwd <= rev
+    hashes = numpy.minimum(fwd, rev) * numpy.uint64(_hash_multiplier)
+    hashes ^= hashes >> numpy.uint64(31)
+    hashes[~valid] = numpy.iinfo(numpy.uint64).max
+
+    # The minimum of each window is found with w passes over the whole array. Then a
+    # k-mer is a minimizer if it equals the largest of the minimums of the windows
+    # that contain it (all the windows that contain it have a minimum <= its hash)
+    windows = max(1, kmers - w + 1)
+    window_min = hashes[:windows].copy()
+    for j in range(1, min(w, kmers)):
+        numpy.minimum(window_min, hashes[j:j + windows], out=window_min)
+
+    largest_min = numpy.zeros(kmers, dtype=numpy.uint64)
+    for j in range(min(w, kmers)):
+        numpy.maximum(largest_min[j:j + windows], window_min, out=largest_min[j:j + windows])
+
+    positions = numpy.flatnonzero((hashes == largest_min) & valid)
+    return hashes[positions], positions, forward[positions]
+
+
+class KmerIndex:
+    def __init__(self, k=19, w=10, max_occurrences=100, min_seeds=3, band=20, secondary_ratio=0.9):
+        '''k = kmer length (at most 32), w = number of k-mers in each window.
+           Minimizers found more than max_occurrences times in the reference are ignored.
+           A hit needs a chain of at least min_seeds seeds, whose start positions on the
+           reference are all within band of the previous seed. Hits with a score at least
+           secondary_ratio times the best hit are reported as secondary hits'''
+        _check_numpy()
+        if not 0 < k <= 32:
+            raise Error('k must be from 1 to 32')
+        self.k = k
+        self.w = w
+        self.max_occurrences = max_occurrences
+        self.min_seeds = min_seeds
+        self.band = band
+        self.secondary_ratio = secondary_ratio
+        self.names = []
+        self.offsets = numpy.zeros(1, dtype=numpy.int64)
+        self.hashes = numpy.zeros(0, dtype=numpy.uint64)
+        self.positions = numpy.zeros(0, dtype=numpy.int64)
+        self.forward = numpy.zeros(0, dtype=bool)
+
+
+    def build(self, fasta_file):
+        '''Indexes the sequences in a fasta/q file. Sequences are named by the first
+           word of the header, as other aligners and samtools faidx do'''
+        hashes = []
+        positions = []
+        forward = []
+        offsets = [0]
+        self.names = []
+
+        for seq in pyfastaq.sequences.file_reader(fasta_file):
+            h, p, f = minimizers(_encode(seq.seq), self.k, self.w)
+            hashes.append(h)
+            positions.append(p + offsets[-1])
+            forward.append(f)
+            self.names.append(seq.id.split()[0])
+            offsets.append(offsets[-1] + len(seq))
+
+        self.offsets = numpy.array(offsets, dtype=numpy.int64)
+        if len(hashes):
+            hashes = numpy.concatenate(hashes)
+            order = numpy.argsort(hashes, kind='stable')
+            self.hashes = hashes[order]
+            self.positions = numpy.concatenate(positions)[order]
+            self.forward = numpy.concatenate(forward)[order]
+
+
+    def save(self, filename):
+        numpy.savez(filename,
+            options=numpy.array([self.k, self.w]),
+            names=numpy.array(self.names, dtype=str),
+            offsets=self.offsets,
+            hashes=self.hashes,
+            positions=self.positions,
+            forward=self.forward)
+
+
+    def load(self, filename):
+        with numpy.load(filename) as data:
+            k, w = [int(x) for x in data['options']]
+            if (k, w) != (self.k, self.w):
+                raise Error('Index file ' + filename + ' was made with k=' + str(k) + ', w=' + str(w) + ', but expected k=' + str(self.k) + ', w=' + str(self.w))
+            self.names = [str(x) for x in data['names']]
+            self.offsets = data['offsets']
+            self.hashes = data['hashes']
+            self.positions = data['positions']
+            self.forward = data['forward']
+
+
+    def _seeds(self, codes, read_starts, read_lengths):
+        '''Returns tuple of arrays (read index, is_reverse, implied start in reference, position
+           in reference) of the seeds of the reads, which are concatenated in codes'''
+        q_hashes, q_positions, q_forward = minimizers(codes, self.k, self.w)
+        # minimizers overlapping the separator between reads are not valid, because
+        # they contain an N, so every minimizer is within one read
+        read = numpy.searchsorted(read_starts, q_positions, side='right') - 1
+        q_positions = q_positions - read_starts[read]
+
+        # searching for sorted values is faster, because searchsorted reuses
+        # the previous result
+        order = numpy.argsort(q_hashes)
+        q_hashes, q_positions, q_forward, read = q_hashes[order], q_positions[order], q_forward[order], read[order]
+        lo = numpy.searchsorted(self.hashes, q_hashes, side='left')
+        hi = numpy.searchsorted(self.hashes, q_hashes, side='right')
+        counts = hi - lo
+        keep = (counts > 0) & (counts <= self.max_occurrences)
+        lo, counts, read, q_positions, q_forward = lo[keep], counts[keep], read[keep], q_positions[keep], q_forward[keep]
+
+        # expand each query minimizer into one seed per matching reference minimizer
+        seed_query = numpy.repeat(numpy.arange(len(lo)), counts)
+        first_seed = numpy.cumsum(counts) - counts
+        index_rows = lo[seed_query] + numpy.arange(len(seed_query)) - first_seed[seed_query]
+
+        r_positions = self.positions[index_rows]
+        is_reverse = self.forward[index_rows] != q_forward[seed_query]
+        q_positions = q_positions[seed_query]
+        read = read[seed_query]
+        lengths = read_lengths[read]
+        starts = numpy.where(is_reverse, r_positions - (lengths - self.k - q_positions), r_positions - q_positions)
+        return read, is_reverse, starts, r_positions
+
+
+    def _hits(self, codes, read_starts, read_lengths):
+        '''Returns dict of read index -> list of hits (ref index, start, is_reverse, score),
+           best hit first'''
+        read, is_reverse, starts, r_positions = self._seeds(codes, read_starts, read_lengths)
+        if len(read) == 0:
+            return {}
+
+        order = numpy.lexsort((starts, is_reverse, read))
+        read, is_reverse, starts, r_positions = read[order], is_reverse[order], starts[order], r_positions[order]
+        new_chain = numpy.ones(len(read), dtype=bool)
+        new_chain[1:] = (read[1:] != read[:-1]) | (is_reverse[1:] != is_reverse[:-1]) | (starts[1:] - starts[:-1] > self.band)
+        chain_starts = numpy.flatnonzero(new_chain)
+        scores = numpy.diff(numpy.append(chain_starts, len(read)))
+        middle = chain_starts + scores // 2
+        chain_ref = numpy.searchsorted(self.offsets, r_positions[middle], side='right') - 1
+        chain_start = starts[middle] - self.offsets[chain_ref]
+
+        hits = {}
+        good = numpy.flatnonzero(scores >= self.min_seeds)
+        for i in good:
+            hits.setdefault(int(read[middle[i]]), []).append((int(chain_ref[i]), int(chain_start[i]), bool(is_reverse[middle[i]]), int(scores[i])))
+
+        for read_index, read_hits in hits.items():
+            read_hits.sort(key=lambda x: -x[3])
+            best = read_hits[0][3]
+            hits[read_index] = [x for x in read_hits if x[3] >= self.secondary_ratio * best]
+
+        return hits
+
+
+    def _sam_record(self, name, seq, hit, secondary):
+        ref_index, start, is_reverse, score = hit
+        ref_length = self.offsets[ref_index + 1] - self.offsets[ref_index]
+        flag = (16 if is_reverse else 0) | (256 if secondary else 0)
+        if is_reverse:
+            fa = pyfastaq.sequences.Fasta('x', seq)
+            fa.revcomp()
+            seq = fa.seq
+
+        # soft clip any part of the read hanging off the end of the reference
+        clip_start = max(0, -start)
+        clip_end = max(0, start + len(seq) - ref_length)
+        cigar = ''
+        if clip_start:
+            cigar += str(clip_start) + 'S'
+        cigar += str(len(seq) - clip_start - clip_end) + 'M'
+        if clip_end:
+            cigar += str(clip_end) + 'S'
+
+        return '\t'.join([name, str(flag), self.names[ref_index], str(start + clip_start + 1), '60', cigar, '*', '0', '0', seq, '*'])
+
+
+    def sam_header(self):
+        lines = ['@HD\tVN:1.0\tSO:unsorted']
+        for i, name in enumerate(self.names):
+            lines.append('@SQ\tSN:' + name + '\tLN:' + str(self.offsets[i + 1] - self.offsets[i]))
+        return '\n'.join(lines)
+
+
+    def sam_lines(self, reads):
+        '''Given a list of tuples (name, sequence), returns a list of SAM lines of
+           their hits, with the hits of each read together and in the same order as reads'''
+        if len(reads) == 0:
+            return []
+
+        # reads are joined with an N between them, so that no k-mer is in two reads
+        read_lengths = numpy.array([len(x[1]) for x in reads], dtype=numpy.int64)
+        read_starts = numpy.cumsum(read_lengths + 1) - read_lengths - 1
+        codes = _encode('N'.join([x[1] for x in reads]))
+        hits = self._hits(codes, read_starts, read_lengths)
+        lines = []
+
+        for i, (name, seq) in enumerate(reads):
+            if i in hits and len(seq) > 0:
+                for j, hit in enumerate(hits[i]):
+                    lines.append(self._sam_record(name, seq, hit, j > 0))
+            else:
+                lines.append('\t'.join([name, '4', '*', '0', '0', '*', '*', '0', '0', seq if len(seq) else '*', '*']))
+
+        return lines
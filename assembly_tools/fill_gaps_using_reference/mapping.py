@@ -0,0 +1,121 @@
+import concurrent.futures
+import math
+import os
+import shutil
+import pyfastaq
+from assembly_tools.fill_gaps_using_reference import helper
+
+class Error (Exception): pass
+
+
+def map_reads(aligner, index_prefix, reads, outfile, threads=1):
+    '''Maps reads using an aligner from the aligners module, writing SAM to outfile.
+       If outfile ends with .bam, the output is written in BAM format'''
+    with aligner.map(index_prefix, reads, threads=threads) as sam_stream:
+        if outfile.endswith('.bam'):
+            import pysam
+            sam_in = pysam.AlignmentFile(sam_stream, 'r')
+            bam_out = pysam.AlignmentFile(outfile, 'wb', template=sam_in)
+            for samrecord in sam_in.fetch(until_eof=True):
+                bam_out.write(samrecord)
+            bam_out.close()
+            sam_in.close()
+        else:
+            with open(outfile, 'wb') as fout:
+                shutil.copyfileobj(sam_stream, fout)
+
+
+def split_flanks(flanks_fasta, shards, outprefix):
+    '''Splits a fasta file of gap flanks, made by helper.find_gaps_and_write_flanks(),
+       into at most shards files called outprefix.1.fa.gz, outprefix.2.fa.gz, ...
+       The left and right flanks of each gap are put in the same file, and the order of
+       the sequences is kept. Returns the list of new filenames'''
+    pairs = pyfastaq.tasks.count_sequences(flanks_fasta) // 2
+    shards = max(1, min(shards, pairs))
+    pairs_per_shard = max(1, math.ceil(pairs / shards))
+    filenames = [outprefix + '.' + str(i + 1) + '.fa.gz' for i in range(shards)]
+    original_line_length = pyfastaq.sequences.Fasta.line_length
+    pyfastaq.sequences.Fasta.line_length = 0
+    fout = None
+    shard = -1
+
+    for i, seq in enumerate(pyfastaq.sequences.file_reader(flanks_fasta)):
+        if (i // 2) // pairs_per_shard > shard and shard < shards - 1:
+            if fout is not None:
+                pyfastaq.utils.close(fout)
+            shard += 1
+            fout = helper.open_file_write_fast(filenames[shard])
+        print(seq, file=fout)
+
+    if fout is not None:
+        pyfastaq.utils.close(fout)
+    pyfastaq.sequences.Fasta.line_length = original_line_length
+    return filenames[:shard + 1]
+
+
+def merge_sam_files(infiles, outfile):
+    '''Concatenates SAM files, keeping the header of the first file only'''
+    fout = pyfastaq.utils.open_file_write(outfile)
+
+    for i, filename in enumerate(infiles):
+        fin = pyfastaq.utils.open_file_read(filename)
+        for line in fin:
+            if i == 0 or not line.startswith('@'):
+                fout.write(line)
+        pyfastaq.utils.close(fin)
+
+    pyfastaq.utils.close(fout)
+
+
+def merge_bam_files(infiles, outfile):
+    '''Concatenates BAM files, keeping the header of the first file only'''
+    import pysam
+    bam_out = None
+
+    for filename in infiles:
+        bam_in = pysam.AlignmentFile(filename, 'rb')
+        if bam_out is None:
+            bam_out = pysam.AlignmentFile(outfile, 'wb', template=bam_in)
+        for samrecord in bam_in.fetch(until_eof=True):
+            bam_out.write(samrecord)
+        bam_in.close()
+
+    bam_out.close()
+
+
+def map_sharded(aligner, index_prefix, reads, outfile, threads=1, shards=None):
+    '''Same as map_reads(), but splits the reads (which must be gap flanks) into shards
+       that are mapped at the same time, using threads in total. The output SAM (or BAM) file has
+       the hits in the same order as the reads. shards defaults to the number of threads'''
+    if shards is None:
+        shards = threads
+
+    if shards <= 1:
+        map_reads(aligner, index_prefix, reads, outfile, threads=threads)
+        return
+
+    shard_files = split_flanks(reads, shards, outfile + '.shard')
+    if len(shard_files) <= 1:
+        for filename in shard_files:
+            os.unlink(filename)
+        map_reads(aligner, index_prefix, reads, outfile, threads=threads)
+        return
+
+    extension = '.bam' if outfile.endswith('.bam') else '.sam'
+    shard_outfiles = [x + extension for x in shard_files]
+    threads_per_shard = max(1, threads // len(shard_files))
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(shard_files)) as executor:
+            jobs = [executor.submit(map_reads, aligner, index_prefix, shard_files[i], shard_outfiles[i], threads=threads_per_shard) for i in range(len(shard_files))]
+            for job in jobs:
+                job.result()
+
+        if outfile.endswith('.bam'):
+            merge_bam_files(shard_outfiles, outfile)
+        else:
+            merge_sam_files(shard_outfiles, outfile)
+    finally:
+        for filename in shard_files + shard_outfiles:
+            if os.path.exists(filename):
+                os.unlink(filename)
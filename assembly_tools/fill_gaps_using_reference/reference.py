@@ -0,0 +1,63 @@
+import os
+from pyfastaq import sequences, utils
+
+class Error (Exception): pass
+
+
+def _is_plain_gzip(filename):
+    '''Returns True if the file is gzipped, but not with bgzip'''
+    with open(filename, 'rb') as f:
+        header = f.read(14)
+    return header[:2] == b'\x1f\x8b' and header[12:14] != b'BC'
+
+
+class Reference:
+    '''Random access to the sequences of a FASTA file through a faidx index,
+       so that the sequences do not need to be loaded into memory. The index
+       is made if it does not already exist. Files that are gzipped (but not
+       bgzipped), or whose index cannot be written, are first copied to an
+       uncompressed file called tmp_prefix + ".fa", which is deleted by close()'''
+    def __init__(self, filename, tmp_prefix=None):
+        import pysam
+        self.filename = filename
+        self.indexed_filename = filename  # the file that fetch() reads from
+        self.tmp_fasta = None
+
+        if not _is_plain_gzip(filename):
+            try:
+                self.fasta = pysam.FastaFile(filename)
+                return
+            except OSError:
+                pass
+
+        if tmp_prefix is None:
+            raise Error('Could not index reference file ' + filename + '. Please make sure it is uncompressed or bgzipped, and that its directory is writable')
+
+        self.tmp_fasta = tmp_prefix + '.fa'
+        fout = utils.open_file_write(self.tmp_fasta)
+        for seq in sequences.file_reader(filename):
+            print(seq, file=fout)
+        utils.close(fout)
+        self.indexed_filename = self.tmp_fasta
+        self.fasta = pysam.FastaFile(self.tmp_fasta)
+
+    def names(self):
+        return self.fasta.references
+
+    def length(self, name):
+        return self.fasta.get_reference_length(name)
+
+    def fetch(self, name, start, end):
+        '''Returns the sequence from start to end (zero-based, inclusive) of sequence called name'''
+        try:
+            return self.fasta.fetch(name, start, end + 1)
+        except KeyError:
+            raise Error('Sequence "' + name + '" not found in reference file ' + self.filename)
+
+    def close(self):
+        self.fasta.close()
+        if self.tmp_fasta is not None:
+            for f in [self.tmp_fasta, self.tmp_fasta + '.fai']:
+                if os.path.exists(f):
+                    os.unlink(f)
+            self.tmp_fasta = None
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from assembly_tools.fill_gaps_using_reference import aligners
+
+modules_dir = os.path.dirname(os.path.abspath(aligners.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+class TestAligners(unittest.TestCase):
+    def test_new(self):
+        '''Test new'''
+        aligner = aligners.new('smalt', smalt_k=11, smalt_s=3)
+        self.assertIsInstance(aligner, aligners.Smalt)
+        self.assertEqual(aligner.index_options(), 'smalt.k11.s3')
+        self.assertIsInstance(aligners.new('minimap2'), aligners.Minimap2)
+        self.assertIsInstance(aligners.new('bowtie2'), aligners.Bowtie2)
+        self.assertIsInstance(aligners.new('exact'), aligners.ExactMatch)
+        self.assertIsInstance(aligners.new('minimizer'), aligners.Minimizer)
+        with self.assertRaises(aligners.Error):
+            aligners.new('not_an_aligner')
+
+    def test_aligner_abstract_methods(self):
+        '''Test aligner missing methods cannot be made'''
+        class NoMapCommand(aligners.Aligner):
+            name = 'no_map_command'
+
+            def index_files(self, index_prefix):
+                return []
+
+            def index(self, reference, index_prefix):
+                pass
+
+        with self.assertRaises(TypeError):
+            NoMapCommand()
+
+        for aligner_class in aligners.aligner_classes.values():
+            aligner_class()
+        with self.assertRaises(aligners.Error):
+            aligners.ExactMatch().map_command('index', 'reads.fa')
+
+
+    def test_command_output(self):
+        '''Test command_output'''
+        with aligners.command_output(['echo', 'hello']) as f:
+            self.assertEqual(f.read(), b'hello\n')
+
+        with self.assertRaises(aligners.Error):
+            with aligners.command_output(['sh', '-c', 'echo oops >&2; exit 3']) as f:
+                f.read()
+
+        with self.assertRaises(aligners.Error):
+            with aligners.command_output(['tmp.aligners_test.not_a_command']) as f:
+                f.read()
+
+    def test_command_output_read_fails(self):
+        '''Test command_output when reading the output fails'''
+        with self.assertRaises(aligners.Error) as context:
+            with aligners.command_output(['sh', '-c', 'echo hello; exit 3']) as f:
+                f.readline()
+                raise ValueError('bad output')
+        self.assertIsInstance(context.exception.__cause__, ValueError)
+
+        with self.assertRaises(ValueError):
+            with aligners.command_output(['sh', '-c', 'echo hello']) as f:
+                raise ValueError('bad output')
+
+        with self.assertRaises(ValueError):
+            with aligners.command_output(['sleep', '30'], wait_timeout=0.1) as f:
+                raise ValueError('bad output')
+
+    def test_exact_match(self):
+        '''Test ExactMatch'''
+        aligner = aligners.ExactMatch()
+        index_prefix = 'tmp.aligners_test.index'
+        aligner.index(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'), index_prefix)
+        flanks = os.path.join(data_dir, 'helper_test_to_be_filled_gap_flanks.fa')
+        with aligner.map(index_prefix, flanks) as sam:
+            lines = sam.read().decode().rstrip().split('\n')
+
+        records = [x.split('\t') for x in lines if not x.startswith('@')]
+        names = [x[0] for x in records]
+        self.assertEqual(names[0], 'seq1:6-6.left')
+        self.assertEqual(sorted(set(names), key=names.index), ['seq1:6-6.left', 'seq1:6-6.right', 'seq1:13-14.left', 'seq1:13-14.right'])
+        for filename in aligner.index_files(index_prefix):
+            os.unlink(filename)
+
+    def test_exact_match_sam_lines(self):
+        '''Test ExactMatch.sam_lines'''
+        aligner = aligners.ExactMatch()
+        ref_seqs = [aligners.pyfastaq.sequences.Fasta('ref1', 'ACGTTTACGT'), aligners.pyfastaq.sequences.Fasta('ref2', 'GGGCCAAC')]
+        self.assertEqual(aligner.sam_lines(ref_seqs, 'read', 'TTTT'), ['read\t4\t*\t0\t0\t*\t*\t0\t0\tTTTT\t*'])
+        self.assertEqual(aligner.sam_lines(ref_seqs, 'read', 'ACGT'), [
+            'read\t0\tref1\t1\t60\t4M\t*\t0\t0\tACGT\t*',
+            'read\t256\tref1\t7\t60\t4M\t*\t0\t0\tACGT\t*',
+            'read\t272\tref1\t1\t60\t4M\t*\t0\t0\tACGT\t*',
+            'read\t272\tref1\t7\t60\t4M\t*\t0\t0\tACGT\t*',
+        ])
+        self.assertEqual(aligner.sam_lines(ref_seqs, 'read', 'GTTGG'), ['read\t16\tref2\t4\t60\t5M\t*\t0\t0\tCCAAC\t*'])
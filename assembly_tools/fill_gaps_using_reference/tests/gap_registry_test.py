@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from assembly_tools.fill_gaps_using_reference import gap, gap_registry
+
+class TestGapRegistry(unittest.TestCase):
+    def test_flank_name_to_id(self):
+        '''Test flank_name_to_id()'''
+        self.assertEqual(0, gap_registry.flank_name_to_id('0.left'))
+        self.assertEqual(42, gap_registry.flank_name_to_id('42.right'))
+
+        for name in ['x.left', '42', 'seq1:1-2.left']:
+            with self.assertRaises(gap_registry.Error):
+                gap_registry.flank_name_to_id(name)
+
+
+    def test_add(self):
+        '''Test add() and contig_gap_ids()'''
+        gaps = gap_registry.GapRegistry()
+        self.assertEqual(0, gaps.add('seq1', 5, 6))
+        self.assertEqual(1, gaps.add('seq1', 10, 12))
+        self.assertEqual(2, gaps.add('seq2', 3, 3))
+        self.assertEqual(3, len(gaps))
+        self.assertEqual(range(0, 2), gaps.contig_gap_ids('seq1'))
+        self.assertEqual(range(2, 3), gaps.contig_gap_ids('seq2'))
+        self.assertEqual(0, len(gaps.contig_gap_ids('seq3')))
+
+        with self.assertRaises(gap_registry.Error):
+            gaps.add('seq1', 20, 21)
+
+
+    def test_gap_and_update(self):
+        '''Test gap() and update()'''
+        gaps = gap_registry.GapRegistry()
+        gaps.add('seq1', 5, 6)
+        gaps.add('seq1', 10, 12)
+        g = gaps.gap(1)
+        self.assertEqual(('seq1', 10, 12, gap.UNKNOWN, None, False), (g.query_name, g.query_start, g.query_end, g.gap_type, g.ref_name, g.reverse_hit))
+
+        g.gap_type = gap.SAME_SEQ_STRAND
+        g.ref_name = 'ref1'
+        g.ref_start = 100
+        g.ref_end = 102
+        g.query_replace_start = 9
+        g.query_replace_end = 13
+        g.reverse_hit = True
+        gaps.update(1, g)
+        self.assertEqual(str(g), str(gaps.gap(1)))
+        self.assertEqual(gap.UNKNOWN, gaps.gap(0).gap_type)
+        self.assertEqual(['ref1'], gaps.ref_names)
+
+        g.ref_name = None
+        gaps.update(1, g)
+        self.assertEqual(None, gaps.gap(1).ref_name)
+
+
+    def test_reset(self):
+        '''Test reset()'''
+        gaps = gap_registry.GapRegistry()
+        gaps.add('seq1', 5, 6)
+        expected = str(gaps.gap(0))
+        g = gaps.gap(0)
+        g.gap_type = gap.SAME_SEQ_STRAND
+        g.ref_name = 'ref1'
+        g.ref_start = 100
+        g.ref_end = 102
+        gaps.update(0, g)
+        gaps.reference[0] = 2
+        gaps.reset(0)
+        self.assertEqual(expected, str(gaps.gap(0)))
+        self.assertEqual(0, gaps.reference[0])
+
+
+    def test_save_and_load(self):
+        '''Test save() and load()'''
+        gaps = gap_registry.GapRegistry()
+        gaps.add('seq1', 5, 6)
+        gaps.add('seq2', 10, 12)
+        g = gaps.gap(1)
+        g.gap_type = gap.SAME_SEQ_STRAND
+        g.ref_name = 'ref1'
+        gaps.update(1, g)
+        gaps.reference[1] = 1
+        tmp_file = 'tmp.gap_registry_test.gaps'
+        gaps.save(tmp_file)
+        got = gap_registry.load(tmp_file)
+        os.unlink(tmp_file)
+        self.assertEqual(gaps.__dict__, got.__dict__)
+        self.assertEqual(range(1, 2), got.contig_gap_ids('seq2'))
+        self.assertEqual(2, got.add('seq3', 1, 2))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import gzip
+import os
+import random
+import re
+import unittest
+from pyfastaq import sequences
+from assembly_tools.fill_gaps_using_reference import gap_scanner
+
+modules_dir = os.path.dirname(os.path.abspath(gap_scanner.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+class TestGapScanner(unittest.TestCase):
+    def test_n_runs(self):
+        '''Test n_runs() gives the same gaps as pyfastaq'''
+        tests = ['', 'A', 'N', 'n', 'NnN', 'ANA', 'NAN', 'AnNA', 'ACGTNNACGTnnNAC', 'NNNACGT', 'ACGTnnn']
+        random.seed(42)
+        tests += [''.join(random.choice('ACNn') for i in range(random.randint(1, 30))) for j in range(200)]
+
+        for seq in tests:
+            expected = [(x.start, x.end) for x in sequences.Fasta('x', seq).gaps()]
+            starts, ends = gap_scanner.n_runs(seq.encode())
+            self.assertEqual(expected, list(zip(starts, ends)))
+
+
+    def test_n_run_bounds(self):
+        '''Test n_run_bounds()'''
+        buffer = b'NNAN\nNACNn\nN'
+        self.assertEqual(([0, 3, 5, 8, 11], [2, 4, 6, 10, 12]), gap_scanner.n_run_bounds(buffer, 0, len(buffer)))
+        self.assertEqual(([1, 3], [2, 4]), gap_scanner.n_run_bounds(buffer, 1, 5))
+        regex = re.compile(rb'[^Nn\n]')
+        self.assertEqual(([0, 3, 8], [2, 6, 12]), gap_scanner.n_run_bounds(buffer, 0, len(buffer), regex=regex))
+
+
+    def test_file_reader(self):
+        '''Test file_reader() gives the same sequences as pyfastaq'''
+        tmp_fasta = 'tmp.gap_scanner_test.fa'
+        with open(tmp_fasta, 'w') as f:
+            print('>seq1 description', 'ACGTN', 'nnACG', 'T', '>seq2', '>seq3', 'AC', 'GT', sep='\n', file=f)
+        with gzip.open(tmp_fasta + '.gz', 'wt') as f:
+            print('>seq1', 'ACGTN', 'nnACG', sep='\n', file=f)
+
+        for filename in [tmp_fasta, tmp_fasta + '.gz', os.path.join(data_dir, 'helper_test_find_gaps_and_write_flanks.fa')]:
+            expected = [(x.id, x.seq.encode()) for x in sequences.file_reader(filename)]
+            # small blocks test records and headers being split between blocks
+            for block_size in [1, 2, 3, 5, 1000]:
+                self.assertEqual(expected, list(gap_scanner.file_reader(filename, block_size=block_size)))
+
+        os.unlink(tmp_fasta)
+        os.unlink(tmp_fasta + '.gz')
+
+
+    def test_file_reader_fastq(self):
+        '''Test file_reader() reads fastq using pyfastaq'''
+        tmp_fastq = 'tmp.gap_scanner_test.fq'
+        with open(tmp_fastq, 'w') as f:
+            print('@read1', 'ACNNT', '+', 'IIIII', sep='\n', file=f)
+        self.assertEqual([('read1', b'ACNNT')], list(gap_scanner.file_reader(tmp_fastq)))
+        os.unlink(tmp_fastq)
+
+
+    def test_trimmed_contigs(self):
+        '''Test trimmed_contigs()'''
+        got = list(gap_scanner.trimmed_contigs(os.path.join(data_dir, 'helper_test_find_gaps_and_write_flanks.fa')))
+        self.assertEqual([('seq1', b'ACGTANAAAATGNNCGT'), ('seq2', b'ACGTGTGGTGTG')], got)
+
+
+    def test_gap_stats(self):
+        '''Test GapStats'''
+        stats = gap_scanner.GapStats(bins=[2, 1, 5], min_length=1)
+        stats.add_contig('ctg1', b'ACNGTNNNNNACNNT')
+        stats.add_contig('ctg2', b'ACGT')
+        self.assertEqual([('ctg1', 15, 3, 8), ('ctg2', 4, 0, 0)], stats.contigs)
+        expected = {
+            'contigs': 2,
+            'total_length': 19,
+            'gaps': 3,
+            'gap_bases': 8,
+            'longest_gap': 5,
+            'gaps_per_mb': 157894.737,
+            'histogram': [{'min_length': 1, 'gaps': 1}, {'min_length': 2, 'gaps': 1}, {'min_length': 5, 'gaps': 1}],
+        }
+        self.assertEqual(expected, stats.summary())
+
+        stats = gap_scanner.GapStats(bins=[3], min_length=2)
+        stats.add_contig('ctg1', b'ACNGTNNNNNACNNT')
+        self.assertEqual(2, stats.gaps)
+        self.assertEqual([1], stats.histogram)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,30 +7,29 @@ import unittest
 import copy
 import pysam
 import assembly_tools.fill_gaps_using_reference.gap as gap
-from pyfastaq import sequences
 
 modules_dir = os.path.dirname(os.path.abspath(gap.__file__))
 data_dir = os.path.join(modules_dir, 'tests', 'data')
 
+
+def new_gap():
+    g = gap.Gap()
+    g.query_name = 'query_name'
+    g.query_start = 9
+    g.query_end = 41
+    return g
+
+
 class TestGap(unittest.TestCase):
     def test_construct_gap_and_str(self):
         '''Check gap constructor and string conversion'''
-        expected_gap = gap.Gap()
-        expected_gap.query_name = 'query_name'
-        expected_gap.query_start = 9
-        expected_gap.query_end = 41
-        expected_gap.left_seq = 'LEFTSEQ'
-        expected_gap.right_seq= 'RIGHTSEQ'
-      
-        line = '\t'.join(['query_name', '10', '42', 'LEFTSEQ', 'RIGHTSEQ' ])
-        test_gap = gap.Gap(line)
-        self.assertEqual(expected_gap, test_gap)
+        test_gap = new_gap()
+        self.assertEqual(test_gap, new_gap())
         expected_str = '\t'.join([ 'query_name', '10', '42', '0', '0', '*', '0', '0', '0', 'UNKNOWN' ])
-       
         self.assertEqual(str(test_gap), expected_str)
+        with self.assertRaises(AttributeError):
+            test_gap.left_seq = 'ACGT'
 
-        with self.assertRaises(gap.Error):
-            gap.Gap('foo')
 
     def test_update_hits(self):
         '''Test hits updated OK'''
@@ -77,28 +76,38 @@ class TestGap(unittest.TestCase):
         assert len(samfiles) == len(expected_gap_types)
 
         for i in range(len(samfiles)):
-            test_gap = gap.Gap('\t'.join(['query_name', '10', '42', 'LEFTSEQ', 'RIGHTSEQ' ]))
+            test_gap = new_gap()
             left, right, samfile = load_sam(samfiles[i])
             test_gap.update_hits(left, right, samfile)
             self.assertEqual(test_gap.gap_type, expected_gap_types[i])
+            if test_gap.gap_type != gap.MULTIPLE_HITS:
+                self.assertIsInstance(test_gap.left_hit, gap.Hit)
+                self.assertIsInstance(test_gap.right_hit, gap.Hit)
+
+            # gaps updated from the same records must be equal, which needs
+            # their hits to compare equal
+            same_gap = new_gap()
+            same_gap.update_hits(left, right, samfile)
+            self.assertEqual(test_gap, same_gap)
+
+
+    def test_hit(self):
+        '''Test Hit copies the fields of a pysam hit'''
+        samfile = pysam.Samfile(os.path.join(data_dir, 'gap_test_update_hits.same_seq_strand.sam'), "r")
+        for samrecord in samfile.fetch(until_eof=True):
+            hit = gap.Hit(samrecord)
+            for field in gap.Hit.__slots__:
+                self.assertEqual(getattr(samrecord, field), getattr(hit, field))
+            with self.assertRaises(AttributeError):
+                hit.seq = 'ACGT'
+            self.assertEqual(hit, gap.Hit(samrecord))
+            self.assertNotEqual(hit, samrecord)
+        samfile.close()
 
         
-    def test_left_or_right_fasta_name_prefix(self):
-        '''Test _left_or_right_fasta_name_prefix()'''
-        test_gap = gap.Gap('\t'.join(['query_name', '10', '42', 'LEFTSEQ', 'RIGHTSEQ' ]))
-        self.assertEqual(test_gap._left_or_right_fasta_name_prefix(), 'query_name:10-42')
-
-
-    def test_left_right_fasta(self):
-        '''Test left_fasta() and right_fasta()'''
-        test_gap = gap.Gap('\t'.join(['query_name', '10', '42', 'LEFTSEQ', 'RIGHTSEQ' ]))
-        self.assertEqual(test_gap.left_fasta(), sequences.Fasta('query_name:10-42.left', 'LEFTSEQ'))
-        self.assertEqual(test_gap.right_fasta(), sequences.Fasta('query_name:10-42.right', 'RIGHTSEQ'))
-
-
     def test_can_be_filled(self):
         '''Test can_be_filled()'''
-        test_gap = gap.Gap('\t'.join(['query_name', '10', '42', 'LEFTSEQ', 'RIGHTSEQ' ]))
+        test_gap = new_gap()
         gap_types = [x for x in gap.type_to_str.values() if x != 'SAME_SEQ_STRAND']
         for t in gap_types:
             test_gap.gap_type = t
@@ -3,56 +3,149 @@
 import sys
 import os
 import filecmp
+import io
+import json
+import subprocess
 import unittest
 import copy
 import pysam
 import assembly_tools.fill_gaps_using_reference.helper as helper
+from assembly_tools.fill_gaps_using_reference import gap, gap_registry, reference
 from pyfastaq import sequences
 
 modules_dir = os.path.dirname(os.path.abspath(helper.__file__))
 data_dir = os.path.join(modules_dir, 'tests', 'data')
 
 class TestHelper(unittest.TestCase):
-    def test_make_fasta_of_gap_flanks(self):
-        '''Test make_fasta_of_gap_flanks()'''
+    def test_trimmed_seqs(self):
+        '''Test trimmed_seqs()'''
+        got = [(x.id, x.seq) for x in helper.trimmed_seqs(os.path.join(data_dir, 'helper_test_find_gaps_and_write_flanks.fa'))]
+        expected = [
+            ('seq1', 'ACGTANAAAATGNNCGT'),
+            ('seq2', 'ACGTGTGGTGTG'),
+        ]
+        self.assertEqual(expected, got)
+
+    def test_find_gaps_and_write_flanks(self):
+        '''Test find_gaps_and_write_flanks()'''
         tmp_out = 'tmp.fa'
-        gaps = {}
-        helper.make_fasta_of_gap_flanks(os.path.join(data_dir, 'helper_test_to_be_filled.fa'), 3, tmp_out, gaps)
-        self.assertTrue(filecmp.cmp(tmp_out, os.path.join(data_dir, 'helper_test_to_be_filled_gap_flanks.fa')))
+        gaps = gap_registry.GapRegistry()
+        helper.find_gaps_and_write_flanks(os.path.join(data_dir, 'helper_test_find_gaps_and_write_flanks.fa'), 3, tmp_out, gaps)
+        self.assertTrue(filecmp.cmp(tmp_out, os.path.join(data_dir, 'helper_test_find_gaps_and_write_flanks.flanks.fa'), shallow=False))
+        os.unlink(tmp_out)
+
+        expected_coords = [('seq1', 5, 5), ('seq1', 12, 13)]
+        got_coords = [(gaps.gap(i).query_name, gaps.gap(i).query_start, gaps.gap(i).query_end) for i in range(len(gaps))]
+        self.assertEqual(expected_coords, got_coords)
+
+    def test_write_flanks_of_gaps(self):
+        '''Test write_flanks_of_gaps()'''
+        tmp_out = 'tmp.helper_test.write_flanks_of_gaps.fa'
+        helper.write_flanks_of_gaps(os.path.join(data_dir, 'helper_test_find_gaps_and_write_flanks.flanks.fa'), {1}, tmp_out)
+        got = [(x.id, x.seq) for x in sequences.file_reader(tmp_out)]
+        self.assertEqual([('1.left', 'ATG'), ('1.right', 'CGT')], got)
         os.unlink(tmp_out)
 
     def test_paired_hit_samreader(self):
         '''Test paired_hit_samreader()'''
-        samreader = helper.paired_hit_samreader(os.path.join(data_dir, 'helper_test_paired_hit_samreader.sam'))
+        samfile_name = os.path.join(data_dir, 'helper_test_paired_hit_samreader.sam')
         expected = [(['seq1:1-1.left'], ['seq1:1-1.right']),
                     (['seq1:6-6.left'] * 2, ['seq1:6-6.right'] * 2),
                     (['seq1:13-14.left'], ['seq1:13-14.right'] * 2),
                     (['seq1:9-9.left'] * 2, ['seq1:9-9.right'])]
-        i = 0
-
-        for left, right, samfile in samreader:
-            left_names = [x.qname for x in left]
-            right_names = [x.qname for x in right]
-            self.assertListEqual(expected[i][0], left_names)
-            self.assertListEqual(expected[i][1], right_names)
-            i += 1
-
-    def test_gap_flank_seqname_to_dict_key(self):
-        '''Test gap_flank_seqname_to_dict_key()'''
-        self.assertEqual(helper._gap_flank_seqname_to_dict_key('name:1-42.left'), ('name', (0, 41)))
-        self.assertEqual(helper._gap_flank_seqname_to_dict_key('name:1-42.right'), ('name', (0, 41)))
-
-        bad_names = [
-            'name:a-42.left',
-            'name:a-42.right',
-            'name:1-a.leftt',
-            'name:1-a.right',
-            'name:1-42.x'
+
+        # check reading from a pipe, as well as from a file
+        proc = subprocess.Popen(['cat', samfile_name], stdout=subprocess.PIPE)
+
+        for sam_input in [samfile_name, proc.stdout]:
+            i = 0
+
+            for left, right, samfile in helper.paired_hit_samreader(sam_input):
+                left_names = [x.qname for x in left]
+                right_names = [x.qname for x in right]
+                self.assertListEqual(expected[i][0], left_names)
+                self.assertListEqual(expected[i][1], right_names)
+                i += 1
+
+            self.assertEqual(i, len(expected))
+
+        proc.stdout.close()
+        proc.wait()
+
+    def test_replace_intervals(self):
+        '''Test replace_intervals()'''
+        seq = 'ACGTNNACGTNNNAC'
+        tests = [
+            ([], seq),
+            ([(4, 5, 'xy')], 'ACGTxyACGTNNNAC'),
+            ([(10, 12, 'z'), (4, 5, 'xyxy')], 'ACGTxyxyACGTzAC'),
+            ([(10, 14, ''), (0, 5, 'x')], 'xACGT'),
+            # overlapping intervals are applied one at a time, like pyfastaq does
+            ([(10, 12, 'zzz'), (4, 11, 'x')], 'ACGTxzAC'),
         ]
 
-        for name in bad_names:
-            with self.assertRaises(helper.Error):
-                helper._gap_flank_seqname_to_dict_key(name)
+        for replacements, expected in tests:
+            self.assertEqual(helper.replace_intervals(seq, replacements), expected)
+            fasta = sequences.Fasta('x', seq)
+            for start, end, new in replacements:
+                fasta.replace_interval(start, end, new)
+            self.assertEqual(fasta.seq, expected)
+
+        with self.assertRaises(sequences.Error):
+            helper.replace_intervals(seq, [(10, 15, 'x')])
+
+
+    def test_fill_gaps(self):
+        '''Test fill_gaps() gives the same result with a pool of processes'''
+        gaps = gap_registry.GapRegistry()
+        helper.find_gaps_and_write_flanks(os.path.join(data_dir, 'helper_test_to_be_filled.fa'), 3, 'tmp.helper_test.fill_gaps.flanks.fa', gaps)
+        os.unlink('tmp.helper_test.fill_gaps.flanks.fa')
+        for gap_id, ref_start, ref_end, reverse in [(0, 6, 6, False), (1, 1, 3, True)]:
+            g = gaps.gap(gap_id)
+            g.gap_type = gap.SAME_SEQ_STRAND
+            g.ref_name = 'ref2'
+            g.ref_start = ref_start
+            g.ref_end = ref_end
+            g.query_replace_start = g.query_start
+            g.query_replace_end = g.query_end
+            g.reverse_hit = reverse
+            gaps.update(gap_id, g)
+
+        ref_seqs = reference.Reference(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'))
+        tmp_out = 'tmp.helper_test.fill_gaps.fa'
+        expected = [('seq1', 'ACGTAAAAAATGACGCGT'), ('seq2', 'ACGTGTGGTGTG')]
+
+        for threads in [1, 2]:
+            json_log = io.StringIO()
+            counts = helper.fill_gaps(os.path.join(data_dir, 'helper_test_to_be_filled.fa'), tmp_out, gaps, ref_seqs, json_log_fh=json_log, threads=threads, batch_bases=1)
+            self.assertEqual(2, counts['closed'])
+            self.assertEqual(2, counts['total'])
+            self.assertEqual(2, counts['types']['SAME_SEQ_STRAND'])
+            self.assertEqual(0, counts['types']['UNMAPPED'])
+            self.assertEqual(expected, [(x.id, x.seq) for x in sequences.file_reader(tmp_out)])
+            os.unlink(tmp_out)
+
+            got_json = [json.loads(x) for x in json_log.getvalue().splitlines()]
+            self.assertEqual(2, len(got_json))
+            self.assertEqual({
+                'contig': 'seq1',
+                'gap_start': 13,
+                'gap_end': 14,
+                'gap_length': 2,
+                'type': 'SAME_SEQ_STRAND',
+                'closed': True,
+                'reference': os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'),
+                'ref_name': 'ref2',
+                'ref_start': 2,
+                'ref_end': 4,
+                'reverse': True,
+                'replace_start': 13,
+                'replace_end': 14,
+                'fill_length': 3,
+            }, got_json[0])
+
+        ref_seqs.close()
+        os.unlink(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa.fai'))
 
 
     def test_parse_sam_file(self):
@@ -60,5 +153,44 @@ class TestHelper(unittest.TestCase):
         # FIXME
         pass
 
+
+    def test_parse_unordered_sam_file(self):
+        '''Test parse_unordered_sam_file() gives same result as parse_sam_file()'''
+        # rename the flanks to gap IDs, as made by find_gaps_and_write_flanks()
+        samfile_name = os.path.join(data_dir, 'helper_test_paired_hit_samreader.sam')
+        new_names = {'seq1:1-1': '0', 'seq1:6-6': '1', 'seq1:9-9': '2', 'seq1:13-14': '3'}
+        with open(samfile_name) as f:
+            lines = f.readlines()
+        header = [x for x in lines if x.startswith('@')]
+        hits = []
+        for line in lines:
+            if not line.startswith('@'):
+                name, flank = line.split('\t', 1)[0].rsplit('.', 1)
+                hits.append(new_names[name] + '.' + flank + line[line.index('\t'):])
+
+        tmp_ordered_sam = 'tmp.helper_test.ordered.sam'
+        tmp_unordered_sam = 'tmp.helper_test.unordered.sam'
+        with open(tmp_ordered_sam, 'w') as f:
+            f.writelines(header + hits)
+        with open(tmp_unordered_sam, 'w') as f:
+            f.writelines(header + sorted(hits))
+
+        def new_gaps():
+            gaps = gap_registry.GapRegistry()
+            for start, end in [(0, 0), (5, 5), (8, 8), (12, 13)]:
+                gaps.add('seq1', start, end)
+            return gaps
+
+        expected = new_gaps()
+        helper.parse_sam_file(tmp_ordered_sam, expected)
+        self.assertEqual(gap.MULTIPLE_HITS, expected.gap(1).gap_type)
+        for max_hits in [100, 2]:
+            got = new_gaps()
+            helper.parse_unordered_sam_file(tmp_unordered_sam, got, 'tmp.helper_test.unordered', max_hits_in_memory=max_hits)
+            for gap_id in range(len(expected)):
+                self.assertEqual(str(expected.gap(gap_id)), str(got.gap(gap_id)))
+        os.unlink(tmp_ordered_sam)
+        os.unlink(tmp_unordered_sam)
+
 if __name__ == '__main__':
     unittest.main()
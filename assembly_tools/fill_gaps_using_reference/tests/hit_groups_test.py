@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import unittest
+import pysam
+from assembly_tools.fill_gaps_using_reference import hit_groups
+
+modules_dir = os.path.dirname(os.path.abspath(hit_groups.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+class TestHitGroups(unittest.TestCase):
+    def test_flank_name_to_gap_name(self):
+        '''Test flank_name_to_gap_name'''
+        self.assertEqual(hit_groups.flank_name_to_gap_name('seq1:1-2.left'), ('seq1:1-2', True))
+        self.assertEqual(hit_groups.flank_name_to_gap_name('seq.1:1-2.right'), ('seq.1:1-2', False))
+        with self.assertRaises(hit_groups.Error):
+            hit_groups.flank_name_to_gap_name('seq1:1-2')
+
+    def test_hit_grouper(self):
+        '''Test HitGrouper with hits in any order, in memory and spilled to disk'''
+        samfile = pysam.AlignmentFile(os.path.join(data_dir, 'helper_test_paired_hit_samreader.sam'))
+        records = list(samfile.fetch(until_eof=True))
+        expected = {
+            'seq1:1-1': (['0'], ['0']),
+            'seq1:6-6': (['0', '256'], ['0', '256']),
+            'seq1:13-14': (['0'], ['16', '272']),
+            'seq1:9-9': (['0', '256'], ['0']),
+        }
+        rand = random.Random(1)
+        # the last record is a right flank, so without it, seq1:9-9 is incomplete
+        incomplete = records[:-1]
+
+        for max_hits in [100, 3]:
+            for i in range(5):
+                rand.shuffle(records)
+                grouper = hit_groups.HitGrouper(samfile.header, 'tmp.hit_groups_test', max_hits_in_memory=max_hits, buckets=3)
+                for record in records:
+                    grouper.add(record)
+                got = {}
+                for left_hits, right_hits in grouper:
+                    name = hit_groups.flank_name_to_gap_name(left_hits[0].qname)[0]
+                    got[name] = ([str(x.flag) for x in left_hits], [str(x.flag) for x in right_hits])
+                self.assertEqual(expected, got)
+                self.assertEqual(len(grouper.bucket_files) > 0, max_hits < len(records))
+                grouper.close()
+                self.assertFalse(any(x.startswith('tmp.hit_groups_test') for x in os.listdir('.')))
+
+            grouper = hit_groups.HitGrouper(samfile.header, 'tmp.hit_groups_test', max_hits_in_memory=max_hits, buckets=3)
+            for record in incomplete:
+                grouper.add(record)
+            got = sorted([hit_groups.flank_name_to_gap_name(x[0][0].qname)[0] for x in grouper])
+            self.assertEqual(got, ['seq1:1-1', 'seq1:13-14', 'seq1:6-6'])
+            grouper.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from assembly_tools.fill_gaps_using_reference import gap, gap_registry, helper, hit_table
+
+modules_dir = os.path.dirname(os.path.abspath(hit_table.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+
+def new_gaps():
+    gaps = gap_registry.GapRegistry()
+    for i in range(11):
+        gaps.add('seq' + str(i // 4), 100 * i + 50, 100 * i + 59)
+    return gaps
+
+
+@unittest.skipIf(hit_table.numpy is None, 'numpy not installed')
+class TestHitTable(unittest.TestCase):
+    def test_classify(self):
+        '''Test classify gives the same results as gap.Gap.update_hits()'''
+        samfile = os.path.join(data_dir, 'hit_table_test.sam')
+        expected = new_gaps()
+        helper.parse_sam_file(samfile, expected, batch=False)
+        got = new_gaps()
+        helper.parse_sam_file(samfile, got, batch=True)
+
+        expected_types = [
+            gap.MULTIPLE_HITS,
+            gap.UNMAPPED,
+            gap.DIFF_SEQS,
+            gap.SAME_SEQ_DIFF_STRAND,
+            gap.SAME_SEQ_STRAND_WRONG_ORDER,
+            gap.SAME_SEQ_STRAND_WRONG_ORDER,
+            gap.SAME_SEQ_STRAND,
+            gap.SAME_SEQ_STRAND,
+            gap.SAME_SEQ_STRAND_OVERLAP,
+            gap.SAME_SEQ_STRAND_OVERLAP,
+            gap.SAME_SEQ_STRAND,
+        ]
+        self.assertEqual(expected_types, list(expected.gap_type))
+
+        for gap_id in range(len(expected)):
+            self.assertEqual(expected.gap(gap_id), got.gap(gap_id))
+        self.assertEqual(expected.ref_names, got.ref_names)
+
+        for max_hits in [100, 2]:
+            got = new_gaps()
+            helper.parse_unordered_sam_file(samfile, got, 'tmp.hit_table_test', max_hits_in_memory=max_hits, batch=True)
+            for gap_id in range(len(expected)):
+                self.assertEqual(expected.gap(gap_id), got.gap(gap_id))
+
+
+    def test_add_wrong_gap(self):
+        '''Test add with hits from a different gap'''
+        import pysam
+        samfile = pysam.AlignmentFile(os.path.join(data_dir, 'hit_table_test.sam'))
+        hits = list(samfile.fetch(until_eof=True))
+        table = hit_table.HitTable()
+        with self.assertRaises(hit_table.Error):
+            table.add(1, hits[4:5], hits[7:8])
+        samfile.close()
+
+
+    def test_can_be_filled(self):
+        '''Test can_be_filled gives the same results as gap.Gap.can_be_filled()'''
+        gaps = new_gaps()
+        self.assertEqual([False] * len(gaps), list(hit_table.can_be_filled(gaps)))
+        helper.parse_sam_file(os.path.join(data_dir, 'hit_table_test.sam'), gaps, batch=True)
+
+        for abs_diff in [0, 2, 500]:
+            for relative_err in [0, 0.15, 3]:
+                expected = [gaps.gap(x).can_be_filled(abs_diff=abs_diff, relative_err=relative_err) for x in range(len(gaps))]
+                got = hit_table.can_be_filled(gaps, abs_diff=abs_diff, relative_err=relative_err)
+                self.assertEqual(expected, list(got))
+
+        self.assertEqual([6, 7, 8, 9], [x for x in range(len(gaps)) if hit_table.can_be_filled(gaps)[x]])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+import shutil
+import time
+import unittest
+from assembly_tools.fill_gaps_using_reference import index_cache
+
+modules_dir = os.path.dirname(os.path.abspath(index_cache.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+
+def use_index(cache_dir, reference, queue):
+    '''Holds the index of the reference for a second, and puts the times it
+       started and stopped holding it in the queue'''
+    def build(reference, prefix):
+        open(prefix + '.idx', 'w').close()
+
+    cache = index_cache.IndexCache(cache_dir)
+    with cache.index(reference, 'smalt.k13.s2', build):
+        start = time.time()
+        time.sleep(1)
+        queue.put((start, time.time()))
+
+
+class TestIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = 'tmp.index_cache_test'
+        self.builds = []
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def build(self, reference, prefix):
+        self.builds.append(reference)
+        with open(prefix + '.idx', 'w') as f:
+            print('x' * 1000, file=f)
+
+    def test_index_reused(self):
+        '''Test index only built once, and key depends on contents and options'''
+        cache = index_cache.IndexCache(self.cache_dir)
+        ref1 = os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa')
+        tmp_ref = 'tmp.index_cache_test.fa'
+        shutil.copyfile(ref1, tmp_ref)
+
+        with cache.index(ref1, 'smalt.k13.s2', self.build) as prefix:
+            self.assertTrue(os.path.exists(prefix + '.idx'))
+            first_prefix = prefix
+        with cache.index(tmp_ref, 'smalt.k13.s2', self.build) as prefix:
+            self.assertEqual(first_prefix, prefix)
+        self.assertEqual(self.builds, [ref1])
+
+        with cache.index(tmp_ref, 'smalt.k11.s2', self.build) as prefix:
+            self.assertNotEqual(first_prefix, prefix)
+        self.assertEqual(self.builds, [ref1, tmp_ref])
+
+        with open(tmp_ref, 'a') as f:
+            print('>extra\nACGT', file=f)
+        with cache.index(tmp_ref, 'smalt.k13.s2', self.build) as prefix:
+            self.assertNotEqual(first_prefix, prefix)
+        self.assertEqual(self.builds, [ref1, tmp_ref, tmp_ref])
+        os.unlink(tmp_ref)
+
+    def test_failed_build_not_cached(self):
+        '''Test index not stored if build fails'''
+        def bad_build(reference, prefix):
+            raise Exception('build failed')
+
+        cache = index_cache.IndexCache(self.cache_dir)
+        ref = os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa')
+        with self.assertRaises(Exception):
+            with cache.index(ref, 'smalt.k13.s2', bad_build) as prefix:
+                pass
+        with cache.index(ref, 'smalt.k13.s2', self.build) as prefix:
+            pass
+        self.assertEqual(len(self.builds), 1)
+
+    def test_evict(self):
+        '''Test least recently used indexes deleted when cache too big'''
+        cache = index_cache.IndexCache(self.cache_dir, max_bytes=3500)
+        ref = os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa')
+        prefixes = []
+        for k in range(3):
+            with cache.index(ref, 'smalt.k' + str(k), self.build) as prefix:
+                prefixes.append(prefix)
+            time.sleep(0.01)
+        self.assertEqual([os.path.exists(x + '.idx') for x in prefixes], [True, True, True])
+
+        # index in use must not be deleted
+        with cache.index(ref, 'smalt.k0', self.build):
+            with cache.index(ref, 'smalt.k3', self.build) as prefix:
+                prefixes.append(prefix)
+            self.assertEqual([os.path.exists(x + '.idx') for x in prefixes], [True, False, True, True])
+        lock_files = [cache._lock_filename(cache.key(ref, 'smalt.k' + str(k))) for k in range(4)]
+        self.assertEqual([os.path.exists(x) for x in lock_files], [True, False, True, True])
+
+    def test_shared_use(self):
+        '''Test two jobs can use the same index at the same time'''
+        cache = index_cache.IndexCache(self.cache_dir)
+        ref = os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa')
+        with cache.index(ref, 'smalt.k13.s2', self.build):
+            pass
+
+        queue = multiprocessing.Queue()
+        jobs = [multiprocessing.Process(target=use_index, args=(self.cache_dir, ref, queue)) for i in range(2)]
+        for job in jobs:
+            job.start()
+        times = sorted([queue.get(timeout=30) for job in jobs])
+        for job in jobs:
+            job.join()
+        self.assertLess(times[1][0], times[0][1])
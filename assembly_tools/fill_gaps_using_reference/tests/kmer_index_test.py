@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import unittest
+import pyfastaq
+from assembly_tools.fill_gaps_using_reference import kmer_index
+
+modules_dir = os.path.dirname(os.path.abspath(kmer_index.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+
+def revcomp(seq):
+    fa = pyfastaq.sequences.Fasta('x', seq)
+    fa.revcomp()
+    return fa.seq
+
+
+@unittest.skipIf(kmer_index.numpy is None, 'numpy not installed')
+class TestKmerIndex(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(1)
+        self.ref1 = ''.join(rand.choice('ACGT') for i in range(3000))
+        repeat = ''.join(rand.choice('ACGT') for i in range(200))
+        self.ref2 = ''.join(rand.choice('ACGT') for i in range(500)) + repeat + ''.join(rand.choice('ACGT') for i in range(500)) + repeat
+        self.tmp_ref = 'tmp.kmer_index_test.ref.fa'
+        with open(self.tmp_ref, 'w') as f:
+            print('>ref1\n' + self.ref1 + '\n>ref2\n' + self.ref2, file=f)
+        self.index = kmer_index.KmerIndex(k=15, w=5)
+        self.index.build(self.tmp_ref)
+
+    def tearDown(self):
+        os.unlink(self.tmp_ref)
+
+    def test_minimizers(self):
+        '''Test minimizers are the same on both strands'''
+        codes = kmer_index._encode(self.ref1[:500])
+        hashes, positions, forward = kmer_index.minimizers(codes, 15, 5)
+        rev_hashes, rev_positions, rev_forward = kmer_index.minimizers(kmer_index._encode(revcomp(self.ref1[:500])), 15, 5)
+        self.assertGreater(len(hashes), 500 / 5)
+        self.assertEqual(sorted(hashes), sorted(rev_hashes))
+        self.assertEqual(sorted(positions), sorted(500 - 15 - rev_positions))
+        self.assertEqual(list(kmer_index.minimizers(kmer_index._encode('N' * 100), 15, 5)[0]), [])
+
+    def test_sam_lines(self):
+        '''Test sam_lines'''
+        read1 = self.ref1[1000:1200]
+        read2 = revcomp(self.ref1[2000:2100])
+        read3 = self.ref1[-50:] + 'ACGTACGTACGT'
+        read4 = self.ref2[500:700]
+        reads = [('read1', read1), ('read2', read2), ('read3', read3), ('read4', read4), ('read5', 'ACGT'), ('read6', '')]
+        got = [x.split('\t') for x in self.index.sam_lines(reads)]
+        self.assertEqual([x[0] for x in got], ['read1', 'read2', 'read3', 'read4', 'read4', 'read5', 'read6'])
+        self.assertEqual(got[0][1:6], ['0', 'ref1', '1001', '60', '200M'])
+        self.assertEqual(got[1][1:6], ['16', 'ref1', '2001', '60', '100M'])
+        self.assertEqual(got[1][9], self.ref1[2000:2100])
+        self.assertEqual(got[2][1:6], ['0', 'ref1', '2951', '60', '50M12S'])
+        self.assertEqual([got[3][1], got[4][1]], ['0', '256'])
+        self.assertEqual(sorted([got[3][2:6], got[4][2:6]]), [['ref2', '1201', '60', '200M'], ['ref2', '501', '60', '200M']])
+        self.assertEqual(got[5][1:3], ['4', '*'])
+        self.assertEqual(got[6][1:3], ['4', '*'])
+
+    def test_save_and_load(self):
+        '''Test save and load'''
+        tmp_index = 'tmp.kmer_index_test.npz'
+        self.index.save(tmp_index)
+        loaded = kmer_index.KmerIndex(k=15, w=5)
+        loaded.load(tmp_index)
+        self.assertEqual(loaded.names, ['ref1', 'ref2'])
+        self.assertEqual(list(loaded.offsets), [0, 3000, 4400])
+        self.assertEqual(list(loaded.hashes), list(self.index.hashes))
+        self.assertEqual(list(loaded.positions), list(self.index.positions))
+
+        with self.assertRaises(kmer_index.Error):
+            kmer_index.KmerIndex(k=17, w=5).load(tmp_index)
+        os.unlink(tmp_index)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import filecmp
+import os
+import unittest
+import pyfastaq
+import pysam
+from assembly_tools.fill_gaps_using_reference import aligners, mapping
+
+modules_dir = os.path.dirname(os.path.abspath(mapping.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+class TestMapping(unittest.TestCase):
+    def test_split_flanks(self):
+        '''Test split_flanks'''
+        flanks = os.path.join(data_dir, 'helper_test_to_be_filled_gap_flanks.fa')
+        expected = [(seq.id, seq.seq) for seq in pyfastaq.sequences.file_reader(flanks)]
+
+        for shards, expected_files in [(1, 1), (2, 2), (5, 2)]:
+            filenames = mapping.split_flanks(flanks, shards, 'tmp.mapping_test.split')
+            self.assertEqual(len(filenames), expected_files)
+            got = []
+            for filename in filenames:
+                seqs = [(seq.id, seq.seq) for seq in pyfastaq.sequences.file_reader(filename)]
+                self.assertEqual(len(seqs) % 2, 0)
+                got += seqs
+                os.unlink(filename)
+            self.assertEqual(got, expected)
+
+    def test_merge_sam_files(self):
+        '''Test merge_sam_files'''
+        samfile = os.path.join(data_dir, 'helper_test_paired_hit_samreader.sam')
+        with open(samfile) as f:
+            lines = f.readlines()
+        header = [x for x in lines if x.startswith('@')]
+        records = [x for x in lines if not x.startswith('@')]
+        tmp_files = ['tmp.mapping_test.merge.1.sam', 'tmp.mapping_test.merge.2.sam']
+        for i, filename in enumerate(tmp_files):
+            with open(filename, 'w') as f:
+                f.writelines(header + records[i * 6: (i + 1) * 6])
+
+        tmp_out = 'tmp.mapping_test.merge.out.sam'
+        mapping.merge_sam_files(tmp_files, tmp_out)
+        self.assertTrue(filecmp.cmp(samfile, tmp_out, shallow=False))
+        for filename in tmp_files + [tmp_out]:
+            os.unlink(filename)
+
+    def test_map_sharded(self):
+        '''Test map_sharded'''
+        aligner = aligners.ExactMatch()
+        index_prefix = 'tmp.mapping_test.index'
+        aligner.index(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'), index_prefix)
+        flanks = os.path.join(data_dir, 'helper_test_to_be_filled_gap_flanks.fa')
+        tmp_sam = 'tmp.mapping_test.sam'
+        mapping.map_reads(aligner, index_prefix, flanks, tmp_sam)
+
+        for shards in [1, 2]:
+            for outfile in ['tmp.mapping_test.sharded.sam', 'tmp.mapping_test.sharded.bam']:
+                mapping.map_sharded(aligner, index_prefix, flanks, outfile, threads=2, shards=shards)
+                got = [str(x) for x in pysam.AlignmentFile(outfile).fetch(until_eof=True)]
+                expected = [str(x) for x in pysam.AlignmentFile(tmp_sam).fetch(until_eof=True)]
+                self.assertEqual(got, expected)
+                os.unlink(outfile)
+
+        os.unlink(tmp_sam)
+        for filename in aligner.index_files(index_prefix):
+            os.unlink(filename)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import unittest
+import pyfastaq
+from assembly_tools.fill_gaps_using_reference import reference
+
+modules_dir = os.path.dirname(os.path.abspath(reference.__file__))
+data_dir = os.path.join(modules_dir, 'tests', 'data')
+
+class TestReference(unittest.TestCase):
+    def setUp(self):
+        self.expected = {}
+        pyfastaq.tasks.file_to_dict(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'), self.expected)
+
+    def check_reference(self, ref):
+        self.assertEqual(sorted(ref.names()), sorted(self.expected))
+        for name, seq in self.expected.items():
+            self.assertEqual(ref.length(name), len(seq))
+            self.assertEqual(ref.fetch(name, 0, len(seq) - 1), seq.seq)
+            self.assertEqual(ref.fetch(name, 2, 4), seq.seq[2:5])
+
+        with self.assertRaises(reference.Error):
+            ref.fetch('not_there', 0, 1)
+
+    def test_uncompressed(self):
+        '''Test Reference on uncompressed file, making the index'''
+        tmp_fasta = 'tmp.reference_test.fa'
+        shutil.copyfile(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'), tmp_fasta)
+        ref = reference.Reference(tmp_fasta)
+        self.assertTrue(os.path.exists(tmp_fasta + '.fai'))
+        self.check_reference(ref)
+        ref.close()
+        os.unlink(tmp_fasta)
+        os.unlink(tmp_fasta + '.fai')
+
+    def test_gzipped(self):
+        '''Test Reference on gzipped file'''
+        tmp_fasta = 'tmp.reference_test.fa.gz'
+        pyfastaq.tasks.to_fasta(os.path.join(data_dir, 'helper_test_to_be_filled_ref.fa'), tmp_fasta)
+        with self.assertRaises(reference.Error):
+            reference.Reference(tmp_fasta)
+
+        ref = reference.Reference(tmp_fasta, tmp_prefix='tmp.reference_test.tmp')
+        self.check_reference(ref)
+        self.assertTrue(os.path.exists('tmp.reference_test.tmp.fa'))
+        ref.close()
+        self.assertFalse(os.path.exists('tmp.reference_test.tmp.fa'))
+        self.assertFalse(os.path.exists('tmp.reference_test.tmp.fa.fai'))
+        os.unlink(tmp_fasta)
+
+
+if __name__ == '__main__':
+    unittest.main()
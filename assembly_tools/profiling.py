@@ -0,0 +1,154 @@
+'''Optional profiling of named phases of a run. Library functions wrap
+their main steps in phase() and report what they processed with count().
+Both do nothing unless start() has been called, which the scripts do when
+run with --profile. Phases with the same name are accumulated, and phases
+can be nested, in which case the inner phase name is prefixed with the
+outer phase name, separated by "/".
+
+The process_peak_rss_mb_at_end of a phase is the peak resident memory of the
+whole process so far, taken when the phase ends, not the peak during that
+phase. Use trace_memory=True to get a peak for each phase, from tracemalloc.'''
+
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from pyfastaq import utils
+
+class Error (Exception): pass
+
+profiler = None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on mac, kilobytes everywhere else
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    else:
+        return peak / 1024
+
+
+class Profiler:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.counts = {}
+        self.stack = []
+        self.tracemalloc_peak = 0  # bytes, the highest peak seen in the whole run
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if len(self.stack):
+            name = self.stack[-1]['name'] + '/' + name
+
+        if self.trace_memory:
+            # tracemalloc only has one peak, so save the peak so far of the
+            # outer phase before resetting it for this phase
+            peak = self._tracemalloc_peak()
+            if len(self.stack):
+                self.stack[-1]['tracemalloc_peak'] = max(self.stack[-1]['tracemalloc_peak'], peak)
+            tracemalloc.reset_peak()
+
+        current = {'name': name, 'tracemalloc_peak': 0}
+        self.stack.append(current)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            self.stack.pop()
+            stats = self.phases.setdefault(name, {'calls': 0, 'wall_seconds': 0, 'cpu_seconds': 0, 'process_peak_rss_mb_at_end': 0})
+            stats['calls'] += 1
+            stats['wall_seconds'] += wall
+            stats['cpu_seconds'] += cpu
+            stats['process_peak_rss_mb_at_end'] = _peak_rss_mb()
+
+            if self.trace_memory:
+                peak = max(current['tracemalloc_peak'], self._tracemalloc_peak())
+                stats['tracemalloc_peak_mb'] = max(stats.get('tracemalloc_peak_mb', 0), peak / 1024 / 1024)
+                if len(self.stack):
+                    self.stack[-1]['tracemalloc_peak'] = max(self.stack[-1]['tracemalloc_peak'], peak)
+
+    def _tracemalloc_peak(self):
+        '''Returns the tracemalloc peak since it was last reset, and keeps the highest for the whole run'''
+        peak = tracemalloc.get_traced_memory()[1]
+        self.tracemalloc_peak = max(self.tracemalloc_peak, peak)
+        return peak
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def to_dict(self):
+        d = {
+            'command': ' '.join(sys.argv),
+            'wall_seconds': time.perf_counter() - self.start_wall,
+            'cpu_seconds': time.process_time() - self.start_cpu,
+            'peak_rss_mb': _peak_rss_mb(),
+            'phases': [dict(stats, name=name) for name, stats in self.phases.items()],
+            'counts': self.counts,
+        }
+
+        if self.trace_memory:
+            self._tracemalloc_peak()
+            d['tracemalloc_peak_mb'] = self.tracemalloc_peak / 1024 / 1024
+
+        return d
+
+    def write_json(self, filename):
+        f = utils.open_file_write(filename)
+        print(json.dumps(self.to_dict(), indent=2), file=f)
+        utils.close(f)
+
+
+def start(trace_memory=False):
+    '''Starts profiling, so that calls to phase() and count() are recorded'''
+    global profiler
+    profiler = Profiler(trace_memory=trace_memory)
+    return profiler
+
+
+def stop(filename=None):
+    '''Stops profiling and writes the report to filename, if given'''
+    global profiler
+    if profiler is None:
+        raise Error('Cannot stop profiling because it was not started')
+
+    if filename is not None:
+        profiler.write_json(filename)
+    if profiler.trace_memory:
+        tracemalloc.stop()
+    p = profiler
+    profiler = None
+    return p
+
+
+def phase(name):
+    if profiler is None:
+        return contextlib.nullcontext()
+    else:
+        return profiler.phase(name)
+
+
+def count(name, n=1):
+    if profiler is not None:
+        profiler.count(name, n)
+
+
+def count_io(phase_name, read=None, written=None):
+    '''Adds the total sizes of the files in the lists read and written to the
+       counts phase_name + "/bytes_read" and phase_name + "/bytes_written"'''
+    if profiler is not None:
+        for suffix, filenames in [('bytes_read', read), ('bytes_written', written)]:
+            if filenames is not None:
+                profiler.count(phase_name + '/' + suffix, sum([os.path.getsize(f) for f in filenames if os.path.exists(f)]))
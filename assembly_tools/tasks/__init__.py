@@ -0,0 +1,3 @@
+__all__ = ['annotate_utrs_using_cufflinks', 'fill_gaps_using_ref', 'gap_stats', 'gff_keep_longest_transcripts']
+from assembly_tools import _lazy_loader
+__getattr__ = _lazy_loader(__name__, __all__)
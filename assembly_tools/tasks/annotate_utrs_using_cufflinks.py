@@ -0,0 +1,54 @@
+import argparse
+from pyfastaq import utils
+from assembly_tools import diagnostics, profiling, annotate_utrs_using_cufflinks, file_readers
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = 'Takes a reference GFF file and transcripts.gtf from Cufflinks. Outputs reference GFF with UTRs annotated based on Cufflinks output. Does not change any existing UTR annotations in the reference, only adds new ones.',
+        usage = '%(prog)s [options] <reference.gff[.gz]> <cufflinks transcripts.gtf[.gz]> <out.gff[.gz]>')
+    parser.add_argument('--profile', help='Write timings and peak memory of each phase of the run to this file, in JSON format', metavar='FILENAME')
+    parser.add_argument('--profile_memory', action='store_true', help='Use with --profile to also trace Python memory allocations. This slows down the run')
+    parser.add_argument('--warnings_report', help='Write a summary of warnings to this file, instead of to stderr', metavar='FILENAME')
+    parser.add_argument('ref_gff', help='GFF annotation file of reference. Assumes this is a GFF file with genes annotated using gene/mRNA/CDS format. See examples here: http://www.sequenceontology.org/gff3.shtml.', metavar='reference.gff')
+    parser.add_argument('cufflinks_gtf', help='transcipts.gtf file made by cufflinks', metavar='transcripts.gtf')
+    parser.add_argument('outfile', help='Name of output GFF file')
+    options = parser.parse_args()
+
+    if options.profile:
+        profiling.start(trace_memory=options.profile_memory)
+
+    file_readers.gff.lenient = True
+    file_readers.gff.warnings = False
+    annotate_utrs_using_cufflinks.gene.lenient = True
+    annotate_utrs_using_cufflinks.transcript.lenient = True
+    with profiling.phase('load_ref_gff'):
+        ref_genes, ref_other_gff = annotate_utrs_using_cufflinks.helper.load_ref_gff(options.ref_gff)
+    with profiling.phase('load_cufflinks_gtf'):
+        cufflinks_genes = annotate_utrs_using_cufflinks.helper.load_cufflinks_gtf(options.cufflinks_gtf)
+
+    f = utils.open_file_write(options.outfile)
+
+    while len(ref_genes):
+        seqname, ref_gene_list = ref_genes.popitem()
+        to_print = []
+
+        with profiling.phase('extend'):
+            if ref_gene_list is not None:
+                if seqname in cufflinks_genes and cufflinks_genes[seqname] is not None:
+                    to_print += annotate_utrs_using_cufflinks.helper.extend_ref_genes(ref_gene_list, cufflinks_genes[seqname])
+                    del cufflinks_genes[seqname]
+                else:
+                    for gene in ref_gene_list:
+                        to_print += gene.to_gff_list()
+
+        with profiling.phase('output'):
+            to_print += ref_other_gff.pop(seqname, [])
+            to_print.sort()
+            for g in to_print:
+                print(g, file=f)
+
+    utils.close(f)
+    diagnostics.collector.report(options.warnings_report)
+
+    if options.profile:
+        profiling.stop(options.profile)
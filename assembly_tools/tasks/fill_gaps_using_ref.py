@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import pyfastaq
+from assembly_tools import checkpoint, profiling
+from assembly_tools.fill_gaps_using_reference import aligners, gap_registry, helper, hit_table, index_cache, mapping, reference
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = 'Fills gaps in an assembly using sequences from a second "reference" assembly. Does this by maping flanking sequence either side of each gap to the reference.',
+        usage = '%(prog)s [options] <to_be_gap_filled.fasta[.gz]> <reference.fasta[.gz]> [<reference2.fasta[.gz]> ...] <out.gapfilled.fasta[.gz]>',
+        epilog = 'IMPORTANT: assumes that the aligner is in your path')
+    parser.add_argument('--gap_abs_diff', type=int, help='Max allowed difference in gap length [%(default)s]', default=500, metavar='INT')
+    parser.add_argument('--flanking_bases', type=int, help='Use this many bases either side of each gap [%(default)s]', default=400, metavar='INT')
+    parser.add_argument('--logfile', action='store_true', help='Write a log file of gaps and what happened to them')
+    parser.add_argument('--json_log', help='Write a log of the gaps to this file in JSON Lines format, one line per gap, with its type, whether it was closed, its length and the reference interval used', metavar='FILENAME')
+    parser.add_argument('--summary', help='Write a summary of the run to this file in JSON format, with counts of closed gaps and of each type of gap, and the time taken by each stage', metavar='FILENAME')
+    parser.add_argument('--aligner', choices=['auto'] + sorted(aligners.aligner_classes), help='Aligner to use to map the gap flanks to the reference. "auto" means the first of ' + ', '.join(aligners.preferred_aligners) + ' that is installed [%(default)s]', default='smalt')
+    parser.add_argument('--smalt_k', type=int, help='kmer to use with smalt index [%(default)s]', default=13, metavar='INT')
+    parser.add_argument('--smalt_s', type=int, help='step to use with smalt index [%(default)s]', default=2, metavar='INT')
+    parser.add_argument('--smalt_y', type=float, help='-y option with smalt map [%(default)s]', default=0.9, metavar='FLOAT')
+    parser.add_argument('--smalt_r', type=int, help='-r option with smalt map [%(default)s]', default=-1, metavar='INT')
+    parser.add_argument('--threads', type=int, help='Number of threads to use when mapping and filling gaps. The gap flanks are split into this many shards, which are mapped at the same time, and contigs are filled by this many processes [%(default)s]', default=1, metavar='INT')
+    parser.add_argument('--stream', action='store_true', help='Parse the output of the aligner as it runs, instead of writing a BAM file. --threads is used by the aligner, instead of making shards')
+    parser.add_argument('--unordered_hits', action='store_true', help='Do not assume that the hits from the aligner are in the same order as the gap flanks. Needs more memory and time')
+    parser.add_argument('--max_hits_in_memory', type=int, help='Use with --unordered_hits. When there are more hits than this, they are grouped using temporary files [%(default)s]', default=1000000, metavar='INT')
+    parser.add_argument('--tmpdir', help='Directory in which to make a temporary directory for intermediate files, eg on fast local disk. Default is to write them next to the output file', metavar='DIRNAME')
+    parser.add_argument('--work_dir', help='Directory for intermediate files, with a record of the stages of the run that have finished. If the run is stopped, running the same command again skips the stages that finished. Files in it are deleted when the run finishes. Cannot be used with --tmpdir', metavar='DIRNAME')
+    parser.add_argument('--index_cache', help='Directory in which to keep aligner indexes of references, so that they can be reused by later runs. Can be shared by jobs running at the same time', metavar='DIRNAME')
+    parser.add_argument('--index_cache_max_gb', type=float, help='Use with --index_cache. Delete least recently used indexes when the cache is bigger than this', metavar='FLOAT')
+    parser.add_argument('--profile', help='Write timings and peak memory of each phase of the run to this file, in JSON format', metavar='FILENAME')
+    parser.add_argument('--profile_memory', action='store_true', help='Use with --profile to also trace Python memory allocations. This slows down the run')
+    parser.add_argument('to_be_gap_filled', help='Fasta file that has gaps to be filled')
+    parser.add_argument('reference', nargs='+', help='Fasta file with data to be used to fill gaps. If more than one is given, gaps that cannot be filled using the first are tried with the second, and so on')
+    parser.add_argument('outfile', help='Name of output fasta with gaps filled')
+    options = parser.parse_args()
+
+    # the stage timings in the summary come from the profiler
+    if options.profile or options.summary:
+        profiling.start(trace_memory=options.profile_memory)
+
+    if options.tmpdir is not None and options.work_dir is not None:
+        parser.error('Cannot use both --tmpdir and --work_dir')
+
+    if options.work_dir is not None:
+        os.makedirs(options.work_dir, exist_ok=True)
+        tmp_dir = None
+        tmp_prefix = os.path.join(options.work_dir, 'tmp')
+    elif options.tmpdir is not None:
+        tmp_dir = tempfile.mkdtemp(prefix='tmp.fill_gaps_using_ref.', dir=options.tmpdir)
+        tmp_prefix = os.path.join(tmp_dir, 'tmp')
+    else:
+        tmp_dir = None
+        tmp_prefix = options.outfile + '.tmp'
+
+    # Each stage is skipped if it finished in an earlier run with --work_dir. The key
+    # of each stage includes the key of the stage before it
+    manifest = checkpoint.Manifest(options.work_dir)
+
+    def input_hash(filename):
+        return None if options.work_dir is None else index_cache.file_hash(filename)
+
+    def save_gaps(stage, stage_key, gaps_file, files):
+        if options.work_dir is not None:
+            gaps.save(gaps_file)
+        manifest.finish(stage, stage_key, files=files + [gaps_file])
+
+    gap_flanks_fasta = tmp_prefix + '.seqs_flanking_gaps.fa.gz'
+    files_to_clean = [gap_flanks_fasta]
+
+    # Ns at the start or end of contigs are trimmed off, so are not gaps
+    stage_key = checkpoint.key(input_hash(options.to_be_gap_filled), options.flanking_bases)
+    if manifest.done('find_gaps', stage_key):
+        gaps = gap_registry.load(tmp_prefix + '.gaps')
+    else:
+        gaps = gap_registry.GapRegistry()
+        with profiling.phase('find_gaps_and_write_flanks'):
+            helper.find_gaps_and_write_flanks(options.to_be_gap_filled, options.flanking_bases, gap_flanks_fasta, gaps)
+        profiling.count_io('find_gaps_and_write_flanks', read=[options.to_be_gap_filled], written=[gap_flanks_fasta])
+        save_gaps('find_gaps', stage_key, tmp_prefix + '.gaps', [gap_flanks_fasta])
+
+    def parse_hits(sam):
+        if options.unordered_hits:
+            helper.parse_unordered_sam_file(sam, gaps, tmp_prefix + '.hits', max_hits_in_memory=options.max_hits_in_memory)
+        else:
+            helper.parse_sam_file(sam, gaps)
+
+    def fillable(gap_ids):
+        if hit_table.numpy is None:
+            return [x for x in gap_ids if gaps.gap(x).can_be_filled(abs_diff=options.gap_abs_diff)]
+        can_be_filled = hit_table.can_be_filled(gaps, abs_diff=options.gap_abs_diff)
+        return [x for x in gap_ids if can_be_filled[x]]
+
+    aligner = aligners.new(options.aligner, smalt_k=options.smalt_k, smalt_s=options.smalt_s, smalt_y=options.smalt_y, smalt_r=options.smalt_r)
+    unfilled = range(len(gaps))
+    references_used = 0
+
+    for round_number, reference_fasta in enumerate(options.reference):
+        if len(unfilled) == 0:
+            break
+
+        references_used += 1
+        round_stage = 'reference_' + str(round_number + 1)
+        stage_key = checkpoint.key(stage_key, input_hash(reference_fasta), aligner.name, vars(aligner), options.gap_abs_diff)
+        round_gaps_file = tmp_prefix + '.' + round_stage + '.gaps'
+
+        # Each reference after the first is only used for the gaps that could not be
+        # filled using the ones before it, reusing the flanks that were already made
+        if round_number == 0:
+            round_prefix = tmp_prefix
+            flanks_fasta = gap_flanks_fasta
+            round_files = []
+        else:
+            round_prefix = tmp_prefix + '.' + round_stage
+            flanks_fasta = round_prefix + '.seqs_flanking_gaps.fa.gz'
+            round_files = [flanks_fasta]
+            files_to_clean.append(flanks_fasta)
+
+        aligner_index = round_prefix + '.aligner_index'
+        hits_bamfile = round_prefix + '.hits.bam'
+
+        if manifest.done(round_stage, stage_key):
+            gaps = gap_registry.load(round_gaps_file)
+        else:
+            map_done = manifest.done(round_stage + '.map_flanks', stage_key) and not options.stream
+
+            if round_number > 0:
+                if not map_done:
+                    with profiling.phase('write_unfilled_flanks'):
+                        helper.write_flanks_of_gaps(gap_flanks_fasta, set(unfilled), flanks_fasta)
+                    profiling.count_io('write_unfilled_flanks', read=[gap_flanks_fasta], written=[flanks_fasta])
+                for gap_id in unfilled:
+                    gaps.reset(gap_id)
+
+            if not map_done:
+                with contextlib.ExitStack() as stack:
+                    with profiling.phase('index_reference'):
+                        if options.index_cache is None:
+                            index_key = checkpoint.key(input_hash(reference_fasta), aligner.index_options())
+                            if not manifest.done(round_stage + '.index_reference', index_key):
+                                aligner.index(reference_fasta, aligner_index)
+                                profiling.count_io('index_reference', read=[reference_fasta], written=aligner.index_files(aligner_index))
+                                manifest.finish(round_stage + '.index_reference', index_key, files=aligner.index_files(aligner_index))
+                            index_prefix = aligner_index
+                            files_to_clean += aligner.index_files(aligner_index)
+                        else:
+                            max_bytes = None if options.index_cache_max_gb is None else int(options.index_cache_max_gb * 1024 ** 3)
+                            cache = index_cache.IndexCache(options.index_cache, max_bytes=max_bytes)
+                            index_prefix = stack.enter_context(cache.index(reference_fasta, aligner.index_options(), aligner.index))
+
+                    if options.stream:
+                        with profiling.phase('map_flanks_and_parse_sam'):
+                            with aligner.map(index_prefix, flanks_fasta, threads=options.threads) as sam_stream:
+                                parse_hits(sam_stream)
+                        profiling.count_io('map_flanks_and_parse_sam', read=[flanks_fasta] + aligner.index_files(index_prefix))
+                    else:
+                        with profiling.phase('map_flanks'):
+                            mapping.map_sharded(aligner, index_prefix, flanks_fasta, hits_bamfile, threads=options.threads)
+                        profiling.count_io('map_flanks', read=[flanks_fasta] + aligner.index_files(index_prefix), written=[hits_bamfile])
+                        manifest.finish(round_stage + '.map_flanks', stage_key, files=[hits_bamfile] + round_files)
+
+            if not options.stream:
+                files_to_clean.append(hits_bamfile)
+                with profiling.phase('parse_sam_file'):
+                    parse_hits(hits_bamfile)
+                profiling.count_io('parse_sam_file', read=[hits_bamfile])
+
+            for gap_id in fillable(unfilled):
+                gaps.reference[gap_id] = round_number
+
+            save_gaps(round_stage, stage_key, round_gaps_file, round_files)
+
+        # gaps that could not be filled keep their type from the last reference tried
+        filled = set(fillable(unfilled))
+        still_unfilled = [x for x in unfilled if x not in filled]
+        if len(options.reference) > 1:
+            print('Can close', len(unfilled) - len(still_unfilled), 'of', len(unfilled), 'remaining gaps using', reference_fasta)
+        unfilled = still_unfilled
+
+    stage_key = checkpoint.key(stage_key, options.outfile, options.logfile, options.json_log)
+    log_file = options.outfile + '.log'
+    log_files = ([log_file] if options.logfile else []) + ([options.json_log] if options.json_log else [])
+
+    if manifest.done('fill_gaps', stage_key):
+        counts = manifest.info('fill_gaps')
+    else:
+        ref_seqs = []
+        for round_number, reference_fasta in enumerate(options.reference[:references_used]):
+            with profiling.phase('load_reference'):
+                ref_seqs.append(reference.Reference(reference_fasta, tmp_prefix=tmp_prefix + '.reference_' + str(round_number + 1)))
+            if ref_seqs[-1].tmp_fasta is not None:
+                profiling.count_io('load_reference', read=[reference_fasta], written=[ref_seqs[-1].tmp_fasta, ref_seqs[-1].tmp_fasta + '.fai'])
+
+        if options.logfile:
+            fout_log = pyfastaq.utils.open_file_write(log_file)
+        else:
+            fout_log = None
+
+        if options.json_log:
+            fout_json_log = pyfastaq.utils.open_file_write(options.json_log)
+        else:
+            fout_json_log = None
+
+        with profiling.phase('fill_gaps'):
+            counts = helper.fill_gaps(options.to_be_gap_filled, options.outfile, gaps, ref_seqs, abs_diff=options.gap_abs_diff, log_fh=fout_log, json_log_fh=fout_json_log, threads=options.threads)
+
+        for r in ref_seqs:
+            r.close()
+        if options.logfile:
+            pyfastaq.utils.close(fout_log)
+        if options.json_log:
+            pyfastaq.utils.close(fout_json_log)
+        profiling.count_io('fill_gaps', read=[options.to_be_gap_filled], written=[options.outfile] + log_files)
+        manifest.finish('fill_gaps', stage_key, files=[options.outfile] + log_files, info=counts)
+
+    profiling.count('gaps', counts['total'])
+    profiling.count('gaps_closed', counts['closed'])
+
+    print('-------------------------------------------')
+    print('Closed', counts['closed'], 'of', counts['total'], 'gaps')
+
+    # clean up tmp files
+    if tmp_dir is not None:
+        shutil.rmtree(tmp_dir)
+    else:
+        for f in files_to_clean:
+            if os.path.exists(f):
+                os.unlink(f)
+
+        if options.work_dir is not None:
+            manifest.delete(keep=[options.outfile] + log_files)
+
+    if options.profile or options.summary:
+        profiler = profiling.stop(options.profile)
+
+        if options.summary:
+            summary = {
+                'to_be_gap_filled': options.to_be_gap_filled,
+                'references': options.reference,
+                'outfile': options.outfile,
+                'gaps': counts['total'],
+                'closed': counts['closed'],
+                'types': counts['types'],
+                'wall_seconds': profiler.to_dict()['wall_seconds'],
+                'stage_wall_seconds': {name: stats['wall_seconds'] for name, stats in profiler.phases.items()},
+            }
+            f = pyfastaq.utils.open_file_write(options.summary)
+            print(json.dumps(summary, indent=2), file=f)
+            pyfastaq.utils.close(f)
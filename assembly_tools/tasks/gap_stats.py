@@ -0,0 +1,43 @@
+import argparse
+import json
+from pyfastaq import utils
+from assembly_tools import profiling
+from assembly_tools.fill_gaps_using_reference import gap_scanner
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = 'Reports the number and lengths of gaps (runs of Ns) in an assembly. Writes a summary with a histogram of gap lengths to outprefix.json, and the gaps in each contig to outprefix.per_contig.tsv',
+        usage = '%(prog)s [options] <in.fasta[.gz]> <outprefix>')
+    parser.add_argument('--min_length', type=int, help='Only count gaps at least this long [%(default)s]', default=1, metavar='INT')
+    parser.add_argument('--bins', help='Comma-separated list of the smallest gap length in each bin of the histogram [%(default)s]', default='1,10,100,1000,10000,100000', metavar='INT,INT,...')
+    parser.add_argument('--trim_ends', action='store_true', help='Do not count Ns at the start or end of contigs, which fill_gaps_using_ref does not treat as gaps')
+    parser.add_argument('--profile', help='Write timings and peak memory of each phase of the run to this file, in JSON format', metavar='FILENAME')
+    parser.add_argument('infile', help='Name of input fasta file', metavar='in.fasta[.gz]')
+    parser.add_argument('outprefix', help='Prefix of output files')
+    options = parser.parse_args()
+
+    if options.profile:
+        profiling.start()
+
+    stats = gap_scanner.GapStats(bins=[int(x) for x in options.bins.split(',')], min_length=options.min_length)
+    reader = gap_scanner.trimmed_contigs if options.trim_ends else gap_scanner.file_reader
+
+    with profiling.phase('scan_contigs'):
+        for name, seq in reader(options.infile):
+            stats.add_contig(name, seq)
+
+    summary = stats.summary()
+    f = utils.open_file_write(options.outprefix + '.json')
+    print(json.dumps(summary, indent=2), file=f)
+    utils.close(f)
+
+    f = utils.open_file_write(options.outprefix + '.per_contig.tsv')
+    print('#name', 'length', 'gaps', 'gap_bases', 'gaps_per_mb', sep='\t', file=f)
+    for name, length, gaps, gap_bases in stats.contigs:
+        print(name, length, gaps, gap_bases, round(1000000 * gaps / length, 3) if length else 0, sep='\t', file=f)
+    utils.close(f)
+
+    print('Found', summary['gaps'], 'gaps, total length', summary['gap_bases'], 'in', summary['contigs'], 'sequences of total length', summary['total_length'])
+
+    if options.profile:
+        profiling.stop(options.profile)
@@ -0,0 +1,54 @@
+import argparse
+from pyfastaq import utils
+from assembly_tools import diagnostics, profiling, file_readers, annotate_utrs_using_cufflinks
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = 'Filters transcripts from GFF file, so only longest transcript for each gene is kept',
+        usage = '%(prog)s in.gff[.gz] out.gff[.gz]')
+    parser.add_argument('--low_memory', action='store_true', help='Read the input file twice, keeping only the exon lengths of the transcripts in memory, instead of loading all of it. Records are written in the same order as the input file, instead of being sorted')
+    parser.add_argument('--profile', help='Write timings and peak memory of each phase of the run to this file, in JSON format', metavar='FILENAME')
+    parser.add_argument('--profile_memory', action='store_true', help='Use with --profile to also trace Python memory allocations. This slows down the run')
+    parser.add_argument('--warnings_report', help='Write a summary of warnings to this file, instead of to stderr', metavar='FILENAME')
+    parser.add_argument('gff_in', help='Name of input gff file', metavar='in.gff[.gz]')
+    parser.add_argument('gff_out', help='Name of output gff file', metavar='out.gff[.gz]')
+    options = parser.parse_args()
+
+    if options.profile:
+        profiling.start(trace_memory=options.profile_memory)
+
+    file_readers.gff.lenient = True
+    file_readers.gff.warnings = False
+    annotate_utrs_using_cufflinks.gene.lenient = True
+    annotate_utrs_using_cufflinks.transcript.lenient = True
+
+    if options.low_memory:
+        with profiling.phase('write_longest_transcripts'):
+            annotate_utrs_using_cufflinks.helper.write_longest_transcripts(options.gff_in, options.gff_out)
+    else:
+        with profiling.phase('load_ref_gff'):
+            ref_genes, ref_other_gff = annotate_utrs_using_cufflinks.helper.load_ref_gff(options.gff_in)
+        f = utils.open_file_write(options.gff_out)
+
+        while len(ref_genes):
+            seqname, ref_gene_list = ref_genes.popitem()
+            to_print = []
+
+            with profiling.phase('remove_transcripts'):
+                while len(ref_gene_list):
+                    gene = ref_gene_list.pop(0)
+                    gene.remove_all_but_longest_transcript()
+                    to_print += gene.to_gff_list()
+
+            with profiling.phase('output'):
+                to_print += ref_other_gff.pop(seqname, [])
+                to_print.sort()
+                for g in to_print:
+                    print(g, file=f)
+
+        utils.close(f)
+
+    diagnostics.collector.report(options.warnings_report)
+
+    if options.profile:
+        profiling.stop(options.profile)
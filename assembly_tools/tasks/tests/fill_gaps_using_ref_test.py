@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import shutil
+import sys
+import unittest
+import pyfastaq
+from assembly_tools.fill_gaps_using_reference import aligners, kmer_index
+from assembly_tools.tasks import fill_gaps_using_ref
+
+
+class RecordingExactMatch(aligners.ExactMatch):
+    '''ExactMatch that remembers the names of the reads it was asked to map'''
+    name = 'exact_recording'
+    mapped = []
+
+    def map(self, index_prefix, reads, threads=1):
+        self.mapped.append([x.id for x in pyfastaq.sequences.file_reader(reads)])
+        return super().map(index_prefix, reads, threads=threads)
+
+
+def write_fasta(filename, seqs):
+    with open(filename, 'w') as f:
+        for name, seq in seqs:
+            print('>' + name, seq, sep='\n', file=f)
+
+
+def run_task(args):
+    original_argv = sys.argv
+    sys.argv = ['fill_gaps_using_ref'] + args
+    try:
+        fill_gaps_using_ref.run()
+    finally:
+        sys.argv = original_argv
+
+
+class TestFillGapsUsingRef(unittest.TestCase):
+    def setUp(self):
+        # Three contigs, each with a gap of 10 Ns. Only the first reference has the
+        # first contig, only the second reference has the second contig, and
+        # neither has the third. Sequences are named by the first word of the
+        # header, so the description of ref1 must be ignored
+        random.seed(42)
+        self.contigs = [''.join(random.choice('ACGT') for i in range(200)) for j in range(3)]
+        self.assembly = 'tmp.fill_gaps_using_ref_test.assembly.fa'
+        self.refs = ['tmp.fill_gaps_using_ref_test.ref1.fa', 'tmp.fill_gaps_using_ref_test.ref2.fa']
+        self.outfile = 'tmp.fill_gaps_using_ref_test.out.fa'
+        self.json_log = 'tmp.fill_gaps_using_ref_test.out.json'
+        self.work_dir = 'tmp.fill_gaps_using_ref_test.work'
+        self.out_dir = 'tmp.fill_gaps_using_ref_test.out'
+        write_fasta(self.assembly, [('contig' + str(i), x[:100] + 'N' * 10 + x[110:]) for i, x in enumerate(self.contigs)])
+        write_fasta(self.refs[0], [('ref1 description', self.contigs[0])])
+        write_fasta(self.refs[1], [('ref2', self.contigs[1])])
+        aligners.aligner_classes[RecordingExactMatch.name] = RecordingExactMatch
+        RecordingExactMatch.mapped = []
+
+    def tearDown(self):
+        del aligners.aligner_classes[RecordingExactMatch.name]
+        for filename in [self.assembly, self.outfile, self.json_log] + self.refs + [x + '.fai' for x in self.refs]:
+            if os.path.exists(filename):
+                os.unlink(filename)
+        for dirname in [self.work_dir, self.out_dir]:
+            if os.path.exists(dirname):
+                shutil.rmtree(dirname)
+
+    def test_two_references(self):
+        '''Test gaps not filled by the first reference are filled by the second'''
+        run_task(['--aligner', RecordingExactMatch.name, '--flanking_bases', '30', '--json_log', self.json_log, self.assembly] + self.refs + [self.outfile])
+
+        got = {x.id: x.seq for x in pyfastaq.sequences.file_reader(self.outfile)}
+        self.assertEqual(['contig0', 'contig1', 'contig2'], sorted(got))
+        for i in range(2):
+            self.assertNotIn('N', got['contig' + str(i)])
+            self.assertTrue(got['contig' + str(i)].startswith(self.contigs[i][:100]))
+            self.assertTrue(got['contig' + str(i)].endswith(self.contigs[i][110:]))
+        self.assertEqual(self.contigs[2][:100] + 'N' * 10 + self.contigs[2][110:], got['contig2'])
+
+        with open(self.json_log) as f:
+            gaps = [json.loads(x) for x in f]
+        self.assertEqual([self.refs[0], self.refs[1], None], [x['reference'] for x in gaps])
+        self.assertEqual(['ref1', 'ref2', None], [x['ref_name'] for x in gaps])
+
+        # the second reference is only given the flanks of the gaps that the first could not fill
+        all_flanks = [str(i) + '.' + x for i in range(3) for x in ['left', 'right']]
+        self.assertEqual([all_flanks, all_flanks[2:]], RecordingExactMatch.mapped)
+
+    @unittest.skipIf(kmer_index.numpy is None, 'numpy not installed')
+    def test_minimizer_aligner(self):
+        '''Test minimizer aligner with a reference whose header has a description'''
+        for threads in ['1', '2']:
+            run_task(['--aligner', 'minimizer', '--threads', threads, '--flanking_bases', '90', '--json_log', self.json_log, self.assembly, self.refs[0], self.outfile])
+            got = {x.id: x.seq for x in pyfastaq.sequences.file_reader(self.outfile)}
+            self.assertNotIn('N', got['contig0'])
+            with open(self.json_log) as f:
+                gaps = [json.loads(x) for x in f]
+            self.assertEqual(['ref1', None, None], [x['ref_name'] for x in gaps])
+
+    def test_resume(self):
+        '''Test rerun with --work_dir after the fill stage fails'''
+        # the output directory does not exist, so filling the gaps fails
+        outfile = os.path.join(self.out_dir, 'out.fa')
+        args = ['--aligner', RecordingExactMatch.name, '--flanking_bases', '30', '--work_dir', self.work_dir, self.assembly] + self.refs + [outfile]
+        with self.assertRaises(pyfastaq.utils.Error):
+            run_task(args)
+        self.assertEqual(2, len(RecordingExactMatch.mapped))
+
+        # the flanks given to the second reference must be recorded, so that they are deleted at the end
+        flanks_fasta = os.path.join(self.work_dir, 'tmp.reference_2.seqs_flanking_gaps.fa.gz')
+        self.assertTrue(os.path.exists(flanks_fasta))
+        with open(os.path.join(self.work_dir, 'manifest.json')) as f:
+            stages = json.load(f)['stages']
+        self.assertIn(flanks_fasta, stages['reference_2']['files'])
+
+        os.mkdir(self.out_dir)
+        RecordingExactMatch.mapped = []
+        run_task(args)
+        self.assertEqual([], RecordingExactMatch.mapped)
+        self.assertFalse(os.path.exists(self.work_dir))
+
+        got = [x.seq for x in pyfastaq.sequences.file_reader(outfile)]
+        run_task(['--aligner', RecordingExactMatch.name, '--flanking_bases', '30', self.assembly] + self.refs + [self.outfile])
+        expected = [x.seq for x in pyfastaq.sequences.file_reader(self.outfile)]
+        self.assertEqual(expected, got)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import unittest
+from assembly_tools import checkpoint
+
+class TestCheckpoint(unittest.TestCase):
+    def test_key(self):
+        '''Test key()'''
+        self.assertEqual(checkpoint.key('a', 1, {'x': 2, 'y': 3}), checkpoint.key('a', 1, {'y': 3, 'x': 2}))
+        self.assertNotEqual(checkpoint.key('a', 1), checkpoint.key('a', 2))
+        self.assertNotEqual(checkpoint.key('a', 1), checkpoint.key(checkpoint.key('a', 1)))
+
+
+    def test_manifest_no_work_dir(self):
+        '''Test Manifest with no work directory never skips a stage'''
+        manifest = checkpoint.Manifest()
+        manifest.finish('stage1', 'key1')
+        self.assertFalse(manifest.done('stage1', 'key1'))
+        manifest.delete()
+
+
+    def test_manifest(self):
+        '''Test Manifest finish(), done(), info() and delete()'''
+        work_dir = 'tmp.checkpoint_test'
+        if os.path.exists(work_dir):
+            shutil.rmtree(work_dir)
+        os.mkdir(work_dir)
+        stage_file = os.path.join(work_dir, 'stage1.txt')
+        keep_file = 'tmp.checkpoint_test.out'
+        for filename in [stage_file, keep_file]:
+            with open(filename, 'w') as f:
+                print('x', file=f)
+
+        manifest = checkpoint.Manifest(work_dir)
+        self.assertFalse(manifest.done('stage1', 'key1'))
+        manifest.finish('stage1', 'key1', files=[stage_file], info={'n': 42})
+        manifest.finish('stage2', 'key2', files=[keep_file])
+
+        # should be the same when read back from the manifest file, as
+        # happens when a run is restarted
+        manifest = checkpoint.Manifest(work_dir)
+        self.assertTrue(manifest.done('stage1', 'key1'))
+        self.assertFalse(manifest.done('stage1', 'key2'))
+        self.assertFalse(manifest.done('stage3', 'key1'))
+        self.assertEqual({'n': 42}, manifest.info('stage1'))
+        self.assertTrue(manifest.done('stage2', 'key2'))
+
+        os.unlink(keep_file)
+        self.assertFalse(manifest.done('stage2', 'key2'))
+        with open(keep_file, 'w') as f:
+            print('x', file=f)
+
+        manifest.delete(keep=[keep_file])
+        self.assertFalse(os.path.exists(work_dir))
+        self.assertTrue(os.path.exists(keep_file))
+        os.unlink(keep_file)
+
+
+    def test_manifest_bad_file(self):
+        '''Test Manifest raises error when manifest file is bad'''
+        work_dir = 'tmp.checkpoint_test.bad'
+        os.mkdir(work_dir)
+        with open(os.path.join(work_dir, 'manifest.json'), 'w') as f:
+            print('{"stag', file=f)
+        with self.assertRaises(checkpoint.Error):
+            checkpoint.Manifest(work_dir)
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
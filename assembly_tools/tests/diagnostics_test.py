@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from assembly_tools import diagnostics
+
+class TestCollector(unittest.TestCase):
+    def test_add(self):
+        '''Test add() counts everything but only keeps max_examples'''
+        c = diagnostics.Collector(max_examples=2)
+        calls = []
+
+        def message():
+            calls.append(1)
+            return 'lazy'
+
+        for i in range(5):
+            c.add('cat1', message)
+        c.add('cat2', 'not lazy')
+        self.assertEqual(c.counts, {'cat1': 5, 'cat2': 1})
+        self.assertEqual(c.examples, {'cat1': ['lazy', 'lazy'], 'cat2': ['not lazy']})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(c), 6)
+        c.clear()
+        self.assertEqual(len(c), 0)
+
+    def test_summary(self):
+        '''Test summary()'''
+        c = diagnostics.Collector(max_examples=1)
+        c.add('cat1', 'line1\nline2')
+        c.add('cat1', 'x')
+        expected = '\n'.join([
+            'Warnings summary. Total warnings: 2',
+            'cat1\t2',
+            '\tline1\n\tline2',
+            '\t... (1 more)',
+        ])
+        self.assertEqual(c.summary(), expected)
+
+    def test_report_to_file(self):
+        '''Test report() writes to a file'''
+        c = diagnostics.Collector()
+        c.add('cat1', 'x')
+        tmp_file = 'tmp.diagnostics_test.txt'
+        c.report(tmp_file)
+        with open(tmp_file) as f:
+            self.assertEqual(f.read(), c.summary() + '\n')
+        os.unlink(tmp_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import unittest
+from assembly_tools import profiling
+
+class TestProfiling(unittest.TestCase):
+    def test_phase_and_count_when_not_started(self):
+        '''Test phase() and count() do nothing when profiling not started'''
+        self.assertIsNone(profiling.profiler)
+        with profiling.phase('x'):
+            profiling.count('y')
+        self.assertIsNone(profiling.profiler)
+        with self.assertRaises(profiling.Error):
+            profiling.stop()
+
+    def test_start_stop(self):
+        '''Test phases and counts recorded and written to json'''
+        profiling.start(trace_memory=True)
+        for i in range(2):
+            with profiling.phase('outer'):
+                with profiling.phase('inner'):
+                    x = [0] * 100000
+                profiling.count('things', 3)
+        tmp_json = 'tmp.profiling_test.json'
+        p = profiling.stop(tmp_json)
+        self.assertIsNone(profiling.profiler)
+        self.assertEqual(p.counts, {'things': 6})
+        self.assertEqual(list(p.phases), ['outer/inner', 'outer'])
+        self.assertEqual(p.phases['outer']['calls'], 2)
+        self.assertGreaterEqual(p.phases['outer']['wall_seconds'], p.phases['outer/inner']['wall_seconds'])
+        self.assertGreaterEqual(p.phases['outer']['tracemalloc_peak_mb'], p.phases['outer/inner']['tracemalloc_peak_mb'])
+        self.assertGreater(p.phases['outer/inner']['tracemalloc_peak_mb'], 0.5)
+        self.assertIn('process_peak_rss_mb_at_end', p.phases['outer'])
+
+        # the run's peak is the highest of all phases, not the peak since the last phase started
+        profiling.start(trace_memory=True)
+        with profiling.phase('big'):
+            x = [0] * 1000000
+        del x
+        with profiling.phase('small'):
+            x = [0] * 10
+        d = profiling.stop().to_dict()
+        self.assertGreaterEqual(d['tracemalloc_peak_mb'], d['phases'][0]['tracemalloc_peak_mb'])
+        self.assertGreater(d['tracemalloc_peak_mb'], 5)
+
+        with open(tmp_json) as f:
+            got = json.load(f)
+        self.assertEqual(got['counts'], {'things': 6})
+        self.assertEqual([x['name'] for x in got['phases']], ['outer/inner', 'outer'])
+        os.unlink(tmp_json)
+
+    def test_count_io(self):
+        '''Test count_io'''
+        tmp_file = 'tmp.profiling_test.count_io'
+        with open(tmp_file, 'w') as f:
+            print('x' * 9, file=f)
+        profiling.count_io('stage', read=[tmp_file])
+        profiling.start()
+        profiling.count_io('stage', read=[tmp_file, tmp_file], written=[tmp_file, 'tmp.profiling_test.not_there'])
+        p = profiling.stop()
+        self.assertEqual(p.counts, {'stage/bytes_read': 20, 'stage/bytes_written': 10})
+        os.unlink(tmp_file)
+
+
+if __name__ == '__main__':
+    unittest.main()